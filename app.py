@@ -1,25 +1,17 @@
 # app.py - Главный файл с улучшенной аутентификацией
 import streamlit as st
 from ui import get_text, LANG
-from auth import show_login_page, logout_user, check_permission, ROLES, log_activity
+from auth import (show_login_page, logout_user, check_permission, validate_session,
+                  allowed_pages, get_role_name, log_activity)
 from database_supabase import clear_all_caches
 
-# Импорт страниц (удалены ml_training и new_data_input)
-from pages.home import show_home
-from pages.production import show_production_process
-from pages.regression import show_regression_analysis_full
-from pages.ph_modeling import show_ph_modeling
-from pages.mathematical_models import show_mathematical_models
-from pages.seabuckthorn import show_seabuckthorn_analysis
-from pages.data_exploration import show_data_exploration
-from pages.experiments import show_experiments
-from pages.digital_safety import show_digital_safety
-#from pages.history_db import show_history_db
-from pages.dashboard import show_dashboard
-from pages.reports import show_reports
-from pages.supabase_test import show_supabase_test
-from pages.admin import show_admin_panel
-from pages.iot_monitoring import show_iot_monitoring
+# Страницы импортируются лениво при первом переходе (см. page_registry)
+from page_registry import render_page, prewarm_pages
+from query_trace import start_trace, current_trace
+
+# Запросы к БД этого запуска собираются в трассу (см. query_trace)
+start_trace()
+
 # Настройки страницы
 st.set_page_config(
     page_title="Платформа Жая — Производство",
@@ -140,6 +132,13 @@ if "user" not in st.session_state or not st.session_state.user.get("authenticate
     show_login_page()
     st.stop()
 
+# Сессия могла истечь или быть отозвана (выход в другой вкладке, блокировка админом)
+if not validate_session(st.session_state.user):
+    del st.session_state.user
+    st.warning("⚠️ Сессия завершена. Войдите снова.")
+    show_login_page()
+    st.stop()
+
 # =================================================================
 # ГЛАВНЫЙ ИНТЕРФЕЙС
 # =================================================================
@@ -164,7 +163,7 @@ if "lang_choice" not in st.session_state:
 # =================================================================
 with st.sidebar:
     # Карточка пользователя
-    role_name = ROLES.get(user_role, {}).get("name", {}).get(st.session_state.lang_choice, user_role)
+    role_name = get_role_name(user_role, st.session_state.lang_choice)
 
     st.markdown(f"""
     <div class="user-badge">
@@ -191,53 +190,28 @@ with st.sidebar:
     # Навигация с учетом прав доступа
     st.markdown("### 📂 Навигация")
 
-    page_options = []
-
-    # Dashboard (доступен всем)
-    if check_permission(user_role, "view_dashboard"):
-        page_options.append(("🎯 Dashboard", "dashboard"))
-
-    page_options.append(("📡 IoT Мониторинг", "iot_monitoring"))
-
-    # Главная страница
-    page_options.append((get_text("menu_home", lang_choice), "home"))
-
-    # Процесс производства
-    page_options.append((get_text("menu_production_process", lang_choice), "production"))
-
-    # Регрессионные модели
-    page_options.append((get_text("menu_regression_models", lang_choice), "regression"))
-
-    # pH моделирование
-    page_options.append((get_text("menu_ph_modeling", lang_choice), "ph_modeling"))
-
-    # Анализ облепихи
-    page_options.append((get_text("menu_seabuckthorn_analysis", lang_choice), "seabuckthorn"))
-
-    # Исследование данных
-    page_options.append((get_text("menu_data_exploration", lang_choice), "data_exploration"))
-    # Мат.модель
-    page_options.append((get_text("menu_mathematical_models", lang_choice), "mathematical_models"))
-    # Мат.модель
-    page_options.append((get_text("menu_experiments", lang_choice), "experiments"))
-    # Мат.модель
-    page_options.append((get_text("menu_digital_safety", lang_choice), "digital_safety"))
-
-    # История / БД (только для аналитиков и выше)
-    #if check_permission(user_role, "view_history"):
-      #page_options.append((get_text("menu_history_db", lang_choice), "history_db"))
-
-    # Отчеты (для менеджеров и аналитиков)
-    if check_permission(user_role, "view_reports"):
-        page_options.append(("📊 Отчеты", "reports"))
-
-    # Тест Supabase (только для админов)
-    if user_role == "admin":
-        page_options.append(("🔧 Тест Supabase", "supabase_test"))
-
-    # После строки с supabase_test
-    if user_role == "admin":
-        page_options.append(("⚙️ Админ-панель", "admin"))
+    # Все разделы в порядке меню; доступные роли отбираются одной проверкой
+    page_options = [
+        ("🎯 Dashboard", "dashboard"),
+        ("📡 IoT Мониторинг", "iot_monitoring"),
+        (get_text("menu_home", lang_choice), "home"),
+        (get_text("menu_production_process", lang_choice), "production"),
+        (get_text("menu_regression_models", lang_choice), "regression"),
+        (get_text("menu_ph_modeling", lang_choice), "ph_modeling"),
+        (get_text("menu_seabuckthorn_analysis", lang_choice), "seabuckthorn"),
+        (get_text("menu_data_exploration", lang_choice), "data_exploration"),
+        (get_text("menu_mathematical_models", lang_choice), "mathematical_models"),
+        (get_text("menu_experiments", lang_choice), "experiments"),
+        (get_text("menu_digital_safety", lang_choice), "digital_safety"),
+        # История / БД (только для аналитиков и выше)
+        #(get_text("menu_history_db", lang_choice), "history_db"),
+        ("📥 Импорт измерений", "lab_import"),
+        ("📊 Отчеты", "reports"),
+        ("🔧 Тест Supabase", "supabase_test"),
+        ("⚙️ Админ-панель", "admin"),
+    ]
+    allowed_keys = set(allowed_pages(user_role, [key for _, key in page_options]))
+    page_options = [item for item in page_options if item[1] in allowed_keys]
 
     # Отображение меню
     page_labels = [item[0] for item in page_options]
@@ -280,7 +254,7 @@ with st.sidebar:
     # Очистка кэша (только для админов)
     if user_role == "admin":
         if st.button("🔄 Очистить кэш", use_container_width=True):
-            clear_all_caches()
+            clear_all_caches(resources=True)
             st.success("✅ Кэш очищен")
             log_activity(user.get("id"), "clear_cache", "Очистка кэша приложения")
 
@@ -294,44 +268,23 @@ with st.sidebar:
 # =================================================================
 page = st.session_state.selected_page
 
-if page == "dashboard":
-    show_dashboard(lang_choice)
-elif page == "iot_monitoring":
-    show_iot_monitoring()
-elif page == "supabase_test" and user_role == "admin":
-    show_supabase_test()
-elif page == "home":
-    show_home(lang_choice)
-elif page == "production":
-    show_production_process(lang_choice)
-elif page == "regression":
-    show_regression_analysis_full(lang_choice)
-elif page == "ph_modeling":
-    show_ph_modeling(lang_choice)
-elif page == "seabuckthorn":
-    show_seabuckthorn_analysis(lang_choice)
-elif page == "data_exploration":
-    show_data_exploration(lang_choice)
-elif page == "mathematical_models":
-    show_mathematical_models(lang_choice)
-elif page == "experiments":
-    show_experiments(lang_choice)
-elif page == "digital_safety":
-    show_digital_safety(lang_choice)
-#elif page == "history_db":
-    #if check_permission(user_role, "view_history"):
-     #   show_history_db(lang_choice)
-    #else:
-     #   st.error("❌ Доступ запрещен")
-elif page == "reports":
-    if check_permission(user_role, "view_reports"):
-        show_reports(lang_choice)
-    else:
-        st.error("❌ Доступ запрещен")
-elif page == "admin":
-    if user_role == "admin":
-        show_admin_panel(lang_choice)
-    else:
-        st.error("❌ Доступ запрещен. Требуются права администратора.")
+if page not in allowed_keys:
+    st.error("❌ Доступ запрещен")
 else:
-    st.warning("Страница не найдена")
\ No newline at end of file
+    render_page(page, lang_choice)
+
+# Трасса запросов запуска (только для админов)
+if user_role == "admin":
+    trace = current_trace()
+    with st.expander(f"🔎 Запросы к БД за этот запуск: {len(trace)}, "
+                     f"{sum(rec.ms for rec in trace):.0f} мс"):
+        if trace:
+            st.dataframe([{
+                "таблица": rec.table, "операция": rec.method, "фильтры": rec.filters,
+                "строк": rec.rows, "байт": rec.nbytes, "мс": round(rec.ms, 1), "ошибка": rec.error,
+            } for rec in trace], use_container_width=True, hide_index=True)
+        else:
+            st.caption("Запросов не было: данные взяты из кэша")
+
+# Остальные доступные страницы догружаются в фоне, пока пользователь смотрит текущую
+prewarm_pages(page_keys)
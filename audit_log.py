@@ -0,0 +1,155 @@
+# audit_log.py - Фоновая пакетная запись журнала активности
+import atexit
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import streamlit as st
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+# Максимум записей в очереди; при переполнении новые записи отбрасываются
+AUDIT_QUEUE_SIZE = 10_000
+
+# Сброс пакета: по достижении размера или по таймеру (секунды)
+AUDIT_BATCH_SIZE = 200
+AUDIT_FLUSH_INTERVAL = 2.0
+
+# Сколько ждать дозаписи при остановке процесса (секунды)
+AUDIT_SHUTDOWN_TIMEOUT = 5.0
+
+
+# =================================================================
+# === ФОНОВЫЙ ПИСАТЕЛЬ ===
+# =================================================================
+
+class AuditLogWriter:
+    """
+    Очередь записей activity_logs и фоновый поток, который вставляет их
+    пакетами. Вызывающий код только кладёт запись в очередь и не ждёт БД.
+    При переполнении запись отбрасывается и учитывается в счётчике dropped.
+    """
+
+    def __init__(self, client, batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_interval: float = AUDIT_FLUSH_INTERVAL, max_queue: int = AUDIT_QUEUE_SIZE):
+        self._client = client
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {'enqueued': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0}
+        self.last_error: Optional[str] = None
+
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def enqueue(self, record: Dict) -> bool:
+        """Кладёт запись в очередь; False — очередь переполнена"""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('enqueued')
+        return True
+
+    def _drain(self, timeout: float) -> List[Dict]:
+        """Собирает пакет: ждёт первую запись не дольше timeout, остальные — без ожидания"""
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=max(remaining, 0)) if remaining > 0
+                             else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict]):
+        try:
+            self._client.table('activity_logs').insert(batch).execute()
+            self._count('written', len(batch))
+            self._count('batches')
+            return
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Ошибка пакетной записи журнала ({len(batch)} записей): {e}")
+
+        # Одна некорректная запись не должна терять весь пакет
+        for record in batch:
+            try:
+                self._client.table('activity_logs').insert(record).execute()
+                self._count('written')
+            except Exception as e:
+                self._count('failed')
+                self.last_error = str(e)
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._drain(self._flush_interval)
+            if batch:
+                self._write(batch)
+
+    def flush(self):
+        """Синхронно записывает всё, что накопилось в очереди"""
+        while True:
+            batch = self._drain(0)
+            if not batch:
+                break
+            self._write(batch)
+
+    def close(self):
+        """Останавливает поток и дописывает остаток очереди"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(AUDIT_SHUTDOWN_TIMEOUT)
+        self.flush()
+
+    def stats(self) -> Dict:
+        """Счётчики записи и текущая длина очереди"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+
+@st.cache_resource
+def get_audit_writer() -> Optional[AuditLogWriter]:
+    """Один писатель журнала на процесс"""
+    from database_supabase import init_supabase
+
+    client = init_supabase()
+    if client is None:
+        return None
+    return AuditLogWriter(client)
+
+
+def enqueue_activity(user_id: str, action: str, details: Optional[str] = "",
+                     metadata: Optional[Dict] = None) -> bool:
+    """Ставит запись activity_logs в очередь фоновой записи"""
+    writer = get_audit_writer()
+    if writer is None:
+        return False
+
+    # Одинаковый набор колонок у всех записей — пакет вставляется одним запросом
+    record = {
+        'user_id': user_id,
+        'action': action,
+        'details': details,
+        'metadata': json.dumps(metadata) if metadata else None,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+    return writer.enqueue(record)
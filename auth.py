@@ -1,16 +1,19 @@
 # auth.py - Улучшенная аутентификация с Supabase
 import streamlit as st
-import hashlib
 import secrets
-from datetime import datetime, timedelta
-from supabase import create_client, Client
-from typing import Optional, Dict, Any
+from datetime import datetime
+from typing import Optional, Dict, Any, List
 import time
+from audit_log import enqueue_activity
+from passwords import hash_password, verify_password
+from rate_limit import get_login_limiter, get_client_id
+from permissions import RoleMatrix, get_role_registry
+from connection import ClientProxy
+from database_supabase import init_supabase
+from sessions import SESSION_TTL, get_session_store
 
-# Подключение к Supabase
-SUPABASE_URL = st.secrets["supabase"]["url"]
-SUPABASE_KEY = st.secrets["supabase"]["key"]
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Подключение к Supabase: общий клиент процесса, создаётся при первом запросе
+supabase = ClientProxy(init_supabase)
 
 # Определение ролей и их прав доступа
 ROLES = {
@@ -45,9 +48,49 @@ def get_cached_user_data(user_id: str):
         return None
 
 
-def hash_password(password: str) -> str:
-    """Хеширование пароля с солью"""
-    return hashlib.sha256(password.encode()).hexdigest()
+# Хеш для выравнивания времени ответа, когда пользователь не найден
+_DUMMY_PASSWORD_HASH = hash_password(secrets.token_urlsafe(16))
+
+# None — ещё не известно, есть ли в БД функция create_login_session (sql/login_session.sql)
+_login_rpc_available: Optional[bool] = None
+
+
+def _create_login_session(user_id: str, session_token: str, expires_at: datetime,
+                          new_password_hash: Optional[str] = None):
+    """
+    Сессия + last_login (+ перехешированный пароль) одним RPC-вызовом.
+    Если функции в БД нет, те же шаги выполняются двумя запросами.
+    """
+    global _login_rpc_available
+
+    if _login_rpc_available is not False:
+        try:
+            supabase.rpc("create_login_session", {
+                "p_user_id": user_id,
+                "p_session_token": session_token,
+                "p_expires_at": expires_at.isoformat(),
+                "p_password_hash": new_password_hash
+            }).execute()
+            _login_rpc_available = True
+            return
+        except Exception as e:
+            # PGRST202 — функция не найдена в схеме PostgREST
+            if getattr(e, "code", None) == "PGRST202":
+                _login_rpc_available = False
+            else:
+                raise
+
+    supabase.table("user_sessions").insert({
+        "user_id": user_id,
+        "session_token": session_token,
+        "expires_at": expires_at.isoformat(),
+        "is_active": True
+    }).execute()
+
+    user_update = {"last_login": datetime.utcnow().isoformat()}
+    if new_password_hash:
+        user_update["password_hash"] = new_password_hash
+    supabase.table("users").update(user_update).eq("user_id", user_id).execute()
 
 
 def validate_email(email: str) -> bool:
@@ -69,16 +112,8 @@ def validate_password_strength(password: str) -> tuple[bool, str]:
 
 
 def log_activity(user_id: str, action: str, details: Optional[str] = "", ip_address: Optional[str] = None):
-    """Логирование активности пользователя"""
-    try:
-        supabase.table("activity_logs").insert({
-            "user_id": user_id,
-            "action": action,
-            "details": details,
-            "timestamp": datetime.utcnow().isoformat()
-        }).execute()
-    except Exception as e:
-        st.error(f"Ошибка логирования: {e}")
+    """Логирование активности пользователя (запись в фоне, без ожидания БД)"""
+    enqueue_activity(user_id, action, details)
 
 
 def authenticate_user(email: str, password: str) -> Dict[str, Any]:
@@ -91,37 +126,40 @@ def authenticate_user(email: str, password: str) -> Dict[str, Any]:
     if not password:
         return {"authenticated": False, "error": "Пароль не может быть пустым"}
 
-    password_hash = hash_password(password)
+    # Лимит попыток проверяется до БД и KDF: отклонённая попытка ничего не стоит
+    limiter = get_login_limiter()
+    allowed, retry_after = limiter.check(email, get_client_id())
+    if not allowed:
+        return {"authenticated": False,
+                "error": f"Слишком много попыток входа. Повторите через {int(retry_after) + 1} с"}
 
     try:
-        # Получение пользователя из БД
+        # Запрос 1: пользователь по email (соль хранится в хеше, поэтому сравнение — в приложении)
         user_data = supabase.table("users") \
-            .select("*") \
+            .select("user_id, email, full_name, role, department, password_hash") \
             .eq("email", email) \
-            .eq("password_hash", password_hash) \
             .eq("is_active", True) \
             .execute()
 
-        if user_data.data and len(user_data.data) > 0:
-            user = user_data.data[0]
+        user = user_data.data[0] if user_data.data else None
+        password_ok, needs_rehash = verify_password(
+            password, user["password_hash"] if user else _DUMMY_PASSWORD_HASH
+        )
 
+        if user and password_ok:
             # Создание сессии
             session_token = secrets.token_urlsafe(32)
-            expires_at = datetime.utcnow() + timedelta(hours=8)
+            expires_at = datetime.utcnow() + SESSION_TTL
 
-            supabase.table("user_sessions").insert({
-                "user_id": user["user_id"],
-                "session_token": session_token,
-                "expires_at": expires_at.isoformat(),
-                "is_active": True
-            }).execute()
-
-            # Обновление времени последнего входа
-            supabase.table("users").update({
-                "last_login": datetime.utcnow().isoformat()
-            }).eq("user_id", user["user_id"]).execute()
+            # Запрос 2: сессия, last_login и прозрачная миграция старого хеша
+            _create_login_session(
+                user["user_id"], session_token, expires_at,
+                hash_password(password) if needs_rehash else None
+            )
+            get_session_store(supabase).remember(session_token, user["user_id"], expires_at)
+            limiter.on_success(email)
 
-            # Логирование успешного входа
+            # Логирование успешного входа (в фоне, см. audit_log)
             log_activity(user["user_id"], "login", f"Успешный вход с email: {email}")
 
             return {
@@ -143,18 +181,34 @@ def authenticate_user(email: str, password: str) -> Dict[str, Any]:
         return {"authenticated": False, "error": "Ошибка подключения к серверу"}
 
 
+def get_role_matrix() -> RoleMatrix:
+    """Текущая матрица прав (роли из таблицы roles или встроенные ROLES)"""
+    return get_role_registry(supabase, ROLES).current()
+
+
 def check_permission(user_role: str, permission: str) -> bool:
-    """Проверка прав доступа с валидацией"""
-    if user_role not in ROLES:
-        return False
+    """Проверка прав доступа (админ имеет все права)"""
+    return get_role_matrix().has(user_role, permission)
 
-    permissions = ROLES[user_role]["permissions"]
 
-    # Админ имеет все права
-    if "all" in permissions:
-        return True
+def allowed_pages(user_role: str, page_keys: List[str]) -> List[str]:
+    """Какие из страниц доступны роли — одной проверкой для всего меню"""
+    return get_role_matrix().allowed_pages(user_role, page_keys)
 
-    return permission in permissions
+
+def get_role_name(user_role: str, lang: str = "ru") -> str:
+    """Название роли на выбранном языке"""
+    return get_role_matrix().role_name(user_role, lang)
+
+
+def validate_session(user: Dict[str, Any]) -> bool:
+    """Проверка, что токен сессии пользователя не истёк и не отозван"""
+    try:
+        return get_session_store(supabase).validate(user.get("session_token"), user.get("id"))
+    except Exception as e:
+        # БД недоступна: не выкидываем пользователя из-за сетевого сбоя
+        print(f"Ошибка проверки сессии: {e}")
+        return True
 
 
 def logout_user():
@@ -167,13 +221,10 @@ def logout_user():
             # Логирование выхода
             log_activity(user_id, "logout", "Выход из системы")
 
-            # Деактивация сессии
+            # Деактивация сессии (в других процессах — при следующем опросе)
             if session_token:
                 try:
-                    supabase.table("user_sessions") \
-                        .update({"is_active": False}) \
-                        .eq("session_token", session_token) \
-                        .execute()
+                    get_session_store(supabase).revoke(session_token)
                 except Exception as e:
                     st.error(f"Ошибка при завершении сессии: {e}")
 
@@ -425,9 +476,7 @@ def show_login_page(lang_choice="ru"):
 
 def get_user_permissions(user_role: str) -> list:
     """Получить список разрешений для роли"""
-    if user_role not in ROLES:
-        return []
-    return ROLES[user_role]["permissions"]
+    return get_role_matrix().permissions(user_role)
 
 def get_all_users():
     """Получить список всех пользователей"""
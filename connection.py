@@ -0,0 +1,287 @@
+# connection.py - Один клиент Supabase на процесс: keep-alive, пассивный health
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import httpx
+from supabase import AsyncClient, AsyncClientOptions, Client, ClientOptions, acreate_client, create_client
+
+from query_trace import record_http_exchange
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+# Пул HTTP-соединений к Supabase (PostgREST, Auth, Storage через один httpx.Client)
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE = 10
+HTTP_KEEPALIVE_EXPIRY = 60.0  # секунды простоя до закрытия соединения
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+# Сколько ошибок подряд переводят подключение в состояние "down"
+HEALTH_DOWN_AFTER = 3
+
+
+# =================================================================
+# === УЧЁТ ЗАПРОСОВ И СОЕДИНЕНИЙ ===
+# =================================================================
+
+class ConnectionStats:
+    """
+    Счётчики реального трафика: запросы, новые TCP/TLS соединения, ошибки.
+    Health выводится из них, отдельных проверочных запросов нет.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.last_ok: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[float] = None
+
+    def on_trace(self, event: str, info: Dict):
+        # События httpcore: новое соединение и TLS-рукопожатие
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+        elif event == "connection.start_tls.complete":
+            with self._lock:
+                self.tls_handshakes += 1
+
+    def on_result(self, error: Optional[BaseException] = None, server_error: bool = False):
+        with self._lock:
+            self.requests += 1
+            if error is None and not server_error:
+                self.consecutive_failures = 0
+                self.last_ok = time.time()
+                return
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = str(error) if error else "HTTP 5xx"
+            self.last_error_at = time.time()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            if self.requests == 0:
+                status = "unknown"
+            elif self.consecutive_failures >= HEALTH_DOWN_AFTER:
+                status = "down"
+            elif self.consecutive_failures:
+                status = "degraded"
+            else:
+                status = "ok"
+            reused = self.requests - self.connections_opened
+            return {
+                "status": status,
+                "requests": self.requests,
+                "failures": self.failures,
+                "consecutive_failures": self.consecutive_failures,
+                "connections_opened": self.connections_opened,
+                "tls_handshakes": self.tls_handshakes,
+                "reuse_ratio": reused / self.requests if self.requests else None,
+                "last_ok": self.last_ok,
+                "last_error": self.last_error,
+                "last_error_at": self.last_error_at,
+            }
+
+
+class _MeasuredStream(httpx.SyncByteStream):
+    """Тело ответа: считает байты и записывает запрос в трассу при закрытии"""
+
+    def __init__(self, stream, on_close: Callable[[int], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._nbytes = 0
+        self._closed = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._nbytes += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close(self._nbytes)
+
+
+class _AsyncMeasuredStream(httpx.AsyncByteStream):
+    """Асинхронный вариант _MeasuredStream"""
+
+    def __init__(self, stream, on_close: Callable[[int], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._nbytes = 0
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._nbytes += len(chunk)
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close(self._nbytes)
+
+
+class _TrackingTransport(httpx.HTTPTransport):
+    """
+    HTTP-транспорт с keep-alive пулом: считает запросы и новые соединения,
+    пишет каждый запрос (таблица, фильтры, строки, байты, время) в query_trace
+    """
+
+    def __init__(self, stats: ConnectionStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions["trace"] = self._stats.on_trace
+        started = time.perf_counter()
+        try:
+            response = super().handle_request(request)
+        except Exception as e:
+            self._stats.on_result(error=e)
+            record_http_exchange(request, None, started, None, error=e)
+            raise
+        self._stats.on_result(server_error=response.status_code >= 500)
+        # Длительность записывается при закрытии потока — вместе с чтением тела
+        response.stream = _MeasuredStream(
+            response.stream, lambda nbytes: record_http_exchange(request, response, started, nbytes))
+        return response
+
+
+class _AsyncTrackingTransport(httpx.AsyncHTTPTransport):
+    """Асинхронный вариант _TrackingTransport (для database_async)"""
+
+    def __init__(self, stats: ConnectionStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    async def _on_trace(self, event: str, info: Dict):
+        # httpcore ждёт корутину от trace в асинхронном режиме
+        self._stats.on_trace(event, info)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions["trace"] = self._on_trace
+        started = time.perf_counter()
+        try:
+            response = await super().handle_async_request(request)
+        except Exception as e:
+            self._stats.on_result(error=e)
+            record_http_exchange(request, None, started, None, error=e)
+            raise
+        self._stats.on_result(server_error=response.status_code >= 500)
+        response.stream = _AsyncMeasuredStream(
+            response.stream, lambda nbytes: record_http_exchange(request, response, started, nbytes))
+        return response
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY)
+
+
+# =================================================================
+# === МЕНЕДЖЕР ПОДКЛЮЧЕНИЯ ===
+# =================================================================
+
+class ConnectionManager:
+    """
+    Лениво создаёт один supabase.Client поверх общего httpx.Client
+    с пулом keep-alive соединений. Клиент создаётся при первом обращении
+    к .client, без проверочного запроса; состояние — health().
+    """
+
+    def __init__(self, config_loader: Callable[[], Optional[Dict]]):
+        self._config_loader = config_loader
+        self._client: Optional[Client] = None
+        self._http: Optional[httpx.Client] = None
+        self._lock = threading.Lock()
+        self.stats = ConnectionStats()
+
+    @property
+    def client(self) -> Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create()
+        return self._client
+
+    def _create(self) -> Client:
+        config = self._config_loader() or {}
+        if not config.get("url") or not config.get("key"):
+            raise RuntimeError("Конфигурация Supabase не найдена (url/key)")
+
+        transport = _TrackingTransport(self.stats, limits=_pool_limits(), http2=True)
+        self._http = httpx.Client(transport=transport, timeout=HTTP_TIMEOUT, follow_redirects=True)
+        return create_client(config["url"], config["key"], options=ClientOptions(httpx_client=self._http))
+
+    async def create_async_client(self) -> AsyncClient:
+        """
+        Асинхронный клиент для database_async: свой пул (httpx.AsyncClient
+        живёт в event loop фонового потока), общий учёт запросов и health.
+        """
+        config = self._config_loader() or {}
+        if not config.get("url") or not config.get("key"):
+            raise RuntimeError("Конфигурация Supabase не найдена (url/key)")
+        transport = _AsyncTrackingTransport(self.stats, limits=_pool_limits(), http2=True)
+        http = httpx.AsyncClient(transport=transport, timeout=HTTP_TIMEOUT, follow_redirects=True)
+        return await acreate_client(config["url"], config["key"], options=AsyncClientOptions(httpx_client=http))
+
+    @property
+    def is_initialized(self) -> bool:
+        return self._client is not None
+
+    def health(self) -> Dict:
+        """Состояние по последним реальным запросам (без обращения к сети)"""
+        return self.stats.snapshot()
+
+    def close(self):
+        with self._lock:
+            if self._http is not None:
+                self._http.close()
+            self._client = None
+            self._http = None
+
+
+_manager: Optional[ConnectionManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_connection_manager() -> ConnectionManager:
+    """Менеджер подключения процесса (работает и вне Streamlit, например в mqtt_client)"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                from database_supabase import get_supabase_config
+                _manager = ConnectionManager(get_supabase_config)
+    return _manager
+
+
+class ClientProxy:
+    """
+    Заменяет модульные create_client(...): атрибуты (table, rpc, auth...)
+    берутся у клиента, который resolve() возвращает в момент обращения.
+    """
+
+    def __init__(self, resolve: Callable):
+        self._resolve = resolve
+
+    def __getattr__(self, name):
+        client = self._resolve()
+        if client is None:
+            raise RuntimeError("Подключение к базе данных недоступно")
+        return getattr(client, name)
@@ -1,8 +1,37 @@
 # Meat_Digitalization/data_loader.py
-import pandas as pd
+import argparse
+import codecs
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+import pyarrow as pa
+import pyarrow.parquet as pq
 import streamlit as st
-import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка таблицы только внутри процесса
+    fcntl = None
+
+# Кэшированные кадры отдаются сессиям неглубокими копиями (ParquetTableStore.read,
+# load_all_data): это безопасно только при copy-on-write — по умолчанию с pandas 3,
+# в pandas 2.x включается явно, иначе запись .loc[...] = изменила бы общий кадр
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+from data_schema import (DatasetSchema, MEASUREMENTS, PH_EXPERIMENTS, PRODUCTS, SAMPLES, SHEET_SCHEMAS,
+                         apply_schema)
+from xlsx_cache import to_arrow, read_workbook
 
 # ---------------------------
 # Конфигурация файлов/папок
@@ -15,6 +44,33 @@ SAMPLES_CSV = BASE_DIR / "Samples.csv"
 MEASUREMENTS_CSV = BASE_DIR / "Measurements.csv"
 SHEET_NAME = "T6"
 
+# Хранилище таблиц опытов: "parquet" (по умолчанию) или прежний "excel"
+DATA_STORE_MODE = "parquet"
+DATA_STORE_DIR = BASE_DIR / "data_store"
+
+# После стольких добавленных частей таблица сжимается в один файл
+COMPACT_AFTER_PARTS = 16
+
+# Имена таблиц в хранилище: листы meat_data.xlsx и opyty.xlsx
+MEAT_DATA_PREFIX = "meat_data"
+OPYTY_TABLE = "opyty"
+
+MEAT_DATA_COLUMNS = ["BatchID", "mass_kg", "T_initial_C", "Salt_pct", "Moisture_pct", "StarterCFU", "Extract_pct"]
+
+
+def get_data_store_settings() -> Dict:
+    """Настройки: секция [data_store] в secrets или переменные окружения"""
+    settings = {
+        'mode': os.getenv('ZHAYA_DATA_STORE', DATA_STORE_MODE),
+        'path': os.getenv('ZHAYA_DATA_STORE_DIR', str(DATA_STORE_DIR)),
+    }
+    try:
+        if hasattr(st, 'secrets') and 'data_store' in st.secrets:
+            settings.update(dict(st.secrets['data_store']))
+    except Exception:
+        pass
+    return settings
+
 
 def safe_read_excel(path, sheet_name):
     """
@@ -25,22 +81,21 @@ def safe_read_excel(path, sheet_name):
             df = pd.read_excel(path, sheet_name=sheet_name)
         except ValueError:
             st.warning(f"⚠️ Лист '{sheet_name}' не найден. Создаётся новый.")
-            df = pd.DataFrame(
-                columns=["BatchID", "mass_kg", "T_initial_C", "Salt_pct", "Moisture_pct", "StarterCFU", "Extract_pct"])
+            df = pd.DataFrame(columns=MEAT_DATA_COLUMNS)
             with pd.ExcelWriter(path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
                 df.to_excel(writer, index=False, sheet_name=sheet_name)
         return df
     else:
         st.warning(f"⚠️ Файл {path} не найден. Создаётся новый.")
-        df = pd.DataFrame(
-            columns=["BatchID", "mass_kg", "T_initial_C", "Salt_pct", "Moisture_pct", "StarterCFU", "Extract_pct"])
+        df = pd.DataFrame(columns=MEAT_DATA_COLUMNS)
         df.to_excel(path, index=False, sheet_name=sheet_name)
         return df
 
 
 def append_row_excel(path, sheet_name, new_row):
     """
-    Добавляет новую строку в указанный лист Excel.
+    Добавляет новую строку в указанный лист Excel (режим "excel").
+    Перечитывает и переписывает весь лист — O(размер файла).
     """
     df = safe_read_excel(path, sheet_name)
     df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
@@ -48,69 +103,605 @@ def append_row_excel(path, sheet_name, new_row):
         df.to_excel(writer, index=False, sheet_name=sheet_name)
 
 
-def safe_read_csv(path: Path):
+# ---------------------------
+# Чтение CSV: кодировка определяется один раз, большие файлы — частями
+# ---------------------------
+CSV_ENCODINGS = ['utf-8-sig', 'utf-8', 'windows-1251', 'latin1']
+
+# Кодировка определяется по началу файла такого размера
+CSV_SNIFF_BYTES = 64 * 1024
+
+# Файлы больше этого читаются частями по CSV_CHUNK_ROWS строк
+CSV_CHUNK_MIN_BYTES = 32 * 2 ** 20
+CSV_CHUNK_ROWS = 100_000
+
+# Схемы CSV-таблиц по пути
+CSV_SCHEMAS = {PRODUCTS_CSV: PRODUCTS, SAMPLES_CSV: SAMPLES, MEASUREMENTS_CSV: MEASUREMENTS}
+
+# Подсказки типов по именам колонок: повторяющиеся текстовые метки
+# (category в схемах) читаются сразу как category — коды вместо строк
+# в каждой строке, что важно при чтении по частям
+CSV_DTYPE_HINTS = {
+    column: 'category'
+    for schema in CSV_SCHEMAS.values() for column, spec in schema.columns.items() if spec.dtype == 'category'
+}
+
+# Путь -> (подпись файла, кодировка). Подпись (mtime, размер) меняется при замене
+# файла: выгрузка в другой кодировке определяется заново, а не читается
+# прежней однобайтовой кодировкой, которая не даёт ошибки и портит текст
+_csv_encodings: Dict[str, tuple] = {}
+
+
+def detect_encoding(path: Path) -> str:
+    """Кодировка по первым CSV_SNIFF_BYTES байтам, содержащим не-ASCII символы"""
+    with open(path, 'rb') as f:
+        sample = f.read(CSV_SNIFF_BYTES)
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        # По ASCII-началу кодировку не отличить: ищется первый блок с не-ASCII
+        # байтами (сырое чтение, без разбора CSV)
+        while sample.isascii():
+            block = f.read(1 << 20)
+            if not block:
+                return 'utf-8'
+            if not block.isascii():
+                start = re.search(rb'[\x80-\xff]', block).start()
+                sample = block[start:start + CSV_SNIFF_BYTES]
+    for encoding in CSV_ENCODINGS[1:]:
+        try:
+            # final=False: образец может оборвать многобайтный символ
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return CSV_ENCODINGS[-1]
+
+
+def _concat_chunks(chunks: List[pd.DataFrame]) -> pd.DataFrame:
+    """Склейка частей с объединением категорий (обычный concat превратил бы их в object)"""
+    if len(chunks) == 1:
+        return chunks[0]
+    categorical = [column for column, dtype in chunks[0].dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+    df = pd.concat([chunk.drop(columns=categorical) for chunk in chunks], ignore_index=True)
+    for column in categorical:
+        df[column] = union_categoricals([chunk[column] for chunk in chunks])
+    return df[chunks[0].columns]
+
+
+def _read_csv_with(path: Path, encoding: str, dtype: Optional[Dict]) -> pd.DataFrame:
+    header = pd.read_csv(path, encoding=encoding, nrows=0).columns
+    hints = {column: CSV_DTYPE_HINTS[column] for column in header if column in CSV_DTYPE_HINTS}
+    hints.update(dtype or {})
+
+    if path.stat().st_size < CSV_CHUNK_MIN_BYTES:
+        return pd.read_csv(path, encoding=encoding, dtype=hints or None)
+    # Частями: в памяти одновременно одна разбираемая часть плюс уже сжатые
+    with pd.read_csv(path, encoding=encoding, dtype=hints or None, chunksize=CSV_CHUNK_ROWS) as reader:
+        return _concat_chunks(list(reader))
+
+
+def safe_read_csv(path: Path, dtype: Optional[Dict] = None):
     """
-    Безопасно читает CSV-файл, пробуя различные кодировки.
+    Безопасно читает CSV-файл. Кодировка определяется по началу файла
+    и запоминается для версии файла, поэтому он читается за один проход; к другой
+    кодировке чтение переходит, только если она не подошла всему файлу.
     """
     if not path.exists():
         return pd.DataFrame()
-    encodings = ['utf-8-sig', 'utf-8', 'windows-1251', 'latin1']
-    for enc in encodings:
+
+    key = str(path)
+    signature = file_signature(path)
+    cached = _csv_encodings.get(key)
+    first = cached[1] if cached is not None and cached[0] == signature else detect_encoding(path)
+    # utf-8-sig отличается от utf-8 только BOM, который detect_encoding уже проверил
+    for encoding in [first] + [enc for enc in CSV_ENCODINGS[1:] if enc != first]:
         try:
-            return pd.read_csv(path, encoding=enc)
-        except (UnicodeDecodeError, pd.errors.ParserError):
+            df = _read_csv_with(path, encoding, dtype)
+        except UnicodeDecodeError:
             continue
+        except (pd.errors.ParserError, pd.errors.EmptyDataError):
+            return pd.DataFrame()
+        _csv_encodings[key] = (signature, encoding)
+        return df
     return pd.DataFrame()
 
+# ---------------------------
+# Колоночное хранилище таблиц опытов (Parquet, только добавление)
+# ---------------------------
+# Таблица — каталог <root>/<имя>/ с файлами:
+#   base-<ключ>.parquet  — сжатое содержимое всех частей с ключом <= <ключ>
+#   part-<ключ>.parquet  — добавленные строки
+# Ключ — время в наносекундах + pid + случайный суффикс, поэтому имена
+# упорядочены по времени и не пересекаются между процессами. Файл пишется
+# во временный и атомарно переименовывается: существующие файлы никогда
+# не переписываются, добавление не зависит от размера таблицы.
+# Запись (добавление, сжатие, замена) идёт под блокировкой файла
+# <таблица>/.lock: иначе сжатие, перечислившее файлы до появления
+# ещё пишущейся части с меньшим ключом, скрыло бы и удалило её.
+
+def _new_key() -> str:
+    return f"{time.time_ns():020d}-{os.getpid()}-{secrets.token_hex(3)}"
 
-@st.cache_data(ttl=600) # Кэширование на 10 минут
-def load_all_data():
+
+class ParquetTableStore:
+    """
+    Таблицы опытов в Parquet: O(1) добавление строк, чтение через pyarrow.
+    Прочитанные таблицы кэшируются по списку файлов: файлы неизменяемы,
+    поэтому после добавления строки дочитываются только новые части.
+    """
+
+    def __init__(self, root: Union[str, Path] = DATA_STORE_DIR, compact_after: int = COMPACT_AFTER_PARTS):
+        self.root = Path(root)
+        self.compact_after = compact_after
+        # таблица -> (имена файлов, Arrow-таблица, {имя схемы или None: DataFrame})
+        self._cache: Dict[str, tuple] = {}
+        self._cache_lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self.reads = {"cached": 0, "incremental": 0, "full": 0}
+
+    def _dir(self, table: str) -> Path:
+        return self.root / table
+
+    @contextmanager
+    def _locked(self, table: str):
+        """Исключительная блокировка записи в таблицу (между потоками и процессами)"""
+        directory = self._dir(table)
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._write_lock, open(directory / ".lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def tables(self, prefix: str = "") -> List[str]:
+        """Имена таблиц (с подкаталогами, например 'meat_data/T6')"""
+        base = self.root / prefix if prefix else self.root
+        if not base.exists():
+            return []
+        names = {path.parent.relative_to(self.root).as_posix() for path in base.rglob("*.parquet")}
+        return sorted(names)
+
+    def exists(self, table: str) -> bool:
+        return bool(self._files(table))
+
+    def _files(self, table: str) -> List[Path]:
+        """Актуальные файлы таблицы: последний base и части после него"""
+        directory = self._dir(table)
+        if not directory.exists():
+            return []
+        bases, parts = [], []
+        for path in directory.glob("*.parquet"):
+            kind, _, key = path.stem.partition("-")
+            (bases if kind == "base" else parts).append((key, path))
+        base_key = max(bases)[0] if bases else ""
+        files = [max(bases)[1]] if bases else []
+        files += [path for key, path in sorted(parts) if key > base_key]
+        return files
+
+    def _write(self, table: str, kind: str, data: pa.Table, key: Optional[str] = None) -> Path:
+        directory = self._dir(table)
+        directory.mkdir(parents=True, exist_ok=True)
+        target = directory / f"{kind}-{key or _new_key()}.parquet"
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".write-", suffix=".tmp")
+        os.close(fd)
+        try:
+            pq.write_table(data, tmp)
+            os.replace(tmp, target)
+        except Exception:
+            os.unlink(tmp)
+            raise
+        return target
+
+    def read_arrow(self, table: str) -> Optional[pa.Table]:
+        with self._cache_lock:
+            # Файл может исчезнуть между листингом и чтением (сжатие другим процессом)
+            for attempt in range(3):
+                files = self._files(table)
+                if not files:
+                    self._cache.pop(table, None)
+                    return None
+                names = tuple(path.name for path in files)
+                cached = self._cache.get(table)
+                if cached is not None and cached[0] == names:
+                    self.reads["cached"] += 1
+                    return cached[1]
+
+                # Тот же base и прежние части плюс новые — дочитываются только новые
+                incremental = cached is not None and names[:len(cached[0])] == cached[0]
+                new_files = files[len(cached[0]):] if incremental else files
+                try:
+                    parts = [pq.read_table(path) for path in new_files]
+                except FileNotFoundError:
+                    if attempt == 2:
+                        raise
+                    continue
+                if incremental:
+                    parts.insert(0, cached[1])
+                data = pa.concat_tables(parts, promote_options="permissive") if len(parts) > 1 else parts[0]
+                self._cache[table] = (names, data, {})
+                self.reads["incremental" if incremental else "full"] += 1
+                return data
+
+    def read(self, table: str, schema: Optional[DatasetSchema] = None) -> pd.DataFrame:
+        """
+        Таблица как DataFrame. Возвращается неглубокая копия кэшированного
+        кадра: при copy-on-write pandas изменения не затрагивают кэш.
+        Схема (data_schema) применяется один раз на версию таблицы.
+        """
+        with self._cache_lock:
+            data = self.read_arrow(table)
+            if data is None:
+                return pd.DataFrame()
+            frames = self._cache[table][2]
+            key = schema.name if schema is not None else None
+            frame = frames.get(key)
+            if frame is None:
+                frame = apply_schema(data.to_pandas(), schema)
+                frames[key] = frame
+            return frame.copy(deep=False)
+
+    def append(self, table: str, rows: Union[Dict, List[Dict], pd.DataFrame]):
+        """Добавляет строки одним новым файлом; схема должна быть совместима с таблицей"""
+        if isinstance(rows, dict):
+            rows = [rows]
+        data = to_arrow(rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows))
+
+        with self._locked(table):
+            files = self._files(table)
+            if files:
+                # Проверка по схемам (только метаданные): несовместимая строка
+                # не должна попасть в таблицу и сломать последующее чтение
+                try:
+                    pa.unify_schemas([pq.read_schema(path) for path in files[-2:]] + [data.schema],
+                                     promote_options="permissive")
+                except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                    raise ValueError(f"Строка несовместима со схемой таблицы '{table}': {e}") from e
+
+            self._write(table, "part", data)
+            if len(files) + 1 > self.compact_after:
+                self._compact(table)
+
+    def replace(self, table: str, df: pd.DataFrame):
+        """Заменяет содержимое таблицы (новый base скрывает все прежние файлы)"""
+        with self._locked(table):
+            previous = list(self._dir(table).glob("*.parquet"))
+            self._write(table, "base", to_arrow(df))
+            self._remove(previous)
+
+    def compact(self, table: str):
+        """Сливает base и части в один base; удаляет слитые файлы"""
+        with self._locked(table):
+            self._compact(table)
+
+    def _compact(self, table: str):
+        files = self._files(table)
+        if len(files) < 2:
+            return
+        data = pa.concat_tables([pq.read_table(path) for path in files], promote_options="permissive")
+        # Ключ нового base — ключ последней слитой части: более поздние части остаются видимыми
+        last_key = files[-1].stem.partition("-")[2]
+        base = self._write(table, "base", data, key=last_key)
+        # Прежние base (и части до них), скрытые ещё до сжатия, тоже больше не нужны
+        hidden = [path for path in self._dir(table).glob("*.parquet")
+                  if path.stem.partition("-")[2] <= last_key]
+        self._remove([path for path in set(files) | set(hidden) if path != base])
+
+    @staticmethod
+    def _remove(paths: List[Path]):
+        for path in paths:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def drop(self, table: str):
+        shutil.rmtree(self._dir(table), ignore_errors=True)
+
+
+@st.cache_resource
+def get_table_store() -> Optional[ParquetTableStore]:
+    """Хранилище таблиц опытов; None — режим "excel" (прежние файлы .xlsx)"""
+    settings = get_data_store_settings()
+    if settings.get('mode') != 'parquet':
+        return None
+    return ParquetTableStore(settings.get('path') or DATA_STORE_DIR)
+
+
+def import_excel(store: ParquetTableStore, meat_path: Path = MEAT_DATA_XLSX, opyty_path: Path = OPYTY_XLSX):
+    """Загружает листы meat_data.xlsx и opyty.xlsx в хранилище (заменяя таблицы)"""
+    imported = []
+    if Path(meat_path).exists():
+        for sheet, df in read_workbook(meat_path).items():
+            store.replace(f"{MEAT_DATA_PREFIX}/{sheet}", df)
+            imported.append(f"{MEAT_DATA_PREFIX}/{sheet}")
+    if Path(opyty_path).exists():
+        store.replace(OPYTY_TABLE, _parse_opyty(opyty_path))
+        imported.append(OPYTY_TABLE)
+    return imported
+
+
+def export_excel(store: ParquetTableStore, meat_path: Path = MEAT_DATA_XLSX, opyty_path: Path = OPYTY_XLSX):
+    """Выгружает таблицы хранилища обратно в Excel (для обмена и ручной правки)"""
+    sheets = store.tables(MEAT_DATA_PREFIX)
+    if sheets:
+        with pd.ExcelWriter(meat_path, engine='openpyxl') as writer:
+            for table in sheets:
+                store.read(table).to_excel(writer, sheet_name=table.split("/", 1)[1], index=False)
+    if store.exists(OPYTY_TABLE):
+        store.read(OPYTY_TABLE).to_excel(opyty_path, index=False)
+
+
+def _default_opyty() -> pd.DataFrame:
+    return pd.DataFrame({
+        'Time_h': [0, 1, 2, 4, 8, 12, 24, 48, 72, 96, 120, 144],
+        'pH_Control': [6.5, 6.4, 6.3, 6.1, 5.8, 5.5, 5.2, 5.1, 5.1, 5.15, 5.2, 5.2],
+        'pH_Extract': [6.5, 6.45, 6.35, 6.2, 5.9, 5.6, 5.4, 5.3, 5.3, 5.35, 5.4, 5.4],
+        'Salt_pct': [2.5] * 12,
+        'Temp_C': [18] * 12
+    })
+
+
+def _default_meat_data() -> pd.DataFrame:
+    return pd.DataFrame({
+        "BatchID": ["B001", "B002", "B003"],
+        "mass_kg": [10.5, 12.0, 9.8],
+        "T_initial_C": [2, 3, 2],
+        "Salt_pct": [3.0, 3.5, 3.2],
+        "Moisture_pct": [72, 70, 71],
+        "StarterCFU": [1e6, 2e6, 1.5e6],
+        "Extract_pct": [0.0, 3.0, 5.0]
+    })
+
+
+def _seed_store(store: ParquetTableStore):
+    """Пустое хранилище заполняется из Excel-файлов, а без них — демонстрационными данными"""
+    if store.tables():
+        return
+    import_excel(store)
+    if not store.tables(MEAT_DATA_PREFIX):
+        store.replace(f"{MEAT_DATA_PREFIX}/{SHEET_NAME}", _default_meat_data())
+    if not store.exists(OPYTY_TABLE):
+        store.replace(OPYTY_TABLE, _default_opyty())
+
+
+def append_row(sheet_name: str, new_row: Dict):
+    """Добавляет строку в таблицу опытов в текущем режиме хранения"""
+    store = get_table_store()
+    if store is None:
+        append_row_excel(MEAT_DATA_XLSX, sheet_name, new_row)
+    else:
+        _seed_store(store)
+        store.append(f"{MEAT_DATA_PREFIX}/{sheet_name}", new_row)
+
+
+# ---------------------------
+# Кэш разобранных файлов по (путь, mtime, размер)
+# ---------------------------
+def file_signature(path: Path) -> Optional[tuple]:
+    """(путь, mtime в нс, размер) или None, если файла нет"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+
+class FileCache:
     """
-    Загружает все данные из файлов Excel и CSV.
-    Кэширует результат для производительности.
+    Результаты разбора файлов. Файл разбирается заново только при смене
+    подписи (mtime или размер); проверка — один os.stat на файл.
     """
+
+    def __init__(self):
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: Path, parse, missing=None):
+        """Результат parse(path); для отсутствующего файла — missing"""
+        signature = file_signature(path)
+        key = str(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+        # Разбор вне блокировки: параллельные запросы других файлов не ждут.
+        # При ошибке разбора кэш не обновляется — исправленный файл прочитается заново
+        value = parse(path) if signature is not None else missing
+        with self._lock:
+            self._entries[key] = (signature, value)
+            self.misses += 1
+        return value
+
+
+@st.cache_resource
+def get_file_cache() -> FileCache:
+    """Один кэш разобранных файлов на процесс"""
+    return FileCache()
+
+
+def _parse_meat_workbook(path: Path) -> Dict[str, pd.DataFrame]:
+    # Листы разбираются параллельно и сохраняются в Feather-копии (см. xlsx_cache)
+    return {sheet: apply_schema(df, SHEET_SCHEMAS.get(sheet)) for sheet, df in read_workbook(path).items()}
+
+
+def _parse_opyty(path: Path) -> pd.DataFrame:
+    return apply_schema(next(iter(read_workbook(path).values()), pd.DataFrame()), PH_EXPERIMENTS)
+
+
+def _parse_csv(path: Path) -> pd.DataFrame:
+    return apply_schema(safe_read_csv(path), CSV_SCHEMAS.get(path))
+
+
+def _load_excel_tables():
+    """Режим "excel": листы читаются из .xlsx, каждый файл — только после его изменения"""
     # Создание фиктивных данных, если их нет
     if not OPYTY_XLSX.exists():
-        temp_df = pd.DataFrame({
-            'Time_h': [0, 1, 2, 4, 8, 12, 24, 48, 72, 96, 120, 144],
-            'pH_Control': [6.5, 6.4, 6.3, 6.1, 5.8, 5.5, 5.2, 5.1, 5.1, 5.15, 5.2, 5.2],
-            'pH_Extract': [6.5, 6.45, 6.35, 6.2, 5.9, 5.6, 5.4, 5.3, 5.3, 5.35, 5.4, 5.4],
-            'Salt_pct': [2.5] * 12,
-            'Temp_C': [18] * 12
-        })
-        temp_df.to_excel(OPYTY_XLSX, index=False)
+        _default_opyty().to_excel(OPYTY_XLSX, index=False)
 
     if not MEAT_DATA_XLSX.exists():
-        temp_df_meat = pd.DataFrame({
-            "BatchID": ["B001", "B002", "B003"],
-            "mass_kg": [10.5, 12.0, 9.8],
-            "T_initial_C": [2, 3, 2],
-            "Salt_pct": [3.0, 3.5, 3.2],
-            "Moisture_pct": [72, 70, 71],
-            "StarterCFU": [1e6, 2e6, 1.5e6],
-            "Extract_pct": [0.0, 3.0, 5.0]
-        })
         with pd.ExcelWriter(MEAT_DATA_XLSX, engine='openpyxl') as writer:
-            temp_df_meat.to_excel(writer, sheet_name=SHEET_NAME, index=False)
+            _default_meat_data().to_excel(writer, sheet_name=SHEET_NAME, index=False)
 
+    cache = get_file_cache()
     data_sheets = {}
     try:
-        if MEAT_DATA_XLSX.exists():
-            xls = pd.ExcelFile(MEAT_DATA_XLSX)
-            for sheet in xls.sheet_names:
-                data_sheets[sheet] = pd.read_excel(xls, sheet_name=sheet, engine='openpyxl')
+        data_sheets = cache.get(MEAT_DATA_XLSX, _parse_meat_workbook, missing={})
     except Exception as e:
         st.warning(f"Не удалось прочитать '{MEAT_DATA_XLSX.name}': {e}")
 
     df_ph = None
-    if OPYTY_XLSX.exists():
+    try:
+        df_ph = cache.get(OPYTY_XLSX, _parse_opyty)
+    except Exception as e:
+        st.warning(f"Не удалось прочитать '{OPYTY_XLSX.name}': {e}")
+
+    return data_sheets, df_ph
+
+
+def _shallow(df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    # Кэшированные кадры отдаются неглубокими копиями: буферы колонок общие
+    # для всех сессий, запись в колонку копирует только её (copy-on-write
+    # включён в начале модуля и для pandas 2.x), а добавление или удаление
+    # колонок не затрагивает общий кадр
+    return None if df is None else df.copy(deep=False)
+
+
+def load_all_data():
+    """
+    Загружает таблицы опытов (хранилище Parquet или файлы Excel) и CSV.
+    Каждый источник разбирается заново только после своего изменения
+    (подпись путь + mtime + размер; для Parquet — список файлов таблицы),
+    поэтому изменения видны сразу, а неизменные файлы не перечитываются.
+    Колонки приведены к компактным типам схем data_schema; нарушения
+    схемы — в df.attrs["schema_issues"].
+
+    Кадры разбираются один раз на процесс (кэши — st.cache_resource) и
+    отдаются всем сессиям как представления без копирования данных, поэтому
+    память не растёт с числом пользователей. Копировать результат перед
+    изменением не нужно: изменённые колонки копируются автоматически.
+    """
+    store = get_table_store()
+    if store is None:
+        data_sheets, df_ph = _load_excel_tables()
+    else:
         try:
-            df_ph = pd.read_excel(OPYTY_XLSX, engine='openpyxl')
+            _seed_store(store)
+            data_sheets = {}
+            for table in store.tables(MEAT_DATA_PREFIX):
+                sheet = table.split("/", 1)[1]
+                data_sheets[sheet] = store.read(table, SHEET_SCHEMAS.get(sheet))
+            df_ph = store.read(OPYTY_TABLE, PH_EXPERIMENTS) if store.exists(OPYTY_TABLE) else None
         except Exception as e:
-            st.warning(f"Не удалось прочитать '{OPYTY_XLSX.name}': {e}")
+            st.warning(f"Хранилище таблиц недоступно ({e}), данные читаются из Excel")
+            data_sheets, df_ph = _load_excel_tables()
 
-    products_df = safe_read_csv(PRODUCTS_CSV)
-    samples_df = safe_read_csv(SAMPLES_CSV)
-    measurements_df = safe_read_csv(MEASUREMENTS_CSV)
+    cache = get_file_cache()
+    products_df, samples_df, measurements_df = (
+        cache.get(path, _parse_csv, missing=pd.DataFrame())
+        for path in (PRODUCTS_CSV, SAMPLES_CSV, MEASUREMENTS_CSV)
+    )
 
-    return data_sheets, df_ph, products_df, samples_df, measurements_df
+    return ({sheet: _shallow(df) for sheet, df in data_sheets.items()}, _shallow(df_ph),
+            _shallow(products_df), _shallow(samples_df), _shallow(measurements_df))
+
+
+# ---------------------------
+# Командная строка: импорт/экспорт Excel, сжатие, бенчмарк
+# ---------------------------
+def benchmark(appends: int = 50):
+    """Добавление строк: переписывание листа Excel против части Parquet"""
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx = Path(tmp) / "meat_data.xlsx"
+        with pd.ExcelWriter(xlsx, engine='openpyxl') as writer:
+            for sheet in ("T1", "T2", "T3", SHEET_NAME):
+                pd.concat([_default_meat_data()] * 100, ignore_index=True).to_excel(writer, sheet_name=sheet, index=False)
+        store = ParquetTableStore(Path(tmp) / "store")
+        store.replace(f"{MEAT_DATA_PREFIX}/{SHEET_NAME}", pd.read_excel(xlsx, sheet_name=SHEET_NAME))
+        row = _default_meat_data().iloc[0].to_dict()
+
+        started = time.perf_counter()
+        for _ in range(appends):
+            append_row_excel(xlsx, SHEET_NAME, row)
+        excel_ms = (time.perf_counter() - started) / appends * 1000
+
+        started = time.perf_counter()
+        for _ in range(appends):
+            store.append(f"{MEAT_DATA_PREFIX}/{SHEET_NAME}", row)
+        parquet_ms = (time.perf_counter() - started) / appends * 1000
+
+        started = time.perf_counter()
+        rows = len(store.read(f"{MEAT_DATA_PREFIX}/{SHEET_NAME}"))
+        read_ms = (time.perf_counter() - started) * 1000
+        store.compact(f"{MEAT_DATA_PREFIX}/{SHEET_NAME}")
+        started = time.perf_counter()
+        store.read(f"{MEAT_DATA_PREFIX}/{SHEET_NAME}")
+        compacted_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        pd.read_excel(xlsx, sheet_name=SHEET_NAME)
+        read_excel_ms = (time.perf_counter() - started) * 1000
+
+    print(f"добавление строки: Excel {excel_ms:.1f} мс, Parquet {parquet_ms:.2f} мс ({excel_ms / parquet_ms:.0f}x)")
+    print(f"чтение таблицы ({rows} строк): Excel {read_excel_ms:.1f} мс, Parquet {read_ms:.1f} мс "
+          f"({appends + 1} файлов), после сжатия {compacted_ms:.1f} мс")
+
+
+def benchmark_sessions(sessions: int = 50, rows: int = 200_000):
+    """
+    Память, удерживаемая сессиями: копия данных на сессию (как отдавал
+    st.cache_data — pickle на каждый вызов) против общих кадров с copy-on-write.
+    Каждая десятая сессия изменяет одну колонку.
+    """
+    import pickle
+    import tracemalloc
+    import numpy as np
+
+    rng = np.random.default_rng(3)
+    shared = pd.DataFrame({column: rng.normal(5, 1, rows).astype("float32")
+                           for column in ("pH", "Salt_pct", "Moisture_pct", "mass_kg")})
+    shared["Stage"] = pd.Categorical(rng.choice(["Посол", "Осадка", "Сушка"], rows))
+    blob = pickle.dumps(shared)
+
+    def held_mb(view) -> float:
+        tracemalloc.start()
+        held = []
+        for i in range(sessions):
+            df = view()
+            if i % 10 == 0:
+                df["pH"] = df["pH"].round(2)
+            held.append(df)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return current / 2 ** 20
+
+    copied = held_mb(lambda: pickle.loads(blob))
+    viewed = held_mb(lambda: _shallow(shared))
+    print(f"{sessions} сессий, таблица {shared.memory_usage(deep=True).sum() / 2 ** 20:.1f} МБ: "
+          f"копии {copied:.1f} МБ, общие кадры {viewed:.1f} МБ")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Хранилище таблиц опытов (Parquet)")
+    parser.add_argument("command", choices=["import", "export", "compact", "benchmark", "sessions"])
+    parser.add_argument("--path", default=os.getenv("ZHAYA_DATA_STORE_DIR", str(DATA_STORE_DIR)))
+    args = parser.parse_args()
+
+    table_store = ParquetTableStore(args.path)
+    if args.command == "import":
+        print("Импортировано:", ", ".join(import_excel(table_store)) or "нет файлов Excel")
+    elif args.command == "export":
+        export_excel(table_store)
+        print(f"Таблицы выгружены в {MEAT_DATA_XLSX.name} и {OPYTY_XLSX.name}")
+    elif args.command == "compact":
+        for name in table_store.tables():
+            table_store.compact(name)
+        print(f"Сжато таблиц: {len(table_store.tables())}")
+    elif args.command == "sessions":
+        benchmark_sessions()
+    else:
+        benchmark()
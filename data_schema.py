@@ -0,0 +1,266 @@
+# data_schema.py - Схемы наборов данных опытов: компактные типы и проверка
+import argparse
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+# =================================================================
+# === ОПИСАНИЕ СХЕМ ===
+# =================================================================
+# Типы колонок:
+#   category — повторяющиеся метки (партия в таблице измерений, параметр, этап)
+#   string   — уникальные идентификаторы и свободный текст
+#   float32  — измерения (7 значащих цифр достаточно для pH, массы, процентов)
+#   float64  — коэффициенты моделей, где важна точность
+#   Int16/Int32/Int64 — целые с пропусками (nullable)
+#   datetime — время (datetime64)
+
+
+class Column(NamedTuple):
+    dtype: str
+    min: Optional[float] = None
+    max: Optional[float] = None
+    required: bool = False
+
+
+class DatasetSchema(NamedTuple):
+    name: str
+    columns: Dict[str, Column]
+
+
+SENSORS = DatasetSchema("T1", {
+    "Variable": Column("category", required=True),
+    "Sensor": Column("category"),
+    "Freq_s": Column("float32", min=0),
+    "Unit": Column("category"),
+    # Точность записана текстом ("±0.3°C / ±2%RH") вперемешку с числами
+    "Accuracy": Column("string"),
+    "Stage": Column("category"),
+})
+
+EMULSIONS = DatasetSchema("T2", {
+    "BatchID": Column("string", required=True),
+    "Pressure_bar": Column("Int16", min=0),
+    "Viscosity_mPa_s": Column("float32", min=0),
+    "StabilityIndex": Column("float32", min=0, max=1),
+    "MeanParticle_um": Column("float32", min=0),
+})
+
+DRYING_REGIMES = DatasetSchema("T3", {
+    "Stage": Column("category", required=True),
+    "Ta_C": Column("Int16", min=-30, max=60),
+    "Air_velocity": Column("float32", min=0),
+    "Salt_pct": Column("float32", min=0, max=100),
+    "pH_surf": Column("float32", min=0, max=14),
+    "a_w": Column("float32", min=0, max=1),
+    "Duration_h": Column("Int16", min=0),
+})
+
+MODEL_COEFFICIENTS = DatasetSchema("T4", {
+    "coef_name": Column("string", required=True),
+    "value": Column("float64"),
+    "std_err": Column("float64", min=0),
+})
+
+MODEL_PARAMETERS = DatasetSchema("T5", {
+    "Parameter": Column("string", required=True),
+    "Value": Column("float64"),
+})
+
+BATCHES = DatasetSchema("T6", {
+    "BatchID": Column("string", required=True),
+    "mass_kg": Column("float32", min=0),
+    "T_initial_C": Column("Int16", min=-30, max=40),
+    "Salt_pct": Column("float32", min=0, max=100),
+    "Moisture_pct": Column("float32", min=0, max=100),
+    "StarterCFU": Column("Int64", min=0),
+    "Extract_pct": Column("float32", min=0, max=100),
+})
+
+# Опыты по pH: реальная таблица opyty.xlsx и демонстрационная кривая подкисления
+PH_EXPERIMENTS = DatasetSchema("opyty", {
+    "BatchID": Column("string"),
+    "pH": Column("float32", min=0, max=14),
+    "NACL %": Column("float32", min=0, max=100),
+    "Moisture %": Column("float32", min=0, max=100),
+    # Записи вида "1,2*10^5" хранятся как есть
+    "TlMicrobes,КОЕ/см³": Column("string"),
+    "LacticBacteria, КОЕ/см3": Column("string"),
+    "Mold, КОЕ/см3": Column("Int32", min=0),
+    "Yeast, КОЕ/см3": Column("Int32", min=0),
+    "CuringTime_h": Column("Int16", min=0),
+    "Time_h": Column("float32", min=0),
+    "pH_Control": Column("float32", min=0, max=14),
+    "pH_Extract": Column("float32", min=0, max=14),
+    "Salt_pct": Column("float32", min=0, max=100),
+    "Temp_C": Column("float32", min=-30, max=60),
+})
+
+PRODUCTS = DatasetSchema("Products", {
+    "ProductID": Column("string", required=True),
+    "product_type": Column("category"),
+    "name": Column("string"),
+})
+
+SAMPLES = DatasetSchema("Samples", {
+    "SampleID": Column("string", required=True),
+    "BatchID": Column("category"),
+    "ProductID": Column("category"),
+    "sample_time": Column("datetime"),
+})
+
+MEASUREMENTS = DatasetSchema("Measurements", {
+    "measurement_id": Column("Int64"),
+    "batch_id": Column("category"),
+    "BatchID": Column("category"),
+    "SampleID": Column("category"),
+    "parameter_name": Column("category", required=True),
+    "parameter_value": Column("float32"),
+    "parameter_unit": Column("category"),
+    "lab_technician": Column("category"),
+    "measurement_time": Column("datetime"),
+})
+
+# Листы meat_data.xlsx по имени
+SHEET_SCHEMAS = {schema.name: schema for schema in
+                 (SENSORS, EMULSIONS, DRYING_REGIMES, MODEL_COEFFICIENTS, MODEL_PARAMETERS, BATCHES)}
+
+
+# =================================================================
+# === ПРИВЕДЕНИЕ ТИПОВ И ПРОВЕРКА ===
+# =================================================================
+
+class SchemaIssue(NamedTuple):
+    dataset: str
+    column: str
+    problem: str
+    rows: int
+
+
+_NUMERIC = ("float32", "float64", "Int16", "Int32", "Int64")
+
+
+def _coerce(series: pd.Series, dtype: str) -> pd.Series:
+    if dtype == "category":
+        return series.astype("category")
+    if dtype == "string":
+        # Числа из Excel в текстовой колонке превращаются в их запись
+        return series.astype("string")
+    if dtype == "datetime":
+        return pd.to_datetime(series, errors="coerce")
+    numeric = pd.to_numeric(series, errors="coerce")
+    if dtype.startswith("Int"):
+        # Дробные значения в целой колонке не отбрасываются молча
+        rounded = numeric.round()
+        if not (rounded.isna() | (rounded == numeric)).all():
+            return numeric.astype("float64")
+        # Значения вне диапазона целого типа — тоже float64 (сообщается в apply_schema)
+        limits = np.iinfo(dtype.lower())
+        if ((rounded < limits.min) | (rounded > limits.max)).any():
+            return numeric.astype("float64")
+        return rounded.astype(dtype)
+    return numeric.astype(dtype)
+
+
+def apply_schema(df: Optional[pd.DataFrame], schema: Optional[DatasetSchema]) -> Optional[pd.DataFrame]:
+    """
+    Приводит колонки к типам схемы одним векторным проходом по колонкам
+    и проверяет их. Колонки вне схемы остаются как есть. Найденные
+    нарушения (нечисловые значения, выход за диапазон, пропуски
+    в обязательных колонках) — список SchemaIssue в df.attrs["schema_issues"].
+    """
+    if df is None or schema is None or df.columns.empty:
+        return df
+
+    issues: List[SchemaIssue] = []
+    typed = {}
+    for name, column in schema.columns.items():
+        if name not in df.columns:
+            if column.required:
+                issues.append(SchemaIssue(schema.name, name, "нет колонки", len(df)))
+            continue
+        source = df[name]
+        values = _coerce(source, column.dtype)
+
+        if column.dtype in _NUMERIC or column.dtype == "datetime":
+            lost = int((values.isna() & source.notna()).sum())
+            if lost:
+                issues.append(SchemaIssue(schema.name, name, "нечисловые значения" if column.dtype != "datetime"
+                                          else "неверная дата", lost))
+        if column.dtype in _NUMERIC and (column.min is not None or column.max is not None):
+            low = values < column.min if column.min is not None else False
+            high = values > column.max if column.max is not None else False
+            out_of_range = int((low | high).sum())
+            if out_of_range:
+                issues.append(SchemaIssue(schema.name, name, f"вне диапазона [{column.min}, {column.max}]",
+                                          out_of_range))
+        if column.required:
+            missing = int(values.isna().sum())
+            if missing:
+                issues.append(SchemaIssue(schema.name, name, "пропуски в обязательной колонке", missing))
+        if column.dtype.startswith("Int") and values.dtype == "float64":
+            fractional = int((values.round() != values).sum() - values.isna().sum())
+            if fractional:
+                issues.append(SchemaIssue(schema.name, name, "дробные значения в целой колонке", fractional))
+            limits = np.iinfo(column.dtype.lower())
+            overflow = int(((values < limits.min) | (values > limits.max)).sum())
+            if overflow:
+                issues.append(SchemaIssue(schema.name, name, f"вне диапазона типа {column.dtype}", overflow))
+        typed[name] = values
+
+    result = df.assign(**typed) if typed else df.copy(deep=False)
+    result.attrs["schema_issues"] = issues
+    return result
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 2 ** 20
+
+
+# =================================================================
+# === БЕНЧМАРК ===
+# =================================================================
+
+def _synthetic_measurements(rows: int) -> pd.DataFrame:
+    """Таблица измерений с типами, которые pandas выводит из CSV"""
+    rng = np.random.default_rng(7)
+    parameters = np.array(["pH", "W", "Aw", "TBARS", "NaCl", "T_core"])
+    return pd.DataFrame({
+        "measurement_id": np.arange(rows, dtype="int64"),
+        "batch_id": np.char.add("M", rng.integers(1, 2000, rows).astype(str)).astype(object),
+        "parameter_name": parameters[rng.integers(0, len(parameters), rows)].astype(object),
+        "parameter_value": rng.normal(5, 1, rows),
+        "parameter_unit": rng.choice(["", "%", "мг/кг", "°C"], rows).astype(object),
+        "lab_technician": rng.choice(["Иванова А.", "Сейткали Б.", "Петров В.", "Ким Д."], rows).astype(object),
+    })
+
+
+def benchmark(rows: int = 1_000_000, repeats: int = 5):
+    """Память и скорость groupby: выведенные pandas типы против схемы"""
+    raw = _synthetic_measurements(rows)
+    started = time.perf_counter()
+    typed = apply_schema(raw, MEASUREMENTS)
+    coerce_ms = (time.perf_counter() - started) * 1000
+
+    def groupby_ms(df):
+        times = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            df.groupby(["batch_id", "parameter_name"], observed=True)["parameter_value"].agg(["mean", "std", "count"])
+            times.append(time.perf_counter() - started)
+        return sorted(times)[len(times) // 2] * 1000
+
+    raw_gb, typed_gb = groupby_ms(raw), groupby_ms(typed)
+    print(f"{rows} измерений: память {memory_mb(raw):.0f} -> {memory_mb(typed):.0f} МБ, "
+          f"приведение типов {coerce_ms:.0f} мс")
+    print(f"groupby(партия, параметр).agg(mean, std, count): {raw_gb:.0f} -> {typed_gb:.0f} мс "
+          f"({raw_gb / typed_gb:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк схем: память и groupby")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+    benchmark(args.rows)
@@ -0,0 +1,234 @@
+# database_async.py - Асинхронный слой доступа к данным Supabase
+import asyncio
+import inspect
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import pandas as pd
+import streamlit as st
+from supabase import AsyncClient
+
+from query_trace import bind_trace, get_trace_list
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+# Максимум одновременных запросов к PostgREST из одного процесса
+MAX_CONCURRENT_QUERIES = 8
+
+# Таймаут ожидания результата в синхронном фасаде (секунды)
+SYNC_TIMEOUT = 60
+
+
+# =================================================================
+# === ФОНОВЫЙ EVENT LOOP ===
+# =================================================================
+
+class AsyncSupabaseRunner:
+    """
+    Держит отдельный поток с event loop и асинхронным клиентом Supabase.
+    Streamlit-страницы передают сюда корутины через синхронный фасад,
+    а семафор ограничивает число одновременных запросов.
+
+    client_factory — корутина, создающая клиент. Клиенты с синхронным
+    execute() (локальный бэкенд) выполняются в пуле потоков.
+    """
+
+    def __init__(self, client_factory: Callable[[], Awaitable], max_concurrency: int = MAX_CONCURRENT_QUERIES):
+        self._client_factory = client_factory
+        self._max_concurrency = max_concurrency
+        self._client = None
+        # Примитивы asyncio создаются внутри loop (Python 3.9 привязывает их к loop)
+        self._client_lock: Optional[asyncio.Lock] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="supabase-async", daemon=True)
+        self._thread.start()
+
+    async def get_client(self):
+        """Ленивая инициализация клиента"""
+        if self._client_lock is None:
+            self._client_lock = asyncio.Lock()
+        async with self._client_lock:
+            if self._client is None:
+                self._client = await self._client_factory()
+        return self._client
+
+    async def execute(self, build_query: Callable[[AsyncClient], Any]):
+        """Выполняет запрос, построенный функцией build_query, под семафором"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        client = await self.get_client()
+        async with self._semaphore:
+            query = build_query(client)
+            if inspect.iscoroutinefunction(query.execute):
+                return await query.execute()
+            return await asyncio.to_thread(query.execute)
+
+    def run(self, coro: Awaitable, timeout: float = SYNC_TIMEOUT):
+        """Выполняет корутину в фоновом loop и блокирующе ждёт результат"""
+        # Запросы из фонового loop попадают в трассу вызвавшего запуска
+        future = asyncio.run_coroutine_threadsafe(bind_trace(coro, get_trace_list()), self._loop)
+        return future.result(timeout)
+
+
+@st.cache_resource
+def get_async_runner() -> Optional[AsyncSupabaseRunner]:
+    """Один фоновый loop и асинхронный клиент на процесс"""
+    from connection import get_connection_manager
+    from database_supabase import get_supabase_config, get_storage_backend_name, init_supabase
+
+    # Бэкенды без асинхронного клиента используют общий синхронный
+    if get_storage_backend_name() != 'supabase':
+        client = init_supabase()
+        if client is None:
+            return None
+
+        async def shared_client():
+            return client
+
+        return AsyncSupabaseRunner(shared_client)
+
+    config = get_supabase_config()
+    if not config or not config.get('url') or not config.get('key'):
+        st.error("⚠️ Конфигурация Supabase не найдена!")
+        return None
+    return AsyncSupabaseRunner(get_connection_manager().create_async_client)
+
+
+# =================================================================
+# === АСИНХРОННЫЕ ЗАПРОСЫ ===
+# =================================================================
+# Корутины выполняются в фоновом потоке, поэтому не вызывают st.*:
+# ошибки пробрасываются наверх и показываются синхронным фасадом.
+
+async def afetch_production_batches(runner: AsyncSupabaseRunner, limit: int = 100) -> pd.DataFrame:
+    """Асинхронно получает список производственных партий"""
+    response = await runner.execute(
+        lambda c: c.table('production_batches').select('*').order('created_at', desc=True).limit(limit)
+    )
+    return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+
+
+async def afetch_batch(runner: AsyncSupabaseRunner, batch_id: int) -> Optional[Dict]:
+    """Асинхронно получает одну партию"""
+    response = await runner.execute(
+        lambda c: c.table('production_batches').select('*').eq('batch_id', batch_id)
+    )
+    return response.data[0] if response.data else None
+
+
+async def afetch_lab_measurements(runner: AsyncSupabaseRunner, batch_id: int = None) -> pd.DataFrame:
+    """Асинхронно получает лабораторные измерения"""
+    def build(c):
+        query = c.table('lab_measurements') \
+            .select('*, production_batches(product_type, batch_id)') \
+            .order('measurement_time', desc=True)
+        if batch_id:
+            query = query.eq('batch_id', batch_id)
+        return query
+
+    response = await runner.execute(build)
+    return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+
+
+async def afetch_iot_sensor_data(runner: AsyncSupabaseRunner, batch_id: int = None,
+                                 limit: int = 1000) -> pd.DataFrame:
+    """Асинхронно получает данные IoT сенсоров"""
+    def build(c):
+        query = c.table('iot_sensor_data').select('*').order('time', desc=True).limit(limit)
+        if batch_id:
+            query = query.eq('batch_id', batch_id)
+        return query
+
+    response = await runner.execute(build)
+    return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+
+
+async def afetch_production_stages(runner: AsyncSupabaseRunner, batch_id: int) -> pd.DataFrame:
+    """Асинхронно получает этапы производства партии"""
+    response = await runner.execute(
+        lambda c: c.table('production_stages').select('*').eq('batch_id', batch_id).order('stage_order')
+    )
+    return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+
+
+async def aget_batch_details(runner: AsyncSupabaseRunner, batch_id: int) -> Optional[Dict]:
+    """Детали партии: все четыре запроса выполняются параллельно"""
+    batch_data, lab_data, sensor_data, stages_data = await asyncio.gather(
+        afetch_batch(runner, batch_id),
+        afetch_lab_measurements(runner, batch_id),
+        afetch_iot_sensor_data(runner, batch_id, limit=100),
+        afetch_production_stages(runner, batch_id),
+    )
+    if not batch_data:
+        return None
+
+    return {
+        'batch_info': batch_data,
+        'lab_measurements': lab_data,
+        'sensor_data': sensor_data,
+        'production_stages': stages_data
+    }
+
+
+async def aexecute_many(runner: AsyncSupabaseRunner,
+                        queries: Dict[str, Callable[[AsyncClient], Any]]) -> Dict[str, Any]:
+    """Параллельно выполняет именованные запросы; ошибки возвращаются как значения"""
+    names = list(queries.keys())
+    results = await asyncio.gather(*(runner.execute(queries[name]) for name in names),
+                                   return_exceptions=True)
+    return dict(zip(names, results))
+
+
+# =================================================================
+# === СИНХРОННЫЙ ФАСАД ДЛЯ STREAMLIT ===
+# =================================================================
+
+def run_sync(make_coro: Callable[[AsyncSupabaseRunner], Awaitable], default=None):
+    """
+    Выполняет асинхронный запрос из Streamlit-страницы.
+    make_coro получает runner и возвращает корутину.
+    """
+    runner = get_async_runner()
+    if not runner:
+        return default
+
+    try:
+        return runner.run(make_coro(runner))
+    except Exception as e:
+        st.error(f"Ошибка асинхронного запроса: {e}")
+        return default
+
+
+def execute_many(queries: Dict[str, Callable[[AsyncClient], Any]]) -> Dict[str, Any]:
+    """
+    Параллельно выполняет набор запросов и возвращает {имя: response}.
+    Для упавших запросов значение — None, ошибка выводится на страницу.
+    """
+    results = run_sync(lambda runner: aexecute_many(runner, queries), default={})
+    responses = {}
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            st.error(f"Ошибка запроса '{name}': {result}")
+            responses[name] = None
+        else:
+            responses[name] = result
+    return responses
+
+
+def get_batch_details_async(batch_id: int) -> Optional[Dict]:
+    """Синхронная обёртка над aget_batch_details"""
+    return run_sync(lambda runner: aget_batch_details(runner, batch_id))
+
+
+def count_tables(tables: List[str]) -> Dict[str, Optional[int]]:
+    """Параллельно считает строки в нескольких таблицах"""
+    responses = execute_many({
+        table: (lambda c, t=table: c.table(t).select('count', count='exact').limit(1))
+        for table in tables
+    })
+    return {table: getattr(response, 'count', None) if response is not None else None
+            for table, response in responses.items()}
@@ -0,0 +1,580 @@
+# database_local.py - Локальный SQLite-бэкенд со схемой Supabase (офлайн и тестовые запуски)
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from query_trace import record_query
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_LOCAL_DB = BASE_DIR / "zhaya_local.db"
+
+_NOW = "(strftime('%Y-%m-%dT%H:%M:%f', 'now'))"
+
+# Схема повторяет таблицы Supabase, которые использует приложение
+SCHEMA_SQL = f"""
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY DEFAULT (lower(hex(randomblob(16)))),
+    email TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    full_name TEXT,
+    role TEXT NOT NULL DEFAULT 'operator',
+    department TEXT,
+    is_active BOOLEAN NOT NULL DEFAULT 1,
+    created_at TEXT NOT NULL DEFAULT {_NOW},
+    last_login TEXT
+);
+
+CREATE TABLE IF NOT EXISTS user_sessions (
+    session_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT REFERENCES users(user_id),
+    session_token TEXT NOT NULL UNIQUE,
+    expires_at TEXT NOT NULL,
+    is_active BOOLEAN NOT NULL DEFAULT 1,
+    created_at TEXT NOT NULL DEFAULT {_NOW}
+);
+CREATE INDEX IF NOT EXISTS idx_user_sessions_expires ON user_sessions(expires_at);
+
+CREATE TABLE IF NOT EXISTS production_batches (
+    batch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_type TEXT NOT NULL,
+    initial_weight REAL,
+    final_weight REAL,
+    target_sea_buckthorn_concentration REAL,
+    start_time TEXT NOT NULL DEFAULT {_NOW},
+    end_time TEXT,
+    stage TEXT,
+    created_at TEXT NOT NULL DEFAULT {_NOW}
+);
+CREATE INDEX IF NOT EXISTS idx_batches_created ON production_batches(created_at);
+CREATE INDEX IF NOT EXISTS idx_batches_start ON production_batches(start_time);
+CREATE INDEX IF NOT EXISTS idx_batches_open ON production_batches(end_time) WHERE end_time IS NULL;
+
+CREATE TABLE IF NOT EXISTS production_stages (
+    stage_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id INTEGER REFERENCES production_batches(batch_id),
+    stage_name TEXT,
+    stage_order INTEGER,
+    start_time TEXT,
+    end_time TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_stages_batch ON production_stages(batch_id, stage_order);
+
+CREATE TABLE IF NOT EXISTS lab_measurements (
+    measurement_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id INTEGER REFERENCES production_batches(batch_id),
+    parameter_name TEXT NOT NULL,
+    parameter_value REAL,
+    parameter_unit TEXT,
+    lab_technician TEXT,
+    measurement_time TEXT NOT NULL DEFAULT {_NOW},
+    notes TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_lab_batch ON lab_measurements(batch_id, measurement_time);
+CREATE INDEX IF NOT EXISTS idx_lab_param_time ON lab_measurements(parameter_name, measurement_time);
+
+CREATE TABLE IF NOT EXISTS iot_sensor_data (
+    sensor_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id INTEGER REFERENCES production_batches(batch_id),
+    sensor_type TEXT NOT NULL,
+    sensor_location TEXT,
+    sensor_value REAL,
+    sensor_unit TEXT,
+    time TEXT NOT NULL DEFAULT {_NOW}
+);
+CREATE INDEX IF NOT EXISTS idx_iot_time ON iot_sensor_data(time);
+CREATE INDEX IF NOT EXISTS idx_iot_batch_time ON iot_sensor_data(batch_id, time);
+CREATE INDEX IF NOT EXISTS idx_iot_type_time ON iot_sensor_data(sensor_type, time);
+
+CREATE TABLE IF NOT EXISTS actuator_logs (
+    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id INTEGER REFERENCES production_batches(batch_id),
+    actuator_name TEXT NOT NULL,
+    set_value REAL,
+    previous_value REAL,
+    change_time TEXT NOT NULL DEFAULT {_NOW},
+    changed_by TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_actuator_batch_time ON actuator_logs(batch_id, change_time);
+
+CREATE TABLE IF NOT EXISTS activity_logs (
+    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT REFERENCES users(user_id),
+    action TEXT NOT NULL,
+    details TEXT,
+    metadata TEXT,
+    timestamp TEXT NOT NULL DEFAULT {_NOW}
+);
+CREATE INDEX IF NOT EXISTS idx_activity_time ON activity_logs(timestamp);
+CREATE INDEX IF NOT EXISTS idx_activity_user_time ON activity_logs(user_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS dashboard_config (
+    config_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT,
+    kpis TEXT,
+    charts TEXT,
+    is_active BOOLEAN NOT NULL DEFAULT 1,
+    updated_by TEXT,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS roles (
+    role TEXT PRIMARY KEY,
+    name_ru TEXT,
+    name_en TEXT,
+    name_kk TEXT,
+    permissions TEXT,
+    updated_at TEXT NOT NULL DEFAULT {_NOW}
+);
+
+CREATE TABLE IF NOT EXISTS reports_config (
+    report_id TEXT PRIMARY KEY,
+    name TEXT,
+    description TEXT,
+    icon TEXT,
+    sections TEXT,
+    display_order INTEGER,
+    is_active BOOLEAN NOT NULL DEFAULT 1
+);
+"""
+
+# Связи для вложенных выборок вида select('*, users(full_name, email)'):
+# таблица -> {связанная таблица: (локальная колонка, колонка в связанной таблице)}
+FOREIGN_KEYS = {
+    'lab_measurements': {'production_batches': ('batch_id', 'batch_id')},
+    'iot_sensor_data': {'production_batches': ('batch_id', 'batch_id')},
+    'actuator_logs': {'production_batches': ('batch_id', 'batch_id')},
+    'production_stages': {'production_batches': ('batch_id', 'batch_id')},
+    'activity_logs': {'users': ('user_id', 'user_id')},
+    'user_sessions': {'users': ('user_id', 'user_id')},
+}
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+# Операторы SQL -> имена операторов PostgREST (для трассы запросов)
+_OP_NAMES = {'=': 'eq', '!=': 'neq', '>': 'gt', '>=': 'gte', '<': 'lt', '<=': 'lte',
+             'LIKE': 'like', 'IS NULL': 'is', 'IN': 'in'}
+
+
+def _ident(name: str) -> str:
+    """Проверяет имя колонки/таблицы, чтобы исключить SQL-инъекции"""
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Недопустимое имя: {name!r}")
+    return f'"{name}"'
+
+
+def _split_columns(columns: str) -> List[str]:
+    """Разбивает список колонок по запятым верхнего уровня"""
+    parts, depth, current = [], 0, ''
+    for ch in columns:
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        if ch == ',' and depth == 0:
+            parts.append(current.strip())
+            current = ''
+        else:
+            current += ch
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+# =================================================================
+# === ОТВЕТ И ПОСТРОИТЕЛЬ ЗАПРОСОВ ===
+# =================================================================
+
+class LocalResponse:
+    """Аналог APIResponse из postgrest: поля data и count"""
+
+    def __init__(self, data: List[Dict], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class LocalRPCError(Exception):
+    """Ошибка вызова функции; code — как у postgrest.APIError (PGRST202 — функции нет)"""
+
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.code = code
+
+
+class LocalRPC:
+    """Отложенный вызов функции БД: выполняется в execute(), как client.rpc(...).execute()"""
+
+    def __init__(self, client: 'LocalClient', fn: str, params: Dict):
+        self._client = client
+        self._fn = fn
+        self._params = params
+
+    def execute(self) -> LocalResponse:
+        started = time.perf_counter()
+        try:
+            response = self._client.call(self._fn, self._params)
+        except Exception as e:
+            record_query('local', 'rpc', self._fn, [], started, error=e)
+            raise
+        record_query('local', 'rpc', self._fn, [], started, rows=len(response.data))
+        return response
+
+
+class LocalQuery:
+    """Подмножество построителя запросов PostgREST поверх SQLite"""
+
+    def __init__(self, client: 'LocalClient', table: str):
+        self._client = client
+        self._table = table
+        self._op = 'select'
+        self._columns = '*'
+        self._count = None
+        self._payload = None
+        self._filters: List[tuple] = []
+        self._order: List[tuple] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+
+    # --- операции ---
+    def select(self, columns: str = '*', count: Optional[str] = None):
+        self._op, self._columns, self._count = 'select', columns, count
+        return self
+
+    def insert(self, data, **kwargs):
+        self._op, self._payload = 'insert', data
+        return self
+
+    def upsert(self, data, on_conflict: str = '', **kwargs):
+        self._op, self._payload = 'upsert', data
+        return self
+
+    def update(self, data, **kwargs):
+        self._op, self._payload = 'update', data
+        return self
+
+    def delete(self, **kwargs):
+        self._op = 'delete'
+        return self
+
+    # --- фильтры ---
+    def _filter(self, column: str, op: str, value):
+        self._filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, '=', value)
+
+    def neq(self, column, value):
+        return self._filter(column, '!=', value)
+
+    def gt(self, column, value):
+        return self._filter(column, '>', value)
+
+    def gte(self, column, value):
+        return self._filter(column, '>=', value)
+
+    def lt(self, column, value):
+        return self._filter(column, '<', value)
+
+    def lte(self, column, value):
+        return self._filter(column, '<=', value)
+
+    def like(self, column, pattern):
+        return self._filter(column, 'LIKE', pattern)
+
+    def ilike(self, column, pattern):
+        # LIKE в SQLite регистронезависим для ASCII
+        return self._filter(column, 'LIKE', pattern)
+
+    def is_(self, column, value):
+        if value in (None, 'null'):
+            return self._filter(column, 'IS NULL', None)
+        return self._filter(column, '=', 1 if value in (True, 'true') else 0)
+
+    def in_(self, column, values):
+        return self._filter(column, 'IN', list(values))
+
+    # --- сортировка и пагинация ---
+    def order(self, column: str, desc: bool = False, **kwargs):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size: int, **kwargs):
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    # --- выполнение ---
+    def _where(self):
+        clauses, params = [], []
+        for column, op, value in self._filters:
+            if op == 'IS NULL':
+                clauses.append(f"{_ident(column)} IS NULL")
+            elif op == 'IN':
+                clauses.append(f"{_ident(column)} IN ({', '.join('?' * len(value))})")
+                params.extend(self._client.to_db(v) for v in value)
+            else:
+                clauses.append(f"{_ident(column)} {op} ?")
+                params.append(self._client.to_db(value))
+        return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    def execute(self) -> LocalResponse:
+        started = time.perf_counter()
+        try:
+            response = self._client.run(self)
+        except Exception as e:
+            self._trace(started, error=e)
+            raise
+        self._trace(started, rows=len(response.data))
+        return response
+
+    def _trace(self, started: float, rows: Optional[int] = None, error: Optional[BaseException] = None):
+        filters = [(column, _OP_NAMES.get(op, op), value) for column, op, value in self._filters]
+        record_query('local', self._op, self._table, filters, started, rows=rows, error=error)
+
+
+class LocalClient:
+    """
+    Клиент с интерфейсом supabase.Client (table/.../execute) поверх SQLite.
+    Используется для офлайн-работы, тестов и бенчмарков.
+    """
+
+    def __init__(self, path=DEFAULT_LOCAL_DB):
+        self.path = str(path)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if self.path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA_SQL)
+        self._bool_columns = self._load_bool_columns()
+
+    def _load_bool_columns(self) -> Dict[str, set]:
+        tables = [r[0] for r in self._conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        return {
+            table: {r['name'] for r in self._conn.execute(f"PRAGMA table_info({_ident(table)})")
+                    if r['type'].upper() == 'BOOLEAN'}
+            for table in tables
+        }
+
+    def table(self, name: str) -> LocalQuery:
+        return LocalQuery(self, name)
+
+    def rpc(self, fn: str, params: Optional[Dict] = None) -> LocalRPC:
+        return LocalRPC(self, fn, params or {})
+
+    def call(self, fn: str, params: Dict) -> LocalResponse:
+        """Функции БД из sql/ (тот же результат одной транзакцией SQLite)"""
+        handler = getattr(self, f"_rpc_{fn}", None)
+        if handler is None:
+            raise LocalRPCError(f"Функция '{fn}' не найдена в локальном бэкенде", "PGRST202")
+        with self._lock:
+            try:
+                data = handler(**params)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return LocalResponse(data)
+
+    def _rpc_create_login_session(self, p_user_id, p_session_token, p_expires_at, p_password_hash=None):
+        # sql/login_session.sql: сессия + last_login (+ перехешированный пароль)
+        self._conn.execute("INSERT INTO user_sessions (user_id, session_token, expires_at, is_active) "
+                           "VALUES (?, ?, ?, 1)", (p_user_id, p_session_token, self.to_db(p_expires_at)))
+        self._conn.execute(f"UPDATE users SET last_login = {_NOW}, "
+                           "password_hash = coalesce(?, password_hash) WHERE user_id = ?",
+                           (p_password_hash, p_user_id))
+        return []
+
+    # --- преобразование типов ---
+    @staticmethod
+    def to_db(value):
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False)
+        return value
+
+    def _from_db(self, table: str, row: sqlite3.Row) -> Dict:
+        record = dict(row)
+        for column in self._bool_columns.get(table, ()):
+            if record.get(column) is not None:
+                record[column] = bool(record[column])
+        return record
+
+    # --- выполнение запросов ---
+    def run(self, query: LocalQuery) -> LocalResponse:
+        with self._lock:
+            try:
+                if query._op == 'select':
+                    return self._select(query)
+                if query._op in ('insert', 'upsert'):
+                    return self._insert(query)
+                if query._op == 'update':
+                    return self._update(query)
+                return self._delete(query)
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def _select(self, query: LocalQuery) -> LocalResponse:
+        table = query._table
+        where, params = query._where()
+
+        plain, embedded = [], []
+        for column in _split_columns(query._columns):
+            match = re.match(r'^(\w+)\((.*)\)$', column)
+            if match:
+                embedded.append((match.group(1), match.group(2)))
+            else:
+                plain.append(column)
+
+        count = None
+        if query._count or plain == ['count']:
+            count = self._conn.execute(f"SELECT count(*) FROM {_ident(table)}{where}", params).fetchone()[0]
+
+        # select('count', count='exact') используется для подсчёта строк
+        if plain == ['count']:
+            return LocalResponse([{'count': count}], count)
+
+        select_list = '*' if not plain or '*' in plain else ', '.join(_ident(c) for c in plain)
+        sql = f"SELECT {select_list} FROM {_ident(table)}{where}"
+        if query._order:
+            sql += " ORDER BY " + ", ".join(f"{_ident(c)} {'DESC' if d else 'ASC'}" for c, d in query._order)
+        if query._limit is not None:
+            sql += f" LIMIT {int(query._limit)}"
+            if query._offset:
+                sql += f" OFFSET {int(query._offset)}"
+
+        rows = [self._from_db(table, r) for r in self._conn.execute(sql, params)]
+        for related, columns in embedded:
+            self._embed(table, rows, related, columns)
+        return LocalResponse(rows, count)
+
+    def _embed(self, table: str, rows: List[Dict], related: str, columns: str):
+        """Подставляет связанную запись как вложенный словарь (как PostgREST)"""
+        local_col, remote_col = FOREIGN_KEYS.get(table, {}).get(related, (None, None))
+        if local_col is None:
+            raise ValueError(f"Нет связи {table} -> {related}")
+
+        keys = {r.get(local_col) for r in rows if r.get(local_col) is not None}
+        wanted = [c.strip() for c in columns.split(',') if c.strip()]
+        select_list = '*' if not wanted or '*' in wanted else ', '.join(_ident(c) for c in {*wanted, remote_col})
+        lookup = {}
+        if keys:
+            placeholders = ', '.join('?' * len(keys))
+            sql = f"SELECT {select_list} FROM {_ident(related)} WHERE {_ident(remote_col)} IN ({placeholders})"
+            for r in self._conn.execute(sql, list(keys)):
+                record = self._from_db(related, r)
+                lookup[record[remote_col]] = {k: v for k, v in record.items() if '*' in wanted or k in wanted}
+        for row in rows:
+            row[related] = lookup.get(row.get(local_col))
+
+    def _insert(self, query: LocalQuery) -> LocalResponse:
+        table = query._table
+        records = query._payload if isinstance(query._payload, list) else [query._payload]
+        if not records:
+            return LocalResponse([])
+
+        inserted = []
+        verb = "INSERT OR REPLACE" if query._op == 'upsert' else "INSERT"
+        for record in records:
+            columns = list(record.keys())
+            sql = (f"{verb} INTO {_ident(table)} ({', '.join(_ident(c) for c in columns)}) "
+                   f"VALUES ({', '.join('?' * len(columns))}) RETURNING *")
+            row = self._conn.execute(sql, [self.to_db(record[c]) for c in columns]).fetchone()
+            inserted.append(self._from_db(table, row))
+        self._conn.commit()
+        return LocalResponse(inserted)
+
+    def _update(self, query: LocalQuery) -> LocalResponse:
+        table = query._table
+        where, params = query._where()
+        columns = list(query._payload.keys())
+        assignments = ', '.join(f"{_ident(c)} = ?" for c in columns)
+        values = [self.to_db(query._payload[c]) for c in columns]
+        rows = self._conn.execute(f"UPDATE {_ident(table)} SET {assignments}{where} RETURNING *",
+                                  values + params).fetchall()
+        self._conn.commit()
+        return LocalResponse([self._from_db(table, r) for r in rows])
+
+    def _delete(self, query: LocalQuery) -> LocalResponse:
+        table = query._table
+        where, params = query._where()
+        rows = self._conn.execute(f"DELETE FROM {_ident(table)}{where} RETURNING *", params).fetchall()
+        self._conn.commit()
+        return LocalResponse([self._from_db(table, r) for r in rows])
+
+
+# =================================================================
+# === СИНТЕТИЧЕСКИЕ ДАННЫЕ ДЛЯ БЕНЧМАРКОВ ===
+# =================================================================
+
+def seed_synthetic_data(client: LocalClient, batches: int = 200, measurements_per_batch: int = 20,
+                        sensor_rows_per_batch: int = 200, seed: int = 42):
+    """Заполняет локальную БД воспроизводимыми данными (фиксированный seed)"""
+    from database_supabase import get_parameter_options, get_product_types
+
+    rng = random.Random(seed)
+    params = get_parameter_options()
+    products = get_product_types()
+    start = datetime(2025, 1, 1)
+
+    with client._lock:
+        conn = client._conn
+        for i in range(batches):
+            started = start + timedelta(hours=8 * i)
+            initial = round(rng.uniform(80, 120), 2)
+            cur = conn.execute(
+                "INSERT INTO production_batches (product_type, initial_weight, final_weight, "
+                "target_sea_buckthorn_concentration, start_time, end_time, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (rng.choice(products), initial, round(initial * rng.uniform(0.8, 0.9), 2),
+                 rng.choice([0, 5, 7, 9, 11, 13, 15]), started.isoformat(),
+                 (started + timedelta(hours=96)).isoformat(), started.isoformat())
+            )
+            batch_id = cur.lastrowid
+            conn.executemany(
+                "INSERT INTO lab_measurements (batch_id, parameter_name, parameter_value, parameter_unit, "
+                "measurement_time) VALUES (?, ?, ?, ?, ?)",
+                [(batch_id, rng.choice(params), round(rng.uniform(0, 100), 3), '',
+                  (started + timedelta(hours=rng.uniform(0, 96))).isoformat())
+                 for _ in range(measurements_per_batch)]
+            )
+            conn.executemany(
+                "INSERT INTO iot_sensor_data (batch_id, sensor_type, sensor_location, sensor_value, "
+                "sensor_unit, time) VALUES (?, 'temperature', 'chamber_air', ?, '°C', ?)",
+                [(batch_id, round(rng.uniform(0, 47), 2), (started + timedelta(minutes=5 * k)).isoformat())
+                 for k in range(sensor_rows_per_batch)]
+            )
+        conn.commit()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Локальная БД Жая: создание и наполнение тестовыми данными")
+    parser.add_argument("--path", default=os.getenv("ZHAYA_LOCAL_DB", str(DEFAULT_LOCAL_DB)))
+    parser.add_argument("--batches", type=int, default=200)
+    args = parser.parse_args()
+
+    local = LocalClient(args.path)
+    t0 = time.perf_counter()
+    seed_synthetic_data(local, batches=args.batches)
+    print(f"✅ {args.batches} партий записано в {args.path} за {time.perf_counter() - t0:.2f} с")
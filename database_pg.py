@@ -0,0 +1,225 @@
+# database_pg.py - Прямой доступ к PostgreSQL для тяжёлых аналитических чтений
+import io
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Sequence
+
+import pandas as pd
+import pyarrow.csv as pa_csv
+import streamlit as st
+
+try:
+    import psycopg2
+    from psycopg2 import pool as pg_pool
+except ImportError:  # psycopg2 не установлен — быстрый путь просто отключён
+    psycopg2 = None
+    pg_pool = None
+
+from database_supabase import get_supabase_config, get_storage_backend_name
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+PG_POOL_MIN = 1
+PG_POOL_MAX = 5
+PG_CONNECT_TIMEOUT = 5  # секунды
+
+# Размер порции серверного курсора при потоковом чтении
+STREAM_CHUNK_SIZE = 50_000
+
+
+# =================================================================
+# === ПУЛ СОЕДИНЕНИЙ ===
+# =================================================================
+
+@st.cache_resource
+def get_pg_pool():
+    """Пул соединений к PostgreSQL по db_url из конфигурации Supabase"""
+    if psycopg2 is None or get_storage_backend_name() != 'supabase':
+        return None
+
+    config = get_supabase_config()
+    if not config or not config.get('db_url'):
+        return None
+
+    try:
+        return pg_pool.ThreadedConnectionPool(
+            PG_POOL_MIN, PG_POOL_MAX,
+            dsn=config['db_url'],
+            connect_timeout=PG_CONNECT_TIMEOUT,
+            application_name='zhaya_analytics'
+        )
+    except Exception as e:
+        # Прямой путь опционален: при ошибке работаем через PostgREST
+        print(f"PostgreSQL недоступен, используется PostgREST: {e}")
+        return None
+
+
+def is_pg_available() -> bool:
+    """Доступен ли прямой SQL-путь"""
+    return get_pg_pool() is not None
+
+
+@contextmanager
+def pg_connection():
+    """Берёт соединение из пула и возвращает его обратно"""
+    pool = get_pg_pool()
+    if pool is None:
+        raise RuntimeError("Прямое подключение к PostgreSQL не настроено")
+
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+# =================================================================
+# === БЫСТРОЕ ЧТЕНИЕ ===
+# =================================================================
+# COPY ... TO STDOUT отдаёт результат одним потоком без построчной
+# сериализации в JSON, а pyarrow разбирает его в колонки на C-уровне.
+# psycopg2 не декодирует бинарный формат COPY, поэтому используется CSV.
+
+def copy_to_dataframe(sql: str, params: Optional[Sequence] = None) -> pd.DataFrame:
+    """Выполняет SELECT через COPY и возвращает DataFrame"""
+    buffer = io.BytesIO()
+    with pg_connection() as conn:
+        with conn.cursor() as cur:
+            query = cur.mogrify(sql, params).decode() if params else sql
+            cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)", buffer)
+
+    if buffer.tell() == 0:
+        return pd.DataFrame()
+    buffer.seek(0)
+    return pa_csv.read_csv(buffer).to_pandas()
+
+
+def copy_to_file(sql: str, out, params: Optional[Sequence] = None):
+    """Выгружает результат запроса в файл CSV без промежуточного DataFrame"""
+    with pg_connection() as conn:
+        with conn.cursor() as cur:
+            query = cur.mogrify(sql, params).decode() if params else sql
+            cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)", out)
+
+
+def iter_query_chunks(sql: str, params: Optional[Sequence] = None,
+                      chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Читает большой результат серверным курсором порциями по chunk_size строк"""
+    with pg_connection() as conn:
+        with conn.cursor(name='zhaya_stream') as cur:
+            cur.itersize = chunk_size
+            cur.execute(sql, params)
+            columns = None
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                if columns is None:
+                    columns = [desc[0] for desc in cur.description]
+                yield pd.DataFrame.from_records(rows, columns=columns)
+
+
+def _where(clauses: list) -> str:
+    return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+
+# =================================================================
+# === АНАЛИТИЧЕСКИЕ ЗАПРОСЫ ===
+# =================================================================
+
+def fetch_sensor_history_fast(batch_id: int = None, sensor_type: str = None,
+                              date_from: datetime = None, date_to: datetime = None,
+                              limit: int = None) -> Optional[pd.DataFrame]:
+    """
+    История датчиков IoT напрямую из PostgreSQL (колонки — как у PostgREST).
+    None — запрос не удался, вызывающий код переходит на PostgREST.
+    """
+    clauses, params = [], []
+    if batch_id:
+        clauses.append("batch_id = %s")
+        params.append(batch_id)
+    if sensor_type:
+        clauses.append("sensor_type = %s")
+        params.append(sensor_type)
+    if date_from:
+        clauses.append("time >= %s")
+        params.append(date_from)
+    if date_to:
+        clauses.append("time <= %s")
+        params.append(date_to)
+
+    sql = f"SELECT * FROM iot_sensor_data{_where(clauses)} ORDER BY time DESC"
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+    try:
+        return copy_to_dataframe(sql, params)
+    except Exception as e:
+        print(f"Прямое чтение истории датчиков не удалось, используется PostgREST: {e}")
+        return None
+
+
+def fetch_lab_measurements_fast(batch_id: int = None, parameter_name: str = None) -> Optional[pd.DataFrame]:
+    """
+    Лабораторные измерения напрямую из PostgreSQL. Тип продукта партии
+    возвращается вложенным словарём production_batches, как при
+    встраивании связи в PostgREST. None — запрос не удался.
+    """
+    clauses, params = [], []
+    if batch_id:
+        clauses.append("m.batch_id = %s")
+        params.append(batch_id)
+    if parameter_name:
+        clauses.append("m.parameter_name = %s")
+        params.append(parameter_name)
+
+    sql = ("SELECT m.*, b.product_type AS _product_type "
+           "FROM lab_measurements m LEFT JOIN production_batches b ON b.batch_id = m.batch_id"
+           f"{_where(clauses)} ORDER BY m.measurement_time DESC")
+    try:
+        df = copy_to_dataframe(sql, params)
+    except Exception as e:
+        print(f"Прямое чтение измерений не удалось, используется PostgREST: {e}")
+        return None
+
+    if df.empty:
+        return df
+    df['production_batches'] = [
+        {'product_type': product, 'batch_id': batch} if pd.notna(product) else None
+        for product, batch in zip(df.pop('_product_type'), df['batch_id'])
+    ]
+    return df
+
+
+def fetch_production_aggregates_fast(date_from: datetime, date_to: datetime) -> Optional[Dict]:
+    """
+    Статистика производства за период, агрегированная на стороне БД.
+    Формат совпадает с get_production_statistics.
+    """
+    sql = ("SELECT product_type, count(*) AS batches, sum(initial_weight) AS weight, "
+           "sum(target_sea_buckthorn_concentration) AS conc_sum, "
+           "count(target_sea_buckthorn_concentration) AS conc_count "
+           "FROM production_batches WHERE start_time >= %s AND start_time <= %s "
+           "GROUP BY product_type")
+    try:
+        df = copy_to_dataframe(sql, [date_from, date_to])
+    except Exception as e:
+        print(f"Прямое чтение статистики не удалось, используется PostgREST: {e}")
+        return None
+
+    if df.empty:
+        return {}
+
+    conc_count = df['conc_count'].sum()
+    return {
+        'total_batches': int(df['batches'].sum()),
+        'total_weight': df['weight'].sum(),
+        'avg_concentration': df['conc_sum'].sum() / conc_count if conc_count else float('nan'),
+        'product_types': dict(zip(df['product_type'], df['batches'].astype(int)))
+    }
@@ -1,11 +1,9 @@
 import os
 import streamlit as st
-from supabase import create_client, Client
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any
 import hashlib
-import json
 
 
 # =================================================================
@@ -13,41 +11,110 @@ import json
 # =================================================================
 
 def get_supabase_config():
-    """Получает конфигурацию Supabase"""
+    """Получает конфигурацию Supabase: secrets, иначе переменные окружения"""
     try:
         if hasattr(st, 'secrets') and 'supabase' in st.secrets:
             return {
                 'url': st.secrets['supabase']['url'],
                 'key': st.secrets['supabase']['key'],
-                'db_url': st.secrets['supabase']['db_url']
-            }
-        else:
-            return {
-                'url': os.getenv('SUPABASE_URL'),
-                'key': os.getenv('SUPABASE_KEY'),
-                'db_url': os.getenv('SUPABASE_DB_URL')
+                'db_url': st.secrets['supabase'].get('db_url')
             }
     except Exception as e:
-        st.error(f"Ошибка загрузки конфигурации Supabase: {e}")
-        return None
+        # Нет файла secrets (например, автономный mqtt_client) — берём окружение
+        print(f"Secrets недоступны, используется окружение: {e}")
+
+    return {
+        'url': os.getenv('SUPABASE_URL'),
+        'key': os.getenv('SUPABASE_KEY'),
+        'db_url': os.getenv('SUPABASE_DB_URL')
+    }
+
+
+# =================================================================
+# === БЭКЕНДЫ ХРАНЕНИЯ ===
+# =================================================================
+# Бэкенд — фабрика, которая получает настройки и возвращает объект
+# с интерфейсом supabase.Client: table(...).select/insert/update(...).execute().
+# Все функции модуля работают через init_supabase() и не зависят от бэкенда.
+
+def get_storage_settings() -> Dict:
+    """Настройки хранилища: секция [storage] в secrets или переменные окружения"""
+    settings = {
+        'backend': os.getenv('ZHAYA_STORAGE_BACKEND', 'supabase'),
+        'local_db_path': os.getenv('ZHAYA_LOCAL_DB'),
+        'fallback_to_local': os.getenv('ZHAYA_LOCAL_FALLBACK', '0') == '1'
+    }
+    try:
+        if hasattr(st, 'secrets') and 'storage' in st.secrets:
+            settings.update(dict(st.secrets['storage']))
+    except Exception:
+        pass
+    return settings
+
+
+def get_storage_backend_name() -> str:
+    """Имя активного бэкенда хранения"""
+    return get_storage_settings()['backend']
+
+
+def _create_supabase_backend(settings: Dict):
+    """
+    Облачный Supabase: общий клиент процесса из connection.py.
+    Проверочного запроса нет — состояние видно по get_connection_manager().health(),
+    кроме режима fallback_to_local: там один лёгкий запрос при создании клиента
+    решает, переключаться ли на локальную БД.
+    """
+    from connection import get_connection_manager
+    client = get_connection_manager().client
+    if settings.get('fallback_to_local'):
+        import httpx
+        try:
+            client.table('production_batches').select('batch_id').limit(1).execute()
+        except httpx.TransportError as e:
+            # Сеть или DNS: облако недоступно. Ошибки PostgREST (права, схема)
+            # означают, что облако отвечает, — они не повод переключаться
+            raise RuntimeError(f"Supabase недоступен: {e}") from e
+    return client
+
+
+def _create_local_backend(settings: Dict):
+    """Локальная SQLite-база с той же схемой"""
+    from database_local import LocalClient, DEFAULT_LOCAL_DB
+    return LocalClient(settings.get('local_db_path') or DEFAULT_LOCAL_DB)
+
+
+STORAGE_BACKENDS = {
+    'supabase': _create_supabase_backend,
+    'local': _create_local_backend,
+}
+
+
+def register_storage_backend(name: str, factory):
+    """Регистрирует дополнительный бэкенд хранения"""
+    STORAGE_BACKENDS[name] = factory
 
 
 @st.cache_resource
 def init_supabase():
-    """Инициализирует клиент Supabase с проверкой"""
-    config = get_supabase_config()
-    if not config or not all(config.values()):
-        st.error("⚠️ Конфигурация Supabase не найдена!")
+    """Клиент выбранного бэкенда хранения"""
+    settings = get_storage_settings()
+    factory = STORAGE_BACKENDS.get(settings['backend'])
+    if factory is None:
+        st.error(f"⚠️ Неизвестный бэкенд хранения: {settings['backend']}")
         return None
 
     try:
-        supabase: Client = create_client(config['url'], config['key'])
-        # Проверка подключения
-        response = supabase.table('production_batches').select('count', count='exact').limit(1).execute()
-        return supabase
+        client = factory(settings)
     except Exception as e:
         st.error(f"❌ Ошибка подключения к Supabase: {e}")
-        return None
+        client = None
+
+    # Резервный режим: при недоступности облака работаем с локальной БД
+    if client is None and settings.get('fallback_to_local') and settings['backend'] != 'local':
+        st.warning("⚠️ Supabase недоступен, используется локальная база данных")
+        client = _create_local_backend(settings)
+
+    return client
 
 
 # =================================================================
@@ -84,10 +151,15 @@ def fetch_reports_config_cached():
     return fetch_reports_config()
 
 
-def clear_all_caches():
-    """Очистка всех кэшей"""
+def clear_all_caches(resources: bool = False):
+    """
+    Очистка кэшей данных после записи.
+    resources=True дополнительно сбрасывает клиентов, пулы и сводки (rollups),
+    которые иначе переживают запись и обновляются инкрементально.
+    """
     st.cache_data.clear()
-    st.cache_resource.clear()
+    if resources:
+        st.cache_resource.clear()
 
 
 # =================================================================
@@ -181,6 +253,14 @@ def fetch_production_batches(limit: int = 100) -> pd.DataFrame:
 
 def fetch_iot_sensor_data(batch_id: int = None, limit: int = 1000):
     """Получает данные IoT сенсоров"""
+    from database_pg import is_pg_available, fetch_sensor_history_fast
+
+    # Быстрый путь: COPY из PostgreSQL вместо JSON через PostgREST
+    if is_pg_available():
+        df = fetch_sensor_history_fast(batch_id=batch_id, limit=limit)
+        if df is not None:
+            return df
+
     supabase = init_supabase()
     if not supabase:
         return pd.DataFrame()
@@ -271,6 +351,14 @@ def add_lab_measurement(batch_id: int, parameter_name: str, parameter_value: flo
 
 def fetch_lab_measurements(batch_id: int = None) -> pd.DataFrame:
     """Получает лабораторные измерения"""
+    from database_pg import is_pg_available, fetch_lab_measurements_fast
+
+    # Быстрый путь: COPY из PostgreSQL вместо JSON через PostgREST
+    if is_pg_available():
+        df = fetch_lab_measurements_fast(batch_id=batch_id)
+        if df is not None:
+            return df
+
     supabase = init_supabase()
     if not supabase:
         return pd.DataFrame()
@@ -290,6 +378,170 @@ def fetch_lab_measurements(batch_id: int = None) -> pd.DataFrame:
         return pd.DataFrame()
 
 
+# =================================================================
+# === МАССОВЫЙ ИМПОРТ ИЗМЕРЕНИЙ ===
+# =================================================================
+
+BULK_INSERT_CHUNK_SIZE = 500
+
+LAB_IMPORT_COLUMNS = [
+    'batch_id', 'parameter_name', 'parameter_value', 'parameter_unit',
+    'lab_technician', 'measurement_time', 'notes'
+]
+
+# Альтернативные названия колонок в выгрузках приборов
+LAB_IMPORT_ALIASES = {
+    'batch': 'batch_id', 'партия': 'batch_id',
+    'parameter': 'parameter_name', 'параметр': 'parameter_name',
+    'value': 'parameter_value', 'значение': 'parameter_value',
+    'unit': 'parameter_unit', 'единица': 'parameter_unit',
+    'technician': 'lab_technician', 'лаборант': 'lab_technician',
+    'time': 'measurement_time', 'время': 'measurement_time',
+    'заметки': 'notes'
+}
+
+
+def read_lab_measurements_file(uploaded_file) -> pd.DataFrame:
+    """Читает CSV/Excel с измерениями и приводит названия колонок к схеме БД"""
+    name = getattr(uploaded_file, 'name', str(uploaded_file)).lower()
+    if name.endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(uploaded_file)
+    else:
+        df = pd.read_csv(uploaded_file)
+        # Выгрузки с разделителем «;» читаются как одна колонка
+        if df.shape[1] == 1 and ';' in str(df.columns[0]):
+            if hasattr(uploaded_file, 'seek'):
+                uploaded_file.seek(0)
+            df = pd.read_csv(uploaded_file, sep=';', decimal=',')
+
+    normalized = {c: str(c).strip().lower() for c in df.columns}
+    df = df.rename(columns={c: LAB_IMPORT_ALIASES.get(n, n) for c, n in normalized.items()})
+    return df
+
+
+def validate_lab_measurements_frame(df: pd.DataFrame,
+                                    known_batch_ids: Optional[set] = None) -> tuple:
+    """
+    Проверяет все строки за один векторизованный проход.
+    Возвращает (valid_df, errors_df); errors_df содержит номер строки файла и причину.
+    """
+    missing = [c for c in ('batch_id', 'parameter_name', 'parameter_value') if c not in df.columns]
+    if missing:
+        errors = pd.DataFrame({'row': [None], 'error': [f"Нет обязательных колонок: {', '.join(missing)}"]})
+        return pd.DataFrame(columns=LAB_IMPORT_COLUMNS), errors
+
+    data = df.reindex(columns=LAB_IMPORT_COLUMNS).copy()
+    data['batch_id'] = pd.to_numeric(data['batch_id'], errors='coerce')
+    data['parameter_name'] = data['parameter_name'].astype('string').str.strip()
+    data['parameter_value'] = pd.to_numeric(
+        data['parameter_value'].astype('string').str.replace(',', '.', regex=False), errors='coerce'
+    )
+    raw_time = data['measurement_time']
+    data['measurement_time'] = pd.to_datetime(raw_time, errors='coerce')
+
+    checks = [
+        (data['batch_id'].isna() | (data['batch_id'] % 1 != 0), "Некорректный batch_id"),
+        (~data['parameter_name'].isin(get_parameter_options()).fillna(False), "Неизвестный параметр"),
+        (data['parameter_value'].isna(), "Значение не является числом"),
+        (raw_time.notna() & data['measurement_time'].isna(), "Некорректная дата измерения"),
+    ]
+    if known_batch_ids is not None:
+        checks.append((data['batch_id'].notna() & ~data['batch_id'].isin(known_batch_ids),
+                       "Партия не найдена"))
+
+    # Номер строки в файле: +2 (заголовок и нумерация с единицы)
+    error_parts = [
+        pd.DataFrame({'row': data.index[mask.to_numpy()] + 2, 'error': message})
+        for mask, message in checks if mask.any()
+    ]
+    if error_parts:
+        errors = pd.concat(error_parts).groupby('row', sort=True)['error'] \
+            .agg('; '.join).reset_index()
+        valid = data.drop(index=errors['row'] - 2)
+    else:
+        errors = pd.DataFrame(columns=['row', 'error'])
+        valid = data
+
+    valid = valid.astype({'batch_id': 'int64'})
+    return valid, errors
+
+
+def fetch_existing_batch_ids(batch_ids) -> set:
+    """Возвращает множество существующих batch_id одним запросом"""
+    supabase = init_supabase()
+    if not supabase or not len(batch_ids):
+        return set()
+
+    response = supabase.table('production_batches') \
+        .select('batch_id') \
+        .in_('batch_id', [int(b) for b in batch_ids]) \
+        .execute()
+    return {row['batch_id'] for row in response.data or []}
+
+
+def _measurement_records(df: pd.DataFrame) -> List[Dict]:
+    """
+    Готовит строки DataFrame к вставке (NaN -> None, даты -> ISO).
+    Пустое время заполняется временем импорта: у всех записей пакета одни
+    и те же ключи, иначе PostgREST передал бы недостающие колонки как NULL,
+    а не DEFAULT now().
+    """
+    out = df.copy()
+    imported_at = datetime.now(timezone.utc).isoformat()
+    out['measurement_time'] = out['measurement_time'].map(
+        lambda t: t.isoformat() if pd.notna(t) else imported_at
+    )
+    return out.astype(object).where(out.notna(), None).to_dict('records')
+
+
+def bulk_add_lab_measurements(df: pd.DataFrame, user_id: str = None,
+                              chunk_size: int = BULK_INSERT_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Массовый импорт измерений: валидация одним проходом, вставка пакетами,
+    построчный отчёт об ошибках и одна очистка кэша в конце.
+    """
+    supabase = init_supabase()
+    if not supabase:
+        return {'inserted': 0, 'errors': pd.DataFrame({'row': [None], 'error': ["Нет подключения к БД"]})}
+
+    candidate_ids = pd.to_numeric(df.get('batch_id', pd.Series(dtype=float)), errors='coerce').dropna().unique()
+    try:
+        known_ids = fetch_existing_batch_ids(candidate_ids)
+    except Exception as e:
+        st.error(f"Ошибка проверки партий: {e}")
+        return {'inserted': 0, 'errors': pd.DataFrame({'row': [None], 'error': [str(e)]})}
+
+    valid, errors = validate_lab_measurements_frame(df, known_ids)
+    error_parts = [errors]
+    inserted = 0
+
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid.iloc[start:start + chunk_size]
+        records = _measurement_records(chunk)
+        try:
+            response = supabase.table('lab_measurements').insert(records).execute()
+            inserted += len(response.data or [])
+        except Exception:
+            # Пакет отклонён целиком — вставляем по строке, чтобы найти виновные
+            for row_index, record in zip(chunk.index, records):
+                try:
+                    supabase.table('lab_measurements').insert(record).execute()
+                    inserted += 1
+                except Exception as e:
+                    error_parts.append(pd.DataFrame({'row': [row_index + 2], 'error': [str(e)]}))
+
+    all_errors = pd.concat([e for e in error_parts if not e.empty]) if any(
+        not e.empty for e in error_parts) else pd.DataFrame(columns=['row', 'error'])
+
+    if inserted:
+        if user_id:
+            log_user_action(user_id, "bulk_add_measurements",
+                            f"Импортировано измерений: {inserted}, ошибок: {len(all_errors)}")
+        clear_all_caches()
+
+    return {'inserted': inserted, 'errors': all_errors.reset_index(drop=True)}
+
+
 # =================================================================
 # === ДАШБОРДЫ И ОТЧЕТЫ ИЗ БД ===
 # =================================================================
@@ -414,25 +666,10 @@ def save_dashboard_config(config: Dict, user_id: str) -> bool:
 # =================================================================
 
 def log_user_action(user_id: str, action: str, details: str = "", metadata: Dict = None):
-    """Логирование действий пользователя"""
-    supabase = init_supabase()
-    if not supabase:
-        return
+    """Логирование действий пользователя (запись в фоне пакетами, см. audit_log)"""
+    from audit_log import enqueue_activity
 
-    try:
-        log_data = {
-            'user_id': user_id,
-            'action': action,
-            'details': details,
-            'timestamp': datetime.utcnow().isoformat()
-        }
-
-        if metadata:
-            log_data['metadata'] = json.dumps(metadata)
-
-        supabase.table('activity_logs').insert(log_data).execute()
-    except Exception as e:
-        print(f"Ошибка логирования: {e}")
+    enqueue_activity(user_id, action, details, metadata)
 
 
 def fetch_activity_logs(user_id: str = None, limit: int = 100) -> pd.DataFrame:
@@ -464,6 +701,14 @@ def fetch_activity_logs(user_id: str = None, limit: int = 100) -> pd.DataFrame:
 @st.cache_data(ttl=300)
 def get_production_statistics(date_from: datetime, date_to: datetime) -> Dict:
     """Получает статистику производства за период"""
+    from database_pg import is_pg_available, fetch_production_aggregates_fast
+
+    # Быстрый путь: агрегация на стороне PostgreSQL без передачи строк
+    if is_pg_available():
+        stats = fetch_production_aggregates_fast(date_from, date_to)
+        if stats is not None:
+            return stats
+
     supabase = init_supabase()
     if not supabase:
         return {}
@@ -495,44 +740,11 @@ def get_production_statistics(date_from: datetime, date_to: datetime) -> Dict:
 
 
 def get_batch_details(batch_id: int):
-    """Получает детальную информацию о партии"""
-    supabase = init_supabase()
-    if not supabase:
-        return None
+    """Получает детальную информацию о партии (запросы выполняются параллельно)"""
+    from database_async import get_batch_details_async
 
     try:
-        # Основная информация о партии
-        batch_response = supabase.table('production_batches') \
-            .select('*') \
-            .eq('batch_id', batch_id) \
-            .execute()
-
-        if not batch_response.data:
-            return None
-
-        batch_data = batch_response.data[0]
-
-        # Лабораторные измерения
-        lab_data = fetch_lab_measurements(batch_id)
-
-        # Данные сенсоров
-        sensor_data = fetch_iot_sensor_data(batch_id, limit=100)
-
-        # Этапы производства
-        stages_response = supabase.table('production_stages') \
-            .select('*') \
-            .eq('batch_id', batch_id) \
-            .order('stage_order') \
-            .execute()
-
-        stages_data = pd.DataFrame(stages_response.data) if stages_response.data else pd.DataFrame()
-
-        return {
-            'batch_info': batch_data,
-            'lab_measurements': lab_data,
-            'sensor_data': sensor_data,
-            'production_stages': stages_data
-        }
+        return get_batch_details_async(batch_id)
     except Exception as e:
         st.error(f"Ошибка получения деталей партии: {e}")
         return None
@@ -543,7 +755,7 @@ def get_batch_details(batch_id: int):
 def get_parameter_options() -> List[str]:
     """Возвращает список доступных параметров"""
     return [
-        'W', 'S', 'pH', 'ORP', 'protein', 'fat', 'ash', 'C_L', 'C_a', 'C_b',
+        'W', 'S', 'pH', 'Aw', 'ORP', 'protein', 'fat', 'ash', 'C_L', 'C_a', 'C_b',
         'WBC', 'WRC', 'FBC', 'TBARS', 'peroxide_value', 'antioxidants',
         'beta_carotene', 'flavonoids', 'vitamin_c', 'vitamin_e', 'TAMC'
     ]
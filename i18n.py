@@ -0,0 +1,207 @@
+# i18n.py - Каталоги переводов: ленивая загрузка и плоские таблицы поиска
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+LOCALES_DIR = Path(__file__).resolve().parent / "locales"
+
+# Язык, которым дополняются переводы с пропущенными ключами
+FALLBACK_LANG = "ru"
+
+# Порядок языков в интерфейсе (остальные найденные файлы — по алфавиту)
+LANG_ORDER = ("ru", "en", "kk")
+
+
+# =================================================================
+# === КАТАЛОГИ ===
+# =================================================================
+# Каталог языка — locales/<lang>.json. При первом обращении он читается
+# и компилируется в плоский dict: пропущенные ключи заранее дополнены
+# переводом FALLBACK_LANG, строки интернированы. get_text — один dict.get.
+
+_raw: Dict[str, Dict[str, str]] = {}
+_tables: Dict[str, Dict[str, str]] = {}
+_languages: List[str] = []
+_lock = threading.Lock()
+
+
+def available_languages() -> List[str]:
+    """Языки, для которых есть файл каталога (список читается один раз)"""
+    if not _languages:
+        found = {path.stem for path in LOCALES_DIR.glob("*.json")}
+        _languages.extend([lang for lang in LANG_ORDER if lang in found] + sorted(found - set(LANG_ORDER)))
+    return _languages
+
+
+def _read_catalog(lang: str) -> Dict[str, str]:
+    catalog = _raw.get(lang)
+    if catalog is None:
+        path = LOCALES_DIR / f"{lang}.json"
+        catalog = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        _raw[lang] = catalog
+    return catalog
+
+
+def _compile(lang: str) -> Dict[str, str]:
+    table = {}
+    if lang != FALLBACK_LANG:
+        table.update(_read_catalog(FALLBACK_LANG))
+    table.update(_read_catalog(lang))
+    return {sys.intern(key): sys.intern(text) for key, text in table.items()}
+
+
+def get_catalog(lang: str) -> Dict[str, str]:
+    """Скомпилированная таблица языка (неизвестный язык — таблица FALLBACK_LANG)"""
+    table = _tables.get(lang)
+    if table is None:
+        with _lock:
+            table = _tables.get(lang)
+            if table is None:
+                if lang in available_languages():
+                    table = _compile(lang)
+                else:
+                    table = get_catalog(FALLBACK_LANG) if lang != FALLBACK_LANG else {}
+                _tables[lang] = table
+    return table
+
+
+def get_text(key: str, lang: str = "ru") -> str:
+    """
+    Return localized string for `key` in language `lang`.
+    If missing, fallback to Russian, then to key.
+    """
+    table = _tables.get(lang) or get_catalog(lang)
+    return table.get(key, key)
+
+
+def get_texts(keys: Iterable[str], lang: str = "ru") -> Dict[str, str]:
+    """
+    Переводы сразу для набора ключей (например, всех строк страницы):
+        t = get_texts(PAGE_KEYS, lang)
+        st.header(t["ph_title"])
+    """
+    table = _tables.get(lang) or get_catalog(lang)
+    return {key: table.get(key, key) for key in keys}
+
+
+def missing_keys() -> Dict[str, List[str]]:
+    """Ключи, которые есть хотя бы в одном каталоге, но отсутствуют в данном"""
+    catalogs = {lang: _read_catalog(lang) for lang in available_languages()}
+    all_keys = set().union(*catalogs.values()) if catalogs else set()
+    return {lang: sorted(all_keys - set(catalog)) for lang, catalog in catalogs.items()}
+
+
+def reload_catalogs():
+    """Сбрасывает загруженные каталоги (после правки файлов locales/)"""
+    with _lock:
+        _raw.clear()
+        _tables.clear()
+        _languages.clear()
+
+
+class _LangCatalogs(Mapping):
+    """
+    Совместимость со словарём LANG: LANG["en"]["title"], list(LANG.keys()).
+    Каталог читается при первом обращении к языку.
+    """
+
+    def __getitem__(self, lang: str) -> Dict[str, str]:
+        if lang not in available_languages():
+            raise KeyError(lang)
+        return get_catalog(lang)
+
+    def __iter__(self):
+        return iter(available_languages())
+
+    def __len__(self):
+        return len(available_languages())
+
+
+LANG = _LangCatalogs()
+
+
+# =================================================================
+# === БЕНЧМАРК ===
+# =================================================================
+
+def _legacy_get_text(legacy: Dict[str, Dict[str, str]], key: str, lang: str) -> str:
+    # Прежняя реализация: двухуровневый поиск под try
+    try:
+        return legacy.get(lang, legacy["ru"]).get(key, key)
+    except Exception:
+        return key
+
+
+def _timed_import(code: str, repeats: int) -> float:
+    script = f"import time; t = time.perf_counter(); {code}; print(time.perf_counter() - t)"
+    times = []
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return sorted(times)[len(times) // 2]
+
+
+def _per_call_ns(fn, calls: List[Tuple[str, str]], rounds: int = 200) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for key, lang in calls:
+            fn(key, lang)
+    return (time.perf_counter() - started) / (rounds * len(calls)) * 1e9
+
+
+def benchmark(repeats: int = 5):
+    """Импорт ui и стоимость переводов за один запуск страницы"""
+    base = "import streamlit, pandas, numpy"
+    deps = _timed_import(base, repeats)
+    ui = _timed_import(f"{base}; t = time.perf_counter(); import ui", repeats)
+    print(f"import ui поверх streamlit/pandas/numpy: {ui * 1000:.1f} мс (сами зависимости {deps * 1000:.0f} мс)")
+
+    started = time.perf_counter()
+    reload_catalogs()
+    get_text("title", "kk")
+    print(f"первая загрузка каталога (kk + ru): {(time.perf_counter() - started) * 1000:.2f} мс")
+
+    legacy = {lang: dict(_read_catalog(lang)) for lang in available_languages()}
+    keys = list(_read_catalog(FALLBACK_LANG))
+    # Типичный запуск страницы: несколько сотен обращений, часть — к отсутствующим ключам
+    calls = [(key, lang) for lang in ("ru", "en", "kk") for key in keys] + [("no_such_key", "en")] * 50
+    old = _per_call_ns(lambda key, lang: _legacy_get_text(legacy, key, lang), calls)
+    new = _per_call_ns(get_text, calls)
+    print(f"get_text: было {old:.0f} нс, стало {new:.0f} нс на вызов ({old / new:.1f}x)")
+
+    started = time.perf_counter()
+    for _ in range(200):
+        get_texts(keys, "en")
+    bulk = (time.perf_counter() - started) / (200 * len(keys)) * 1e9
+    print(f"get_texts: {bulk:.0f} нс на ключ ({len(keys)} ключей за вызов)")
+    print(f"300 переводов за запуск: было {old * 300 / 1000:.1f} мкс, стало {new * 300 / 1000:.1f} мкс")
+
+
+def _report_missing():
+    for lang, keys in missing_keys().items():
+        print(f"{lang}: {len(keys)} пропущено" + (f" — {', '.join(keys)}" if keys else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Каталоги переводов: пропущенные ключи и бенчмарк")
+    parser.add_argument("--benchmark", action="store_true", help="замерить импорт ui и get_text")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    _report_missing()
+    if args.benchmark:
+        print()
+        benchmark(args.repeats)
@@ -0,0 +1,308 @@
+# measurement_matrix.py - Широкая матрица измерений: партия × параметр
+import argparse
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from database_supabase import init_supabase, get_parameter_options
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+# Размер страницы при догрузке новых измерений (keyset-пагинация)
+MATRIX_PAGE_SIZE = 1000
+
+# Не чаще одного инкрементального обновления за интервал (секунды)
+MATRIX_MIN_REFRESH_SECONDS = 5
+
+# Начальная ёмкость по партиям (удваивается при заполнении)
+MATRIX_INITIAL_BATCHES = 256
+
+# Минимум партий с обоими параметрами для коэффициента корреляции
+MIN_PAIRED_BATCHES = 3
+
+_MEASUREMENT_COLUMNS = 'measurement_id, batch_id, parameter_name, parameter_value, measurement_time'
+
+
+class MatrixSnapshot(NamedTuple):
+    """
+    Неизменяемый снимок матрицы. values[i, j] — последнее по времени
+    значение параметра parameters[j] партии batch_ids[i]; mask — есть ли
+    значение (на месте пропуска в values NaN); times — время этого замера;
+    counts — сколько всего замеров было в ячейке.
+    """
+    batch_ids: np.ndarray
+    parameters: List[str]
+    values: np.ndarray
+    mask: np.ndarray
+    times: np.ndarray
+    counts: np.ndarray
+
+    def frame(self, parameters: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Матрица как DataFrame: индекс — batch_id, колонки — параметры"""
+        columns = self.parameters if parameters is None else list(parameters)
+        index = [self.parameters.index(name) for name in columns]
+        return pd.DataFrame(self.values[:, index], index=pd.Index(self.batch_ids, name='batch_id'),
+                            columns=columns)
+
+    def column(self, parameter: str) -> pd.Series:
+        """Последние значения одного параметра по партиям, где он измерен"""
+        j = self.parameters.index(parameter)
+        present = self.mask[:, j]
+        return pd.Series(self.values[present, j], index=pd.Index(self.batch_ids[present], name='batch_id'),
+                         name=parameter)
+
+    def correlation(self, min_periods: int = MIN_PAIRED_BATCHES) -> pd.DataFrame:
+        """
+        Попарная корреляция Пирсона параметров по партиям, где измерены оба
+        параметра. Все пары считаются матричными произведениями по маске,
+        без отдельной фильтрации для каждой пары.
+        """
+        present = self.mask.astype(np.float64)
+        x = np.where(self.mask, self.values, 0.0)
+        n = present.T @ present
+        sum_x = x.T @ present           # [i, j]: сумма параметра i по партиям, где есть и j
+        sum_sq = (x * x).T @ present
+        cross = x.T @ x
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = cross - sum_x * sum_x.T / n
+            var_i = sum_sq - sum_x ** 2 / n
+            corr = cov / np.sqrt(var_i * var_i.T)
+        corr[n < min_periods] = np.nan
+        return pd.DataFrame(np.clip(corr, -1.0, 1.0), index=self.parameters, columns=self.parameters)
+
+
+# =================================================================
+# === ХРАНИЛИЩЕ МАТРИЦЫ ===
+# =================================================================
+
+class MeasurementMatrix:
+    """
+    Измерения lab_measurements в широком виде: строка на партию, колонка
+    на параметр из get_parameter_options(). Массивы NumPy растут по числу
+    партий удвоением; новые измерения (водяной знак — measurement_id)
+    вносятся векторно, в ячейке остаётся самый поздний замер.
+    Снимок копируется только после изменения матрицы.
+    """
+
+    def __init__(self, client_factory=init_supabase, parameters: Optional[List[str]] = None,
+                 page_size: int = MATRIX_PAGE_SIZE):
+        self._client_factory = client_factory
+        self._page_size = page_size
+        self._lock = threading.Lock()
+        # Догрузка идёт в одном потоке: иначе две догрузки с одного водяного знака
+        # внесут одни и те же измерения дважды
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._watermark = 0
+
+        self.parameters = list(parameters or get_parameter_options())
+        self._column = {name: j for j, name in enumerate(self.parameters)}
+        # batch_id -> номер строки; строки [0, _size) заняты, остальное — запас ёмкости
+        self._row: Dict[int, int] = {}
+        self._size = 0
+        self._batch_ids = np.empty(0, dtype=np.int64)
+        self._values = np.empty((0, len(self.parameters)))
+        self._times = np.empty((0, len(self.parameters)), dtype='datetime64[ns]')
+        self._counts = np.empty((0, len(self.parameters)), dtype=np.int32)
+        self._grow(MATRIX_INITIAL_BATCHES)
+
+        self._version = 0
+        self._snapshot: Optional[MatrixSnapshot] = None
+        self._snapshot_version = -1
+        self.skipped = 0
+
+    # --- обновление ---
+
+    def refresh(self, force: bool = False) -> bool:
+        """Догружает новые измерения; False — клиент недоступен"""
+        if not force and time.monotonic() - self._last_refresh < MATRIX_MIN_REFRESH_SECONDS:
+            return True
+
+        requested = time.monotonic()
+        with self._refresh_lock:
+            # Пока ждали блокировку, догрузку мог выполнить другой поток
+            if self._last_refresh >= requested or \
+                    (not force and time.monotonic() - self._last_refresh < MATRIX_MIN_REFRESH_SECONDS):
+                return True
+
+            client = self._client_factory()
+            if client is None:
+                return False
+
+            while True:
+                response = client.table('lab_measurements').select(_MEASUREMENT_COLUMNS) \
+                    .gt('measurement_id', self._watermark) \
+                    .in_('parameter_name', self.parameters) \
+                    .order('measurement_id') \
+                    .limit(self._page_size) \
+                    .execute()
+                rows = response.data or []
+                if rows:
+                    self.apply(pd.DataFrame(rows))
+                    self._watermark = max(self._watermark, max(r['measurement_id'] for r in rows))
+                if len(rows) < self._page_size:
+                    break
+            self._last_refresh = time.monotonic()
+            return True
+
+    def _grow(self, capacity: int):
+        rows, columns = self._size, len(self.parameters)
+        batch_ids = np.zeros(capacity, dtype=np.int64)
+        values = np.full((capacity, columns), np.nan)
+        times = np.full((capacity, columns), np.datetime64('NaT'), dtype='datetime64[ns]')
+        counts = np.zeros((capacity, columns), dtype=np.int32)
+        batch_ids[:rows], values[:rows] = self._batch_ids[:rows], self._values[:rows]
+        times[:rows], counts[:rows] = self._times[:rows], self._counts[:rows]
+        self._batch_ids, self._values, self._times, self._counts = batch_ids, values, times, counts
+
+    def apply(self, df: pd.DataFrame):
+        """Вносит измерения (колонки как в lab_measurements); строки без партии, параметра вне списка
+        или с нечисловым значением пропускаются"""
+        columns = df['parameter_name'].map(self._column)
+        batch = pd.to_numeric(df['batch_id'], errors='coerce')
+        values = pd.to_numeric(df['parameter_value'], errors='coerce')
+        times = pd.to_datetime(df['measurement_time'], format='ISO8601', utc=True,
+                               errors='coerce').dt.tz_convert(None)
+        valid = columns.notna() & batch.notna() & values.notna()
+        self.skipped += int((~valid).sum())
+        if not valid.any():
+            return
+
+        new = pd.DataFrame({'batch': batch[valid].astype(np.int64), 'col': columns[valid].astype(np.int64),
+                            'value': values[valid].astype(np.float64), 'time': times[valid]})
+        with self._lock:
+            unseen = pd.unique(new['batch'][~new['batch'].isin(self._row.keys())])
+            if len(unseen):
+                rows, added = self._size, len(unseen)
+                if rows + added > len(self._batch_ids):
+                    self._grow(max(2 * len(self._batch_ids), rows + added))
+                self._batch_ids[rows:rows + added] = unseen
+                self._row.update(zip(unseen.tolist(), range(rows, rows + added)))
+                self._size += added
+
+            row = new['batch'].map(self._row).to_numpy()
+            col = new['col'].to_numpy()
+            np.add.at(self._counts, (row, col), 1)
+
+            # Последний по времени замер каждой ячейки из новых строк
+            # (NaT — время неизвестно — уступает любому известному)
+            latest = new.assign(row=row).sort_values('time', na_position='first', kind='stable') \
+                .drop_duplicates(['row', 'col'], keep='last')
+            r, c = latest['row'].to_numpy(), latest['col'].to_numpy()
+            t = latest['time'].to_numpy(dtype='datetime64[ns]')
+            current = self._times[r, c]
+            newer = np.isnan(self._values[r, c]) | np.isnat(current) | (~np.isnat(t) & (t >= current))
+            self._values[r[newer], c[newer]] = latest['value'].to_numpy()[newer]
+            self._times[r[newer], c[newer]] = t[newer]
+            self._version += 1
+
+    # --- чтение ---
+
+    def snapshot(self) -> MatrixSnapshot:
+        """Снимок текущей матрицы (массивы только для чтения, общие до следующего изменения)"""
+        with self._lock:
+            if self._snapshot_version != self._version:
+                rows = self._size
+                arrays = (self._batch_ids[:rows].copy(), self._values[:rows].copy(),
+                          ~np.isnan(self._values[:rows]), self._times[:rows].copy(), self._counts[:rows].copy())
+                for array in arrays:
+                    array.flags.writeable = False
+                batch_ids, values, mask, times, counts = arrays
+                self._snapshot = MatrixSnapshot(batch_ids, list(self.parameters), values, mask, times, counts)
+                self._snapshot_version = self._version
+            return self._snapshot
+
+
+@st.cache_resource
+def get_measurement_matrix() -> MeasurementMatrix:
+    """Одна матрица на процесс, общая для всех сессий"""
+    return MeasurementMatrix()
+
+
+def measurement_matrix() -> Optional[MatrixSnapshot]:
+    """Актуальный снимок матрицы; None — база недоступна"""
+    matrix = get_measurement_matrix()
+    try:
+        if not matrix.refresh():
+            return None
+    except Exception as e:
+        st.error(f"Ошибка обновления матрицы измерений: {e}")
+    return matrix.snapshot()
+
+
+# =================================================================
+# === БЕНЧМАРК ===
+# =================================================================
+
+def _synthetic_measurements(batches: int, per_cell: int, parameters: List[str]) -> pd.DataFrame:
+    rng = np.random.default_rng(11)
+    rows = batches * len(parameters) * per_cell
+    start = np.datetime64('2025-01-01T00:00:00')
+    return pd.DataFrame({
+        'measurement_id': np.arange(1, rows + 1),
+        'batch_id': rng.integers(1, batches + 1, rows),
+        'parameter_name': np.array(parameters, dtype=object)[rng.integers(0, len(parameters), rows)],
+        'parameter_value': rng.normal(5, 1, rows),
+        'measurement_time': (start + rng.integers(0, 365 * 24 * 3600, rows).astype('timedelta64[s]'))
+        .astype(str),
+    })
+
+
+def benchmark(batches: int = 2000, per_cell: int = 3, appends: int = 20):
+    """Фильтрация длинной таблицы по параметру против колонок плотной матрицы"""
+    parameters = get_parameter_options()
+    long = _synthetic_measurements(batches, per_cell, parameters)
+    print(f"{len(long)} измерений, {batches} партий x {len(parameters)} параметров")
+
+    matrix = MeasurementMatrix(client_factory=lambda: None, parameters=parameters)
+    started = time.perf_counter()
+    matrix.apply(long)
+    snapshot = matrix.snapshot()
+    print(f"построение матрицы: {(time.perf_counter() - started) * 1000:.0f} мс")
+
+    # Прежний путь: маска по parameter_name для каждого параметра, затем сборка пар
+    started = time.perf_counter()
+    long_times = pd.to_datetime(long['measurement_time'])
+    latest = long.assign(measurement_time=long_times).sort_values('measurement_time') \
+        .drop_duplicates(['batch_id', 'parameter_name'], keep='last')
+    columns = {name: latest[latest['parameter_name'] == name].set_index('batch_id')['parameter_value']
+               for name in parameters}
+    pd.DataFrame(columns).corr(min_periods=MIN_PAIRED_BATCHES)
+    masks_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    snapshot.correlation()
+    matrix_ms = (time.perf_counter() - started) * 1000
+    print(f"корреляция всех пар: маски по длинной таблице {masks_ms:.0f} мс, матрица {matrix_ms:.1f} мс "
+          f"({masks_ms / matrix_ms:.0f}x)")
+
+    started = time.perf_counter()
+    for _ in range(appends):
+        long[long['parameter_name'] == 'pH']['parameter_value'].mean()
+    filter_ms = (time.perf_counter() - started) * 1000 / appends
+    started = time.perf_counter()
+    for _ in range(appends):
+        snapshot.column('pH').mean()
+    column_ms = (time.perf_counter() - started) * 1000 / appends
+    print(f"среднее pH по партиям: фильтр {filter_ms:.2f} мс, колонка матрицы {column_ms:.3f} мс")
+
+    extra = _synthetic_measurements(batches, 1, parameters).head(100)
+    started = time.perf_counter()
+    for _ in range(appends):
+        matrix.apply(extra)
+        matrix.snapshot()
+    print(f"добавление 100 измерений + новый снимок: {(time.perf_counter() - started) * 1000 / appends:.2f} мс")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк матрицы измерений партия x параметр")
+    parser.add_argument("--batches", type=int, default=2000)
+    parser.add_argument("--per-cell", type=int, default=3)
+    args = parser.parse_args()
+    benchmark(args.batches, args.per_cell)
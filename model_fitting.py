@@ -0,0 +1,452 @@
+# model_fitting.py - Обучение регрессионных моделей на лабораторных данных
+import argparse
+import hashlib
+import time
+import warnings
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy.optimize import curve_fit
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from database_supabase import init_supabase
+from model_registry import ModelRecord, get_model_registry
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+# Как часто перечитывать обучающие данные из базы (секунды)
+TRAINING_DATA_TTL = 300
+
+# Сколько версий данных с обученными моделями держать в памяти
+FITTED_VERSIONS = 4
+
+# Размер страницы при выгрузке (keyset-пагинация)
+TRAINING_PAGE_SIZE = 1000
+
+# Продукт, для которого строятся модели влияния экстракта
+JAYA_PRODUCT = 'Жая'
+
+# Параметры lab_measurements, из которых собираются обучающие выборки:
+# влага, белок, ВУС (WBC), pH, активность воды, соль
+TRAINING_PARAMETERS = ['W', 'protein', 'WBC', 'pH', 'Aw', 'S']
+
+# Меньше точек — модель строится на справочных данных
+MIN_POINTS = {'quadratic': 5, 'linear': 4, 'log': 4, 'exponential': 5, 'multiple': 5}
+
+SOURCE_DB = 'db'
+SOURCE_REFERENCE = 'reference'
+
+# =================================================================
+# === СПРАВОЧНЫЕ ДАННЫЕ (эксперименты, таблицы.docx) ===
+# =================================================================
+
+REFERENCE_EXTRACT = np.array([0, 5, 7, 9, 11, 13, 15])  # Концентрация экстракта, %
+REFERENCE_JAYA = pd.DataFrame({
+    'Экстракт (%)': REFERENCE_EXTRACT,
+    'Влага (%)': [65.2, 67.8, 68.9, 67.3, 68.1, 67.7, 65.2],
+    'Белок (%)': [21.2, 25.44, 29.02, 29.5, 31.02, 35.01, 35.07],
+    'Жир (%)': [31.06, 33.4, 35.7, 37.2, 39.1, 42.7, 45.43],
+    'ТБЧ (мг/кг)': [0.69, 0.96, 0.99, 1.65, 1.46, 1.74, 2.12],
+    'ВУС (%)': [60.2, 67.4, 68.15, 72.3, 75.6, 77.8, 79.47],
+    'ВСС (%)': [62.8, 65.09, 69.19, 74.4, 74.9, 75.1, 75.7],
+    'ЖУС (%)': [60.01, 65.8, 67.1, 69.1, 70.1, 71.7, 73.1],
+})
+
+REFERENCE_TIME_H = np.array([0, 24, 48, 72, 96, 120, 144])
+REFERENCE_PH_CONTROL = np.array([6.5, 6.2, 5.9, 5.6, 5.4, 5.3, 5.2])
+REFERENCE_PH_EXTRACT = np.array([6.5, 6.3, 6.0, 5.7, 5.5, 5.4, 5.3])
+
+REFERENCE_SALT = np.array([2.5, 3.0, 3.5, 4.0, 4.5, 5.0])
+REFERENCE_DAYS = np.array([1, 2, 3, 4, 5, 6])
+# Тот же шум, что давал np.random.seed(42) + np.random.normal на странице
+REFERENCE_AW = 0.95 - 0.015 * REFERENCE_SALT - 0.003 * REFERENCE_DAYS \
+    + np.random.RandomState(42).normal(0, 0.001, 6)
+
+
+# =================================================================
+# === СЕМЕЙСТВА МОДЕЛЕЙ ===
+# =================================================================
+
+def log_model_fit(X, y):
+    """Логарифмдік регрессия (y = b0 + b1 * ln(1+X))"""
+    X_log = np.log1p(X.reshape(-1, 1))
+    model = LinearRegression()
+    model.fit(X_log, y)
+    y_pred = model.predict(X_log)
+    r2 = r2_score(y, y_pred)
+    rmse = np.sqrt(mean_squared_error(y, y_pred))
+    mae = mean_absolute_error(y, y_pred)
+    return model, r2, rmse, mae
+
+
+def pH_model(t, pH0, pH_inf, k):
+    """Экспоненциалды pH моделі: pH(t) = pH_inf + (pH0 - pH_inf) * exp(-k*t)"""
+    return pH_inf + (pH0 - pH_inf) * np.exp(-k * t)
+
+
+class ModelFit(NamedTuple):
+    """
+    Обученная модель. x — признак (для Aw — две колонки: соль, сутки),
+    y — отклик; coef — [b0, b1, ...] для МНК и [pH0, pH_inf, k] для pH.
+    """
+    name: str
+    kind: str
+    source: str
+    x: np.ndarray
+    y: np.ndarray
+    y_pred: np.ndarray
+    coef: np.ndarray
+    r2: float
+    rmse: float
+    mae: float
+    adj_r2: float
+    f_pvalue: float
+    pvalues: Optional[np.ndarray]
+    model: Optional[LinearRegression]
+
+
+def _features(kind: str, x: np.ndarray) -> np.ndarray:
+    if kind == 'quadratic':
+        return np.column_stack([x, x ** 2])
+    if kind == 'log':
+        return np.log1p(x).reshape(-1, 1)
+    if kind == 'multiple':
+        return x
+    return x.reshape(-1, 1)
+
+
+def fit_ols(name: str, kind: str, x: np.ndarray, y: np.ndarray, source: str) -> ModelFit:
+    """Линейная, квадратичная, логарифмическая или многофакторная модель МНК"""
+    features = _features(kind, x)
+    model = LinearRegression().fit(features, y)
+    y_pred = model.predict(features)
+    r2 = r2_score(y, y_pred)
+    adj_r2, f_pvalue, pvalues = r2, np.nan, None
+    try:
+        import statsmodels.api as sm
+
+        with warnings.catch_warnings():
+            # Справочные соль и сутки Aw коллинеарны — statsmodels предупреждает
+            warnings.simplefilter('ignore')
+            ols = sm.OLS(y, sm.add_constant(features, has_constant='add')).fit()
+        adj_r2, f_pvalue, pvalues = ols.rsquared_adj, ols.f_pvalue, ols.pvalues
+    except Exception:
+        pass
+    return ModelFit(name, kind, source, x, y, y_pred, np.concatenate([[model.intercept_], model.coef_]),
+                    r2, float(np.sqrt(mean_squared_error(y, y_pred))), mean_absolute_error(y, y_pred),
+                    adj_r2, f_pvalue, pvalues, model)
+
+
+def fit_ph(name: str, t: np.ndarray, ph: np.ndarray, source: str, k0: float = 0.01) -> ModelFit:
+    """Экспоненциальное снижение pH (curve_fit)"""
+    popt, _ = curve_fit(pH_model, t, ph, p0=[ph[np.argmin(t)], ph.min(), k0], maxfev=5000)
+    y_pred = pH_model(t, *popt)
+    ss_tot = np.sum((ph - np.mean(ph)) ** 2)
+    r2 = 1 - np.sum((ph - y_pred) ** 2) / ss_tot if ss_tot > 0 else np.nan
+    return ModelFit(name, 'exponential', source, t, ph, y_pred, popt, r2,
+                    float(np.sqrt(np.mean((ph - y_pred) ** 2))), float(np.mean(np.abs(ph - y_pred))),
+                    r2, np.nan, None, None)
+
+
+# =================================================================
+# === ОБУЧАЮЩИЕ ВЫБОРКИ ===
+# =================================================================
+
+def _latest_per_batch(measurements: pd.DataFrame) -> pd.DataFrame:
+    """Последнее значение каждого параметра партии: индекс batch_id, колонки — параметры"""
+    if measurements.empty:
+        return pd.DataFrame()
+    latest = measurements.sort_values('measurement_time', kind='stable') \
+        .drop_duplicates(['batch_id', 'parameter_name'], keep='last')
+    return latest.pivot(index='batch_id', columns='parameter_name', values='parameter_value')
+
+
+def _prepare(batches: pd.DataFrame, measurements: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    batches = batches.assign(
+        concentration=pd.to_numeric(batches['target_sea_buckthorn_concentration'], errors='coerce'),
+        start=pd.to_datetime(batches['start_time'], format='ISO8601', utc=True, errors='coerce'),
+    ).set_index('batch_id')
+    measurements = measurements.assign(
+        parameter_value=pd.to_numeric(measurements['parameter_value'], errors='coerce'),
+        measurement_time=pd.to_datetime(measurements['measurement_time'], format='ISO8601', utc=True,
+                                        errors='coerce'),
+    ).dropna(subset=['batch_id', 'parameter_value'])
+    return batches, measurements
+
+
+def _extract_points(batches: pd.DataFrame, latest: pd.DataFrame, parameter: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(концентрация экстракта, значение параметра) по партиям Жая"""
+    if parameter not in latest.columns:
+        return np.empty(0), np.empty(0)
+    jaya = batches[batches['product_type'] == JAYA_PRODUCT]['concentration'].dropna()
+    joined = pd.concat([jaya, latest[parameter]], axis=1, join='inner').dropna()
+    return joined.iloc[:, 0].to_numpy(float), joined.iloc[:, 1].to_numpy(float)
+
+
+def _ph_points(batches: pd.DataFrame, measurements: pd.DataFrame, extract: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """(часы от начала партии, pH): контроль — без экстракта, опыт — с экстрактом"""
+    ph = measurements[measurements['parameter_name'] == 'pH']
+    group = batches['concentration'] > 0 if extract else batches['concentration'] == 0
+    start = batches.loc[group, 'start'].dropna()
+    ph = ph[ph['batch_id'].isin(start.index)]
+    if ph.empty:
+        # Пустой map по пустому ряду дат в pandas 3 даёт float64 и ломает вычитание
+        return np.empty(0), np.empty(0)
+    hours = (ph['measurement_time'] - ph['batch_id'].map(start)).dt.total_seconds() / 3600
+    valid = hours.notna() & (hours >= 0)
+    return hours[valid].to_numpy(float), ph.loc[valid, 'parameter_value'].to_numpy(float)
+
+
+def _aw_points(batches: pd.DataFrame, measurements: pd.DataFrame, latest: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """([соль партии, сутки от начала], Aw) по каждому замеру Aw"""
+    if 'S' not in latest.columns:
+        return np.empty((0, 2)), np.empty(0)
+    aw = measurements[measurements['parameter_name'] == 'Aw']
+    aw = aw[aw['batch_id'].isin(batches['start'].dropna().index)]
+    if aw.empty:
+        return np.empty((0, 2)), np.empty(0)
+    days = (aw['measurement_time'] - aw['batch_id'].map(batches['start'])).dt.total_seconds() / 86400
+    salt = aw['batch_id'].map(latest['S'])
+    valid = days.notna() & salt.notna() & (days >= 0)
+    return np.column_stack([salt[valid], days[valid]]).astype(float), aw.loc[valid, 'parameter_value'].to_numpy(float)
+
+
+def _jaya_table(batches: pd.DataFrame, latest: pd.DataFrame) -> pd.DataFrame:
+    """Партии Жая: концентрация экстракта и последние влага, белок, ВУС"""
+    columns = {'W': 'Влага (%)', 'protein': 'Белок (%)', 'WBC': 'ВУС (%)'}
+    jaya = batches.loc[batches['product_type'] == JAYA_PRODUCT, ['concentration']].dropna()
+    table = jaya.join(latest.reindex(columns=list(columns)), how='inner') \
+        .rename(columns={'concentration': 'Экстракт (%)', **columns})
+    return table.sort_values('Экстракт (%)').rename_axis('Партия').reset_index()
+
+
+class FittedModels(NamedTuple):
+    moisture: ModelFit
+    protein: ModelFit
+    vus: ModelFit
+    ph_control: ModelFit
+    ph_extract: ModelFit
+    aw: ModelFit
+    # Таблица данных влияния экстракта для показа на странице
+    jaya_table: pd.DataFrame
+    data_version: str
+    fit_ms: float
+
+    def sources(self) -> Dict[str, str]:
+        return {fit.name: fit.source for fit in self[:6]}
+
+
+def fit_models(batches: pd.DataFrame, measurements: pd.DataFrame, version: str = '') -> FittedModels:
+    """
+    Обучает все модели страницы регрессии. Каждая модель строится
+    на данных базы, если точек хватает (MIN_POINTS), иначе — на справочных.
+    """
+    started = time.perf_counter()
+    empty = np.empty(0)
+    x_w = y_w = x_p = y_p = x_v = y_v = t_c = ph_c = t_e = ph_e = y_aw = empty
+    x_aw = np.empty((0, 2))
+    latest = pd.DataFrame()
+    if not batches.empty and not measurements.empty:
+        try:
+            batches, measurements = _prepare(batches, measurements)
+            latest = _latest_per_batch(measurements)
+            x_w, y_w = _extract_points(batches, latest, 'W')
+            x_p, y_p = _extract_points(batches, latest, 'protein')
+            x_v, y_v = _extract_points(batches, latest, 'WBC')
+            t_c, ph_c = _ph_points(batches, measurements, extract=False)
+            t_e, ph_e = _ph_points(batches, measurements, extract=True)
+            x_aw, y_aw = _aw_points(batches, measurements, latest)
+        except Exception as e:
+            # Неожиданная форма данных базы: все модели — на справочных данных
+            print(f"Данные базы не подходят для обучения, используются справочные: {e}")
+            x_w = y_w = x_p = y_p = x_v = y_v = t_c = ph_c = t_e = ph_e = y_aw = empty
+            x_aw = np.empty((0, 2))
+            latest = pd.DataFrame()
+
+    def ols(name, kind, x, y, ref_x, ref_y):
+        if len(y) >= MIN_POINTS[kind] and np.ptp(x if x.ndim == 1 else x[:, 0]) > 0:
+            try:
+                return fit_ols(name, kind, x, y, SOURCE_DB)
+            except (ValueError, np.linalg.LinAlgError):
+                pass
+        return fit_ols(name, kind, ref_x, ref_y, SOURCE_REFERENCE)
+
+    def ph(name, t, y, ref_y, k0):
+        if len(y) >= MIN_POINTS['exponential'] and np.ptp(t) > 0:
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    return fit_ph(name, t, y, SOURCE_DB, k0)
+            except (RuntimeError, ValueError):
+                pass
+        return fit_ph(name, REFERENCE_TIME_H, ref_y, SOURCE_REFERENCE, k0)
+
+    moisture = ols('moisture', 'quadratic', x_w, y_w, REFERENCE_EXTRACT, REFERENCE_JAYA['Влага (%)'].to_numpy(float))
+    protein = ols('protein', 'linear', x_p, y_p, REFERENCE_EXTRACT, REFERENCE_JAYA['Белок (%)'].to_numpy(float))
+    vus = ols('vus', 'log', x_v, y_v, REFERENCE_EXTRACT, REFERENCE_JAYA['ВУС (%)'].to_numpy(float))
+    ph_control = ph('ph_control', t_c, ph_c, REFERENCE_PH_CONTROL, 0.01)
+    ph_extract = ph('ph_extract', t_e, ph_e, REFERENCE_PH_EXTRACT, 0.008)
+    aw = ols('aw', 'multiple', x_aw, y_aw, np.column_stack([REFERENCE_SALT, REFERENCE_DAYS]), REFERENCE_AW)
+
+    jaya_table = _jaya_table(batches, latest) if moisture.source == SOURCE_DB else REFERENCE_JAYA
+
+    return FittedModels(moisture, protein, vus, ph_control, ph_extract, aw, jaya_table, version,
+                        (time.perf_counter() - started) * 1000)
+
+
+# =================================================================
+# === ДАННЫЕ И КЭШ ПО ВЕРСИИ ===
+# =================================================================
+
+def _fetch_all(client, table: str, columns: str, key: str, parameters: Optional[List[str]] = None) -> pd.DataFrame:
+    rows, watermark = [], None
+    while True:
+        query = client.table(table).select(columns).order(key).limit(TRAINING_PAGE_SIZE)
+        if watermark is not None:
+            query = query.gt(key, watermark)
+        if parameters is not None:
+            query = query.in_('parameter_name', parameters)
+        page = query.execute().data or []
+        rows.extend(page)
+        if len(page) < TRAINING_PAGE_SIZE:
+            break
+        watermark = page[-1][key]
+    return pd.DataFrame(rows)
+
+
+def data_version(*frames: pd.DataFrame) -> str:
+    """Хеш содержимого обучающих таблиц: модели переобучаются только при его смене"""
+    digest = hashlib.sha256()
+    for frame in frames:
+        digest.update(repr(list(frame.columns)).encode())
+        if not frame.empty:
+            digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+@st.cache_resource(ttl=TRAINING_DATA_TTL, show_spinner=False)
+def load_training_data() -> Tuple[str, pd.DataFrame, pd.DataFrame]:
+    """
+    (версия, партии, измерения) из production_batches / lab_measurements.
+    Таблицы только читаются, поэтому общие для всех сессий (без копий).
+    """
+    client = init_supabase()
+    if client is None:
+        return SOURCE_REFERENCE, pd.DataFrame(), pd.DataFrame()
+    batches = _fetch_all(client, 'production_batches',
+                         'batch_id, product_type, target_sea_buckthorn_concentration, start_time', 'batch_id')
+    measurements = _fetch_all(client, 'lab_measurements',
+                              'measurement_id, batch_id, parameter_name, parameter_value, measurement_time',
+                              'measurement_id', TRAINING_PARAMETERS)
+    return data_version(batches, measurements), batches, measurements
+
+
+# Признаки моделей в порядке коэффициентов (для реестра)
+MODEL_FEATURES = {
+    'moisture': ['extract_pct'],
+    'protein': ['extract_pct'],
+    'vus': ['extract_pct'],
+    'ph_control': ['hours'],
+    'ph_extract': ['hours'],
+    'aw': ['salt_pct', 'days'],
+}
+
+
+def model_record(fit: ModelFit) -> ModelRecord:
+    """Запись реестра: коэффициенты, метрики и хеш точек, на которых обучена модель"""
+    digest = hashlib.sha256(np.ascontiguousarray(fit.x, dtype=float).tobytes())
+    digest.update(np.ascontiguousarray(fit.y, dtype=float).tobytes())
+    return ModelRecord(fit.name, fit.kind, np.asarray(fit.coef, dtype=float), MODEL_FEATURES[fit.name],
+                       {'r2': fit.r2, 'adj_r2': fit.adj_r2, 'rmse': fit.rmse, 'mae': fit.mae,
+                        'f_pvalue': fit.f_pvalue},
+                       None if fit.pvalues is None else list(np.asarray(fit.pvalues, dtype=float)),
+                       digest.hexdigest()[:16], len(fit.y), fit.source, time.time())
+
+
+def register_models(fitted: FittedModels):
+    """Сохраняет модели в реестр (model_registry), откуда их берут другие страницы и IoT"""
+    registry = get_model_registry()
+    for fit in fitted[:6]:
+        registry.register(model_record(fit))
+
+
+@st.cache_resource(max_entries=FITTED_VERSIONS, show_spinner="Обучение моделей...")
+def _fit_version(version: str, _batches: pd.DataFrame, _measurements: pd.DataFrame) -> FittedModels:
+    # Ключ кэша — только версия: таблицы (с подчёркиванием) Streamlit не хеширует
+    fitted = fit_models(_batches, _measurements, version)
+    try:
+        register_models(fitted)
+    except (OSError, ValueError) as e:
+        st.warning(f"Не удалось сохранить модели в реестр: {e}")
+    return fitted
+
+
+def get_fitted_models() -> FittedModels:
+    """Модели для текущей версии данных; обучение — один раз на версию"""
+    try:
+        version, batches, measurements = load_training_data()
+    except Exception as e:
+        st.warning(f"Данные для обучения недоступны ({e}), модели построены на справочных данных")
+        version, batches, measurements = SOURCE_REFERENCE, pd.DataFrame(), pd.DataFrame()
+    return _fit_version(version, batches, measurements)
+
+
+# =================================================================
+# === БЕНЧМАРК ===
+# =================================================================
+
+def _synthetic_training(batches: int, per_batch: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    rng = np.random.default_rng(5)
+    ids = np.arange(1, batches + 1)
+    concentration = rng.choice([0, 5, 7, 9, 11, 13, 15], batches).astype(float)
+    start = pd.Timestamp('2025-01-01', tz='UTC') + pd.to_timedelta(rng.integers(0, 300, batches), unit='D')
+    batch_df = pd.DataFrame({'batch_id': ids, 'product_type': JAYA_PRODUCT,
+                             'target_sea_buckthorn_concentration': concentration,
+                             'start_time': start.strftime('%Y-%m-%dT%H:%M:%S+00:00')})
+
+    rows = []
+    for i, c, t0 in zip(ids, concentration, start):
+        rows += [(i, 'W', 65 + 0.6 * c - 0.04 * c ** 2 + rng.normal(0, 0.5), t0),
+                 (i, 'protein', 21 + c + rng.normal(0, 1), t0),
+                 (i, 'WBC', 60 + 7 * np.log1p(c) + rng.normal(0, 1), t0),
+                 (i, 'S', 2.5 + rng.random() * 2.5, t0)]
+        for hours in np.sort(rng.uniform(0, 144, per_batch)):
+            at = t0 + pd.Timedelta(hours=hours)
+            k = 0.008 if c > 0 else 0.01
+            rows.append((i, 'pH', pH_model(hours, 6.5, 5.1, k) + rng.normal(0, 0.03), at))
+            rows.append((i, 'Aw', 0.95 - 0.003 * hours / 24 + rng.normal(0, 0.002), at))
+    measurements = pd.DataFrame(rows, columns=['batch_id', 'parameter_name', 'parameter_value', 'measurement_time'])
+    measurements['measurement_time'] = measurements['measurement_time'].map(pd.Timestamp.isoformat)
+    measurements.insert(0, 'measurement_id', np.arange(1, len(measurements) + 1))
+    return batch_df, measurements
+
+
+def benchmark(batches: int = 500, per_batch: int = 10, reruns: int = 50):
+    """Переобучение на каждом перезапуске страницы против кэша по версии данных"""
+    batch_df, measurements = _synthetic_training(batches, per_batch)
+    print(f"{batches} партий, {len(measurements)} измерений")
+
+    started = time.perf_counter()
+    fitted = fit_models(batch_df, measurements)
+    fit_ms = (time.perf_counter() - started) * 1000
+    print(f"обучение всех моделей: {fit_ms:.0f} мс; источники: {fitted.sources()}")
+
+    started = time.perf_counter()
+    for _ in range(reruns):
+        data_version(batch_df, measurements)
+    version_ms = (time.perf_counter() - started) * 1000 / reruns
+    print(f"{reruns} перезапусков: переобучение {fit_ms * reruns / 1000:.1f} с, "
+          f"кэш по версии {version_ms * reruns / 1000:.3f} с (хеш версии {version_ms:.2f} мс на перезапуск)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк обучения моделей регрессии")
+    parser.add_argument("--batches", type=int, default=500)
+    parser.add_argument("--per-batch", type=int, default=10)
+    args = parser.parse_args()
+    benchmark(args.batches, args.per_batch)
@@ -0,0 +1,268 @@
+# model_registry.py - Реестр обученных моделей и быстрый прогноз
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import streamlit as st
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Каталог реестра: файл <model_id>.json на модель
+MODEL_REGISTRY_DIR = Path(os.getenv("ZHAYA_MODEL_REGISTRY_DIR", str(BASE_DIR / "model_registry")))
+
+# Сколько прежних версий модели хранить в файле
+MODEL_HISTORY = 20
+
+# Как часто проверять, не обновил ли модель другой процесс (секунды)
+REGISTRY_CHECK_SECONDS = 5
+
+
+# =================================================================
+# === МОДЕЛИ ===
+# =================================================================
+
+def _linear(coef: np.ndarray, X: np.ndarray) -> np.ndarray:
+    return coef[0] + coef[1] * X
+
+
+def _quadratic(coef: np.ndarray, X: np.ndarray) -> np.ndarray:
+    return coef[0] + X * (coef[1] + coef[2] * X)
+
+
+def _log(coef: np.ndarray, X: np.ndarray) -> np.ndarray:
+    return coef[0] + coef[1] * np.log1p(X)
+
+
+def _multiple(coef: np.ndarray, X: np.ndarray) -> np.ndarray:
+    return coef[0] + X @ coef[1:]
+
+
+def _exponential(coef: np.ndarray, X: np.ndarray) -> np.ndarray:
+    pH0, pH_inf, k = coef
+    return pH_inf + (pH0 - pH_inf) * np.exp(-k * X)
+
+
+# Вид модели -> векторная формула прогноза по коэффициентам
+EVALUATORS = {
+    'linear': _linear,
+    'quadratic': _quadratic,
+    'log': _log,
+    'multiple': _multiple,
+    'exponential': _exponential,
+}
+
+
+class ModelRecord(NamedTuple):
+    """
+    Обученная модель: коэффициенты (порядок — как в model_fitting.ModelFit.coef),
+    метрики, p-значения коэффициентов и хеш обучающих данных.
+    """
+    model_id: str
+    kind: str
+    coef: np.ndarray
+    features: List[str]
+    metrics: Dict[str, float]
+    pvalues: Optional[List[float]]
+    data_hash: str
+    n_samples: int
+    source: str
+    fitted_at: float
+
+    def to_dict(self) -> Dict:
+        data = self._asdict()
+        data['coef'] = [float(c) for c in self.coef]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ModelRecord':
+        return cls(**{**data, 'coef': np.asarray(data['coef'], dtype=float)})
+
+    def predict(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        if self.kind == 'multiple' and X.ndim == 1:
+            X = X.reshape(1, -1) if X.shape[0] == len(self.features) else X.reshape(-1, len(self.features))
+        return EVALUATORS[self.kind](self.coef, X)
+
+
+def _json_number(value) -> Optional[float]:
+    # NaN в JSON не допускается
+    return None if value is None or not np.isfinite(value) else float(value)
+
+
+# =================================================================
+# === РЕЕСТР ===
+# =================================================================
+
+class ModelRegistry:
+    """
+    Модели хранятся в <root>/<model_id>.json (текущая версия + история),
+    файл пишется атомарно. Прочитанные записи держатся в памяти: predict —
+    поиск в dict и одна векторная формула, без обращения к диску.
+    """
+
+    def __init__(self, root=MODEL_REGISTRY_DIR):
+        self.root = Path(root)
+        self._records: Dict[str, ModelRecord] = {}
+        self._signatures: Dict[str, Optional[tuple]] = {}
+        self._checked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, model_id: str) -> Path:
+        return self.root / f"{model_id}.json"
+
+    def _signature(self, model_id: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(self._path(model_id))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_file(self, model_id: str) -> Dict:
+        try:
+            return json.loads(self._path(model_id).read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def models(self) -> List[str]:
+        return sorted(path.stem for path in self.root.glob("*.json"))
+
+    def get(self, model_id: str) -> Optional[ModelRecord]:
+        """Текущая версия модели (файл перечитывается, только если изменился)"""
+        now = time.monotonic()
+        record = self._records.get(model_id)
+        if record is not None and now - self._checked.get(model_id, 0.0) < REGISTRY_CHECK_SECONDS:
+            return record
+        with self._lock:
+            signature = self._signature(model_id)
+            if signature != self._signatures.get(model_id) or model_id not in self._records:
+                current = self._read_file(model_id).get('current')
+                if current is None:
+                    self._records.pop(model_id, None)
+                else:
+                    self._records[model_id] = ModelRecord.from_dict(current)
+                self._signatures[model_id] = signature
+            self._checked[model_id] = now
+            return self._records.get(model_id)
+
+    def history(self, model_id: str) -> List[ModelRecord]:
+        """Прежние версии, новые сверху"""
+        return [ModelRecord.from_dict(item) for item in self._read_file(model_id).get('history', [])]
+
+    def register(self, record: ModelRecord) -> bool:
+        """
+        Сохраняет модель как текущую версию. Повторная регистрация модели
+        с тем же хешем данных ничего не пишет (False).
+        """
+        record = record._replace(metrics={k: _json_number(v) for k, v in record.metrics.items()},
+                                 pvalues=None if record.pvalues is None
+                                 else [_json_number(p) for p in record.pvalues])
+        with self._lock:
+            stored = self._read_file(record.model_id)
+            current = stored.get('current')
+            if current is not None and current.get('data_hash') == record.data_hash \
+                    and current.get('kind') == record.kind and len(current['coef']) == len(record.coef) \
+                    and np.allclose(current['coef'], record.coef):
+                return False
+            history = ([current] if current is not None else []) + stored.get('history', [])
+            payload = {'current': record.to_dict(), 'history': history[:MODEL_HISTORY]}
+
+            self.root.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".write-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(payload, f, ensure_ascii=False, indent=1)
+                os.replace(tmp, self._path(record.model_id))
+            except Exception:
+                os.unlink(tmp)
+                raise
+            self._records[record.model_id] = record
+            self._signatures[record.model_id] = self._signature(record.model_id)
+            self._checked[record.model_id] = time.monotonic()
+            return True
+
+    def predict(self, model_id: str, X) -> np.ndarray:
+        """
+        Прогноз для массива входов одной векторной операцией.
+        X — значения признака (n,), для многофакторных моделей — (n, k).
+        """
+        record = self.get(model_id)
+        if record is None:
+            raise KeyError(f"Модель '{model_id}' не зарегистрирована")
+        return record.predict(X)
+
+
+@st.cache_resource
+def get_model_registry() -> ModelRegistry:
+    """Один реестр на процесс"""
+    return ModelRegistry()
+
+
+def predict(model_id: str, X) -> np.ndarray:
+    return get_model_registry().predict(model_id, X)
+
+
+# =================================================================
+# === КОМАНДНАЯ СТРОКА ===
+# =================================================================
+
+def _print_models(registry: ModelRegistry):
+    for model_id in registry.models():
+        record = registry.get(model_id)
+        if record is None:
+            continue
+        metrics = ", ".join(f"{k}={v:.4g}" for k, v in record.metrics.items() if v is not None)
+        fitted = time.strftime('%Y-%m-%d %H:%M', time.localtime(record.fitted_at))
+        print(f"{model_id:<12} {record.kind:<12} n={record.n_samples:<5} {record.source:<9} "
+              f"данные {record.data_hash}  {fitted}  {metrics}")
+
+
+def benchmark(inputs: int = 10_000, calls: int = 2000):
+    """Прогноз из реестра против переобучения модели перед прогнозом"""
+    from model_fitting import REFERENCE_PH_CONTROL, REFERENCE_TIME_H, fit_ph
+
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = ModelRegistry(tmp)
+        fit = fit_ph('ph_control', REFERENCE_TIME_H, REFERENCE_PH_CONTROL, 'reference')
+        registry.register(ModelRecord('ph_control', fit.kind, fit.coef, ['hours'], {'r2': fit.r2}, None,
+                                      'benchmark', len(fit.y), fit.source, time.time()))
+        t = np.linspace(0, 240, inputs)
+
+        started = time.perf_counter()
+        for _ in range(20):
+            fit_ph('ph_control', REFERENCE_TIME_H, REFERENCE_PH_CONTROL, 'reference')
+        refit_ms = (time.perf_counter() - started) * 1000 / 20
+
+        started = time.perf_counter()
+        for _ in range(calls):
+            registry.predict('ph_control', 48.0)
+        single_us = (time.perf_counter() - started) * 1e6 / calls
+
+        started = time.perf_counter()
+        for _ in range(calls // 10):
+            registry.predict('ph_control', t)
+        batch_us = (time.perf_counter() - started) * 1e6 / (calls // 10)
+
+    print(f"переобучение pH-модели: {refit_ms:.2f} мс")
+    print(f"predict одного значения: {single_us:.1f} мкс; {inputs} значений: {batch_us:.0f} мкс "
+          f"({batch_us * 1000 / inputs:.1f} нс на значение)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Реестр обученных моделей")
+    parser.add_argument("command", choices=["list", "benchmark"])
+    parser.add_argument("--path", default=str(MODEL_REGISTRY_DIR))
+    args = parser.parse_args()
+    if args.command == "list":
+        _print_models(ModelRegistry(args.path))
+    else:
+        benchmark()
@@ -0,0 +1,141 @@
+# page_registry.py - Ленивая загрузка модулей страниц
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import threading
+from typing import Callable, Dict, Iterable, NamedTuple
+
+from profiler import profile_call, profiling_enabled
+
+# =================================================================
+# === РЕЕСТР СТРАНИЦ ===
+# =================================================================
+
+class PageSpec(NamedTuple):
+    module: str
+    func: str
+    takes_lang: bool = True
+
+
+# Ключ страницы -> где лежит функция отрисовки. Модуль импортируется
+# при первом переходе на страницу, а не при старте app.py.
+PAGES: Dict[str, PageSpec] = {
+    "dashboard": PageSpec("pages.dashboard", "show_dashboard"),
+    "iot_monitoring": PageSpec("pages.iot_monitoring", "show_iot_monitoring", takes_lang=False),
+    "home": PageSpec("pages.home", "show_home"),
+    "production": PageSpec("pages.production", "show_production_process"),
+    "regression": PageSpec("pages.regression", "show_regression_analysis_full"),
+    "ph_modeling": PageSpec("pages.ph_modeling", "show_ph_modeling"),
+    "seabuckthorn": PageSpec("pages.seabuckthorn", "show_seabuckthorn_analysis"),
+    "data_exploration": PageSpec("pages.data_exploration", "show_data_exploration"),
+    "mathematical_models": PageSpec("pages.mathematical_models", "show_mathematical_models"),
+    "experiments": PageSpec("pages.experiments", "show_experiments"),
+    "digital_safety": PageSpec("pages.digital_safety", "show_digital_safety"),
+    "history_db": PageSpec("pages.history_db", "show_history_db"),
+    "lab_import": PageSpec("pages.lab_import", "show_lab_import"),
+    "reports": PageSpec("pages.reports", "show_reports"),
+    "supabase_test": PageSpec("pages.supabase_test", "show_supabase_test", takes_lang=False),
+    "admin": PageSpec("pages.admin", "show_admin_panel"),
+}
+
+# Прогревать модули страниц в фоне после входа (ZHAYA_PREWARM_PAGES=0 — отключить)
+PREWARM_PAGES = os.getenv("ZHAYA_PREWARM_PAGES", "1") == "1"
+
+_loaded: Dict[str, Callable] = {}
+_load_lock = threading.Lock()
+_prewarm_started = False
+
+
+def load_page(key: str) -> Callable:
+    """Функция отрисовки страницы; модуль импортируется один раз на процесс"""
+    render = _loaded.get(key)
+    if render is None:
+        spec = PAGES[key]
+        # Импорт сам по себе потокобезопасен; блокировка лишь исключает
+        # двойную работу при одновременном прогреве и переходе
+        with _load_lock:
+            render = _loaded.get(key)
+            if render is None:
+                render = getattr(importlib.import_module(spec.module), spec.func)
+                _loaded[key] = render
+    return render
+
+
+def render_page(key: str, lang_choice: str):
+    """Отрисовывает страницу по ключу (под профилировщиком, если он включён)"""
+    render = load_page(key)
+    args = (lang_choice,) if PAGES[key].takes_lang else ()
+    if profiling_enabled():
+        profile_call(key, render, *args)
+    else:
+        render(*args)
+
+
+def prewarm_pages(keys: Iterable[str]):
+    """
+    Импортирует модули страниц в фоновом потоке (один раз на процесс),
+    чтобы первый переход на тяжёлую страницу не ждал scipy/sklearn/plotly.
+    """
+    global _prewarm_started
+    if not PREWARM_PAGES or _prewarm_started:
+        return
+    _prewarm_started = True
+
+    pending = [key for key in keys if key in PAGES and key not in _loaded]
+
+    def warm():
+        for key in pending:
+            try:
+                load_page(key)
+            except Exception as e:
+                # Ошибка импорта проявится при переходе на страницу
+                print(f"Прогрев страницы {key} не удался: {e}")
+
+    threading.Thread(target=warm, name="page-prewarm", daemon=True).start()
+
+
+# =================================================================
+# === БЕНЧМАРК ===
+# =================================================================
+# Каждый замер — в отдельном интерпретаторе, чтобы модули не были в кэше.
+
+# auth не импортируется: на уровне модуля он читает st.secrets
+_LOGIN_IMPORTS = "import streamlit, ui, database_supabase, page_registry"
+
+
+def _timed_import(code: str) -> float:
+    script = f"import time; t = time.perf_counter(); {code}; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def benchmark(repeats: int = 3):
+    """Холодный импорт: только то, что нужно экрану входа, против всех страниц сразу"""
+    eager = _LOGIN_IMPORTS + "; " + "; ".join(f"import {spec.module}" for spec in PAGES.values())
+    lazy_times = sorted(_timed_import(_LOGIN_IMPORTS) for _ in range(repeats))
+    eager_times = sorted(_timed_import(eager) for _ in range(repeats))
+
+    lazy, full = lazy_times[len(lazy_times) // 2], eager_times[len(eager_times) // 2]
+    print(f"экран входа (ленивые страницы): {lazy * 1000:.0f} мс")
+    print(f"все страницы при старте:        {full * 1000:.0f} мс")
+    print(f"ускорение холодного старта:     {full / lazy:.1f}x")
+
+    print("\nпо страницам (поверх экрана входа):")
+    for key, spec in PAGES.items():
+        try:
+            page = _timed_import(f"{_LOGIN_IMPORTS}; t = time.perf_counter(); import {spec.module}")
+            print(f"  {key:<20} {page * 1000:6.0f} мс")
+        except RuntimeError as e:
+            print(f"  {key:<20} ошибка: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Время холодного импорта страниц")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    benchmark(args.repeats)
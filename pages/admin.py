@@ -1,8 +1,11 @@
 # pages/admin.py - Административная панель
 import streamlit as st
 import pandas as pd
-from auth import get_all_users, ROLES
+from auth import get_all_users, get_role_name, get_role_matrix
 from database_supabase import fetch_activity_logs
+from audit_log import get_audit_writer
+from query_trace import get_query_stats
+from profiler import SESSION_FLAG, PROFILE_ALL_PAGES, get_profile_store
 from datetime import datetime
 from pathlib import Path
 
@@ -22,11 +25,13 @@ def show_admin_panel(lang_choice):
     st.markdown("Управление пользователями, системой и безопасностью")
 
     # Табы администратора
-    tab1, tab2, tab3, tab4 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
         "👥 Управление пользователями",
         "📊 Активность системы",
         "🔒 Безопасность",
-        "⚙️ Настройки"
+        "⚙️ Настройки",
+        "⏱️ Запросы к БД",
+        "🔬 Профилировщик"
     ])
 
     # === ТАБ 1: Управление пользователями ===
@@ -45,6 +50,14 @@ def show_admin_panel(lang_choice):
     with tab4:
         show_system_settings()
 
+    # === ТАБ 5: Запросы к БД ===
+    with tab5:
+        show_query_stats()
+
+    # === ТАБ 6: Профилировщик страниц ===
+    with tab6:
+        show_page_profiler()
+
     st.markdown("</div>", unsafe_allow_html=True)
 
 
@@ -89,7 +102,7 @@ def show_users_management():
 
         # Перевод ролей
         def translate_role(role):
-            return ROLES.get(role, {}).get("name", {}).get("ru", role)
+            return get_role_name(role, "ru")
 
         if 'Роль' in users_df.columns:
             users_df['Роль'] = users_df['Роль'].apply(translate_role)
@@ -128,6 +141,10 @@ def show_users_management():
 
         col_action1, col_action2 = st.columns(2)
 
+        # Роли из матрицы прав: от наименьших прав к администратору
+        matrix = get_role_matrix()
+        role_options = sorted(matrix.roles, key=lambda r: (matrix.has(r, "all"), len(matrix.permissions(r))))
+
         with col_action1:
             with st.expander("➕ Создать нового пользователя"):
                 with st.form("create_user_form"):
@@ -135,7 +152,7 @@ def show_users_management():
                     new_password = st.text_input("Пароль*", type="password", placeholder="Минимум 8 символов")
                     new_fullname = st.text_input("Полное имя*", placeholder="Иванов Иван Иванович")
                     new_department = st.text_input("Отдел", placeholder="Производство")
-                    new_role = st.selectbox("Роль*", ["operator", "analyst", "manager", "admin"])
+                    new_role = st.selectbox("Роль*", role_options)
 
                     if st.form_submit_button("Создать пользователя"):
                         if new_password and new_fullname and new_email:
@@ -233,6 +250,17 @@ def show_system_activity():
     """Активность системы"""
     st.subheader("📊 Активность системы")
 
+    # Журнал пишется в фоне пакетами — показываем состояние очереди
+    writer = get_audit_writer()
+    if writer is not None:
+        audit = writer.stats()
+        st.caption(
+            f"Журнал: записано {audit['written']}, в очереди {audit['queued']}, "
+            f"отброшено {audit['dropped']}, ошибок записи {audit['failed']}"
+        )
+        if audit['dropped'] or audit['failed']:
+            st.warning(f"⚠️ Часть записей журнала потеряна. Последняя ошибка: {writer.last_error or '—'}")
+
     logs_df = fetch_activity_logs()
 
     if not logs_df.empty:
@@ -452,3 +480,104 @@ def show_system_settings():
     }
 
     st.table(pd.DataFrame(system_info))
+
+
+def show_query_stats():
+    """Сводка запросов к БД с момента запуска процесса"""
+    st.subheader("⏱️ Запросы к БД")
+
+    stats = get_query_stats()
+    p50, p95 = stats.percentile(0.5), stats.percentile(0.95)
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Запросов", stats.total)
+    col2.metric("Медленных", stats.slow, help=f"Дольше {stats.slow_query_ms:.0f} мс")
+    col3.metric("Медиана", f"{p50:.0f} мс" if p50 is not None else "—")
+    col4.metric("p95", f"{p95:.0f} мс" if p95 is not None else "—")
+    st.caption(f"С {datetime.fromtimestamp(stats.since).strftime('%Y-%m-%d %H:%M:%S')}; "
+               f"журнал медленных запросов: {stats.slow_query_log or 'отключён'}")
+
+    top = stats.top(20)
+    if not top:
+        st.info("Запросов пока не было")
+        return
+
+    st.markdown("### 🔝 Запросы по суммарному времени")
+    top_df = pd.DataFrame(top).rename(columns={
+        "backend": "Бэкенд", "method": "Операция", "table": "Таблица", "filters": "Фильтры",
+        "count": "Число", "total_ms": "Всего, мс", "avg_ms": "Среднее, мс", "max_ms": "Макс, мс",
+        "rows": "Строк", "bytes": "Байт", "errors": "Ошибок",
+    })
+    st.dataframe(top_df.round(1), use_container_width=True, hide_index=True)
+
+    st.markdown("### 📊 Распределение задержек")
+    histogram = pd.DataFrame(stats.histogram(), columns=["Задержка", "Запросов"])
+    st.bar_chart(histogram.set_index("Задержка"), sort=False)
+
+    slow = stats.recent_slow()
+    if slow:
+        st.markdown("### 🐢 Последние медленные запросы")
+        st.dataframe(pd.DataFrame([{
+            "Время": datetime.fromtimestamp(rec.at).strftime("%H:%M:%S"), "Таблица": rec.table,
+            "Операция": rec.method, "Фильтры": rec.filters, "Строк": rec.rows,
+            "Мс": round(rec.ms, 1), "Ошибка": rec.error,
+        } for rec in slow]), use_container_width=True, hide_index=True)
+
+    if st.button("🗑️ Сбросить статистику запросов"):
+        stats.reset()
+        st.rerun()
+
+
+def show_page_profiler():
+    """Профили отрисовки страниц: время, CPU, память, секции"""
+    st.subheader("🔬 Профилировщик страниц")
+
+    if PROFILE_ALL_PAGES:
+        st.info("Профилируются все страницы всех сессий (ZHAYA_PROFILE_PAGES=1)")
+    else:
+        st.toggle("Профилировать страницы в этой сессии", key=SESSION_FLAG,
+                  help="Замер каждой отрисовки: время, CPU, пик памяти и секции. "
+                       "tracemalloc на время замера замедляет код, активно выделяющий память")
+
+    store = get_profile_store()
+    profiles = store.recent()
+    if not profiles:
+        st.info("Профилей пока нет: включите профилирование и откройте нужную страницу")
+        return
+
+    summary = pd.DataFrame([{
+        "Время": datetime.fromtimestamp(p.started_at).strftime("%H:%M:%S"),
+        "Страница": p.page,
+        "Всего, мс": round(p.wall_ms, 1),
+        "CPU, мс": round(p.cpu_ms, 1),
+        "Пик памяти, КБ": None if p.peak_kb is None else round(p.peak_kb),
+        "Запросов к БД": p.queries,
+        "БД, мс": round(p.query_ms, 1),
+        "Ошибка": p.error,
+    } for p in profiles])
+    st.dataframe(summary, use_container_width=True, hide_index=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("💾 Экспорт профилей (JSON)", store.to_json(),
+                           file_name=f"page_profiles_{datetime.now():%Y%m%d_%H%M%S}.json",
+                           mime="application/json")
+    with col2:
+        if st.button("🗑️ Очистить профили"):
+            store.clear()
+            st.rerun()
+
+    st.markdown("### 🔥 Разбивка по секциям")
+    labels = [f"{datetime.fromtimestamp(p.started_at):%H:%M:%S} — {p.page} ({p.wall_ms:.0f} мс)" for p in profiles]
+    selected = profiles[st.selectbox("Отрисовка", range(len(profiles)), format_func=lambda i: labels[i])]
+
+    import plotly.express as px
+
+    nodes = pd.DataFrame(selected.flame())
+    fig = px.icicle(nodes, ids="id", parents="parent", names="name", values="ms",
+                    branchvalues="total", orientation="v")
+    fig.update_traces(texttemplate="%{label}<br>%{value:.1f} мс", hovertemplate="%{id}: %{value:.1f} мс")
+    fig.update_layout(height=350, margin=dict(t=10, l=10, r=10, b=10))
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption("Ширина — время стены; «без секции» — часть страницы вне именованных секций "
+               "(обычно построение графиков и вывод). Время БД входит в секции, где выполнялись запросы.")
@@ -4,17 +4,11 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta, date
-import numpy as np
 from ui import get_text
 from database_supabase import fetch_lab_measurements
-from data_loader import load_all_data
-from supabase import create_client
-
-# Получаем ключи
-url = st.secrets["supabase"]["url"]
-key = st.secrets["supabase"]["key"]
-
-supabase = create_client(url, key)
+from database_async import execute_many
+from rollups import production_rollup
+from profiler import section
 
 def show_dashboard(lang_choice):
     """Главный производственный Dashboard с KPI"""
@@ -46,8 +40,8 @@ def show_dashboard(lang_choice):
     """, unsafe_allow_html=True)
 
     # Загрузка реальных данных
-    df_measurements = fetch_lab_measurements()
-    all_meat_data, df_ph_raw, _, _, _ = load_all_data()
+    with section("fetch"):
+        df_measurements = fetch_lab_measurements()
 
     # Генерация реалистичных данных для сегодня
     today = current_time.date()
@@ -61,41 +55,41 @@ def show_dashboard(lang_choice):
     else:
         total_measurements = 0
         avg_ph_today = 5.35
-    def get_today_production():
-        today = date.today().isoformat()
-
-        response = (
-            supabase
-            .table("production_batches")
-            .select("initial_weight, final_weight, start_time")
-            .gte("start_time", today + " 00:00:00")
-            .lte("start_time", today + " 23:59:59")
-            .execute()
-        )
+    def fetch_kpi_data():
+        """Все KPI-запросы выполняются параллельно через асинхронный клиент"""
+        day = date.today().isoformat()
+        return execute_many({
+            "production": lambda c: c.table("production_batches")
+                .select("initial_weight, final_weight, start_time")
+                .gte("start_time", day + " 00:00:00")
+                .lte("start_time", day + " 23:59:59"),
+            "ph": lambda c: c.table("lab_measurements")
+                .select("parameter_value, measurement_time")
+                .eq("parameter_name", "pH")
+                .gte("measurement_time", day + " 00:00:00")
+                .lte("measurement_time", day + " 23:59:59"),
+            "active_batches": lambda c: c.table("production_batches")
+                .select("batch_id")
+                .is_("end_time", None),
+            "measurements": lambda c: c.table("lab_measurements")
+                .select("measurement_id", count="exact")
+                .limit(1),
+        })
 
-        data = response.data
-        if not data:
+    def get_today_production(response):
+        if response is None or not response.data:
             return 0
 
         total = 0
-        for row in data:
+        for row in response.data:
             if row["final_weight"]:
                 total += float(row["final_weight"]) - float(row["initial_weight"])
 
         return round(total)
 
-    def get_average_ph_today():
-        today = date.today().isoformat()
-
-        response = (
-            supabase
-            .table("lab_measurements")
-            .select("parameter_value, measurement_time")
-            .eq("parameter_name", "pH")
-            .gte("measurement_time", today + " 00:00:00")
-            .lte("measurement_time", today + " 23:59:59")
-            .execute()
-        )
+    def get_average_ph_today(response):
+        if response is None:
+            return 0
 
         values = [float(row["parameter_value"]) for row in response.data]
 
@@ -104,29 +98,24 @@ def show_dashboard(lang_choice):
 
         return sum(values) / len(values)
 
-    def get_active_batches_count():
-        response = (
-            supabase
-            .table("production_batches")
-            .select("batch_id")
-            .is_("end_time", None)
-            .execute()
-        )
-        return len(response.data)
-    def get_total_measurements():
-        response = supabase.table("lab_measurements").select("measurement_id").execute()
-        return len(response.data)
+    def get_active_batches_count(response):
+        return len(response.data) if response is not None else 0
+
+    def get_total_measurements(response):
+        if response is None:
+            return 0
+        return response.count if response.count is not None else len(response.data)
+
     def calculate_oee():
         return 93.7
 
-
     # Расчет KPI
-    today_production = get_today_production()
-    target_production = 500
-    today_production = get_today_production()
-    avg_ph_today = get_average_ph_today()
-    active_batches = get_active_batches_count()
-    total_measurements = get_total_measurements()
+    with section("fetch"):
+        kpi_data = fetch_kpi_data()
+    today_production = get_today_production(kpi_data.get("production"))
+    avg_ph_today = get_average_ph_today(kpi_data.get("ph"))
+    active_batches = get_active_batches_count(kpi_data.get("active_batches"))
+    total_measurements = get_total_measurements(kpi_data.get("measurements"))
     efficiency = calculate_oee()
 
     target_production = 500
@@ -229,10 +218,11 @@ def show_dashboard(lang_choice):
         # График 1: Производство за неделю
         st.subheader("📈 Динамика производства (последние 7 дней)")
 
-        dates = pd.date_range(end=today, periods=7, freq='D')
+        with section("fetch"):
+            week = production_rollup(today - timedelta(days=6), today)
         production_week = pd.DataFrame({
-            'Дата': dates,
-            'Произведено': np.random.randint(420, 600, 7),
+            'Дата': week['day'] if not week.empty else pd.date_range(end=today, periods=7, freq='D'),
+            'Произведено': week['output_kg'].round(1) if not week.empty else [0] * 7,
             'План': [500] * 7
         })
 
@@ -25,15 +25,23 @@ def show_data_exploration(lang_choice):
 
         if choice == 'opyty.xlsx':
             if df_to_use_for_ph is not None:
-                df_to_show = df_to_use_for_ph.copy()
+                df_to_show = df_to_use_for_ph
             else:
                 df_to_show = pd.DataFrame()
         else:
-            df_to_show = all_meat_data.get(choice, pd.DataFrame()).copy()
+            # Без копии: load_all_data отдаёт представления общих кадров,
+            # изменённая колонка копируется при записи (copy-on-write
+            # обеспечивает data_loader: pandas>=3 или явно включённый режим)
+            df_to_show = all_meat_data.get(choice, pd.DataFrame())
 
         if 'Accuracy' in df_to_show.columns:
             df_to_show['Accuracy'] = pd.to_numeric(df_to_show['Accuracy'], errors='coerce')
 
+        issues = df_to_show.attrs.get("schema_issues")
+        if issues:
+            with st.expander(f"⚠️ {get_text('schema_issues', lang_choice)}: {len(issues)}"):
+                st.dataframe(pd.DataFrame(issues), hide_index=True)
+
         if not df_to_show.empty:
             st.dataframe(df_to_show)
         else:
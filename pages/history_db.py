@@ -9,6 +9,7 @@ from database_supabase import (
     fetch_production_batches,
     get_parameter_options
 )
+from measurement_matrix import measurement_matrix
 
 
 def show_history_db(lang_choice):
@@ -113,8 +114,31 @@ def show_history_db(lang_choice):
         else:
             st.info("Нет данных pH для построения графика.")
 
+        show_parameter_correlations()
+
         st.markdown("---")
         st.markdown(df_to_download_link(df_db, "measurements_export.csv", get_text("export_all", lang_choice)),
                     unsafe_allow_html=True)
 
     st.markdown("</div>", unsafe_allow_html=True)
+
+
+def show_parameter_correlations():
+    """Корреляции параметров по партиям (последний замер каждого параметра партии)"""
+    snapshot = measurement_matrix()
+    if snapshot is None or len(snapshot.batch_ids) == 0:
+        return
+
+    st.subheader("🔗 Связь параметров по партиям")
+    measured = snapshot.mask.any(axis=0)
+    corr = snapshot.correlation().loc[measured, measured].dropna(how='all').dropna(axis=1, how='all')
+    if corr.shape[0] < 2:
+        st.info("Недостаточно партий с несколькими измеренными параметрами.")
+        return
+
+    fig = px.imshow(corr, zmin=-1, zmax=1, color_continuous_scale='RdBu_r', text_auto='.2f',
+                    title="Корреляция Пирсона", template='plotly_dark')
+    st.plotly_chart(fig, use_container_width=True)
+
+    with st.expander(f"Матрица партия × параметр ({len(snapshot.batch_ids)} партий)"):
+        st.dataframe(snapshot.frame(corr.columns), use_container_width=True)
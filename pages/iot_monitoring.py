@@ -9,6 +9,7 @@ import time
 
 # Импорт функций для работы с MQTT и БД
 from database_supabase import fetch_iot_sensor_data
+from model_registry import get_model_registry
 
 def get_latest_sensor_data(batch_id=None, limit=1000):
     """Wrapper для получения данных датчиков"""
@@ -18,6 +19,36 @@ def get_latest_sensor_data(batch_id=None, limit=1000):
         st.error(f"Ошибка загрузки данных: {e}")
         return []
 
+@st.cache_data(ttl=600)
+def get_batch_start(batch_id):
+    """Начало партии и концентрация экстракта (для ожидаемой кривой pH)"""
+    try:
+        from database_supabase import init_supabase
+        supabase = init_supabase()
+        if not supabase:
+            return None, 0.0
+        result = supabase.table("production_batches") \
+            .select("start_time, target_sea_buckthorn_concentration") \
+            .eq("batch_id", int(batch_id)).limit(1).execute()
+        if not result.data:
+            return None, 0.0
+        row = result.data[0]
+        return pd.to_datetime(row.get("start_time"), utc=True), float(row.get("target_sea_buckthorn_concentration") or 0)
+    except Exception:
+        return None, 0.0
+
+def expected_ph(batch_id, times):
+    """Ожидаемый pH по обученной модели из реестра; None, если модели или начала партии нет"""
+    start, concentration = get_batch_start(batch_id)
+    if start is None or pd.isna(start):
+        return None
+    model_id = 'ph_extract' if concentration > 0 else 'ph_control'
+    try:
+        hours = (pd.to_datetime(times, utc=True) - start).dt.total_seconds().to_numpy() / 3600
+        return get_model_registry().predict(model_id, hours.clip(min=0))
+    except (KeyError, ValueError, TypeError):
+        return None
+
 def send_actuator_command(batch_id, actuator_name, set_value, changed_by="streamlit"):
     """Отправка команды актуатору (заглушка для демо)"""
     try:
@@ -346,6 +377,20 @@ def show_iot_monitoring(lang_choice="ru"):
                     row=1, col=1
                 )
             
+            # Ожидаемый pH по модели из реестра
+            ph_expected = expected_ph(batch_id, ph_df['time'])
+            if ph_expected is not None:
+                fig2.add_trace(
+                    go.Scatter(
+                        x=ph_df['time'],
+                        y=ph_expected,
+                        mode='lines',
+                        name="pH (модель)",
+                        line=dict(width=2, dash='dot', color='gray')
+                    ),
+                    row=1, col=1
+                )
+            
             # Целевой диапазон pH (5.1-5.6)
             fig2.add_hrect(
                 y0=5.1, y1=5.6,
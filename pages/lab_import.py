@@ -0,0 +1,82 @@
+# pages/lab_import.py - Массовый импорт лабораторных измерений
+import streamlit as st
+import pandas as pd
+from ui import df_to_download_link
+from database_supabase import (
+    LAB_IMPORT_COLUMNS,
+    BULK_INSERT_CHUNK_SIZE,
+    read_lab_measurements_file,
+    validate_lab_measurements_frame,
+    bulk_add_lab_measurements,
+    get_parameter_options
+)
+
+
+def show_lab_import(lang_choice):
+    """Импорт выгрузок приборов (CSV/Excel) в lab_measurements"""
+
+    st.markdown("<div class='fade-in'>", unsafe_allow_html=True)
+
+    st.title("📥 Импорт лабораторных измерений")
+    st.markdown("Загрузите выгрузку прибора: все строки проверяются сразу, "
+                "а вставка выполняется пакетами.")
+
+    with st.expander("📄 Формат файла"):
+        st.markdown(f"""
+        **Колонки:** `{'`, `'.join(LAB_IMPORT_COLUMNS)}`
+
+        Обязательные: `batch_id`, `parameter_name`, `parameter_value`.
+        Допустимые параметры: {', '.join(get_parameter_options())}.
+        Разделитель CSV — запятая или точка с запятой, десятичная запятая допускается.
+        """)
+        template = pd.DataFrame(columns=LAB_IMPORT_COLUMNS)
+        st.markdown(df_to_download_link(template, "lab_measurements_template.csv", "⬇️ Скачать шаблон"),
+                    unsafe_allow_html=True)
+
+    uploaded = st.file_uploader("Файл измерений", type=["csv", "xlsx", "xls"])
+    if uploaded is None:
+        st.markdown("</div>", unsafe_allow_html=True)
+        return
+
+    try:
+        df = read_lab_measurements_file(uploaded)
+    except Exception as e:
+        st.error(f"❌ Не удалось прочитать файл: {e}")
+        st.markdown("</div>", unsafe_allow_html=True)
+        return
+
+    # Предварительная проверка без обращения к БД (существование партий — при импорте)
+    valid, errors = validate_lab_measurements_frame(df)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Строк в файле", len(df))
+    with col2:
+        st.metric("Корректных", len(valid))
+    with col3:
+        st.metric("С ошибками", len(errors))
+
+    st.subheader("👁️ Предпросмотр")
+    st.dataframe(df.head(20), use_container_width=True)
+
+    if not errors.empty:
+        st.warning("⚠️ Строки с ошибками будут пропущены")
+        st.dataframe(errors, use_container_width=True, hide_index=True)
+
+    chunk_size = st.number_input("Размер пакета вставки", min_value=50, max_value=5000,
+                                 value=BULK_INSERT_CHUNK_SIZE, step=50)
+
+    if st.button("🚀 Импортировать", disabled=valid.empty, use_container_width=True):
+        user_id = st.session_state.get("user", {}).get("id")
+        with st.spinner("Импорт измерений..."):
+            result = bulk_add_lab_measurements(df, user_id=user_id, chunk_size=int(chunk_size))
+
+        if result['inserted']:
+            st.success(f"✅ Импортировано измерений: {result['inserted']}")
+        if not result['errors'].empty:
+            st.error(f"❌ Не импортировано строк: {len(result['errors'])}")
+            st.dataframe(result['errors'], use_container_width=True, hide_index=True)
+            st.markdown(df_to_download_link(result['errors'], "import_errors.csv", "⬇️ Скачать отчёт об ошибках"),
+                        unsafe_allow_html=True)
+
+    st.markdown("</div>", unsafe_allow_html=True)
@@ -3,6 +3,7 @@ import streamlit as st
 import numpy as np
 import plotly.express as px
 from ui import get_text
+from model_registry import get_model_registry
 
 def ph_model_func(t, pH0=6.6, pH_inf=4.6, k=0.03):
     t = np.array(t, dtype=float)
@@ -44,6 +45,15 @@ def show_ph_modeling(lang_choice):
               delta=f"{get_text('delta_target_ph', lang_choice)} {(pH_forecast - 5.6):.2f}",
               delta_color="inverse")
 
+    # Прогноз обученной модели из реестра (если модели уже обучены на странице регрессии)
+    registry = get_model_registry()
+    fitted_ph = registry.get('ph_control')
+    if fitted_ph is not None:
+        r2 = fitted_ph.metrics.get('r2')
+        r2_text = "—" if r2 is None else f"{r2:.3f}"
+        st.caption(f"Обученная модель ({fitted_ph.source}, R² = {r2_text}): "
+                   f"pH через {t_input} ч = {float(fitted_ph.predict(t_input)):.2f}")
+
     # --- Классификация диапазона ---
     if pH_forecast < 4.8:
         st.error(get_text("ph_critical_low", lang_choice))
@@ -64,6 +74,9 @@ def show_ph_modeling(lang_choice):
         labels={'x': get_text("time_hours", lang_choice), 'y': 'pH'},
         title=get_text("ph_plot_title", lang_choice)
     )
+    if fitted_ph is not None:
+        fig.add_scatter(x=times, y=fitted_ph.predict(times), mode='lines', line_dash='dot',
+                        name=f"Обученная модель ({fitted_ph.source})")
     fig.add_hrect(y0=4.8, y1=5.6, fillcolor="green", opacity=0.08, layer="below", line_width=0)
     fig.add_vline(x=t_input, line_dash="dash",
                   annotation_text=f"{t_input} {get_text('hours_short', lang_choice)}",
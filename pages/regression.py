@@ -1,39 +1,15 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from scipy import stats
-from scipy.optimize import curve_fit
 import warnings
-import statsmodels.api as sm
+from model_fitting import get_fitted_models, pH_model, SOURCE_DB, SOURCE_REFERENCE
 
 warnings.filterwarnings('ignore')
 
 
-# --- Логарифмдік модель функциясы (ТАБ 1 ВУС үшін қажет) ---
-def log_model_fit(X, y):
-    """Логарифмдік регрессия (y = b0 + b1 * ln(1+X))"""
-    X_log = np.log1p(X.reshape(-1, 1))
-    model = LinearRegression()
-    model.fit(X_log, y)
-    y_pred = model.predict(X_log)
-    r2 = r2_score(y, y_pred)
-    rmse = np.sqrt(mean_squared_error(y, y_pred))
-    mae = mean_absolute_error(y, y_pred)
-    return model, r2, rmse, mae
-
-
-# --- Экспоненциалды модель функциясы (ТАБ 3 pH үшін қажет) ---
-def pH_model(t, pH0, pH_inf, k):
-    """Экспоненциалды pH моделі: pH(t) = pH_inf + (pH0 - pH_inf) * exp(-k*t)"""
-    return pH_inf + (pH0 - pH_inf) * np.exp(-k * t)
-
-
 def show_regression_analysis_full(lang_choice):
     """Толық регрессиялық талдау - НАҚТЫ деректермен"""
 
@@ -96,96 +72,50 @@ def show_regression_analysis_full(lang_choice):
     ])
 
     # ====================================================================
-    # Деректерді алдын ала дайындау (Қайта есептеуді болдырмау үшін)
+    # Модельдер: lab_measurements / production_batches деректерінен,
+    # деректер нұсқасына бір рет үйретіледі (model_fitting)
     # ====================================================================
-
-    # ТАБ 1 Деректері (Жая)
-    extract_conc = np.array([0, 5, 7, 9, 11, 13, 15])  # Концентрация экстракта, %
-    moisture = np.array([65.2, 67.8, 68.9, 67.3, 68.1, 67.7, 65.2])
-    protein = np.array([21.2, 25.44, 29.02, 29.5, 31.02, 35.01, 35.07])
-    fat = np.array([31.06, 33.4, 35.7, 37.2, 39.1, 42.7, 45.43])
-    vus = np.array([60.2, 67.4, 68.15, 72.3, 75.6, 77.8, 79.47])
+    fits = get_fitted_models()
 
     # ТАБ 1: Регрессия 1: ВЛАГА (Квадраттық)
-    X_moisture = extract_conc.reshape(-1, 1)
-    X_moisture_poly = np.column_stack([X_moisture, X_moisture ** 2])
-    model_moisture = LinearRegression()
-    model_moisture.fit(X_moisture_poly, moisture)
-    y_pred_moisture = model_moisture.predict(X_moisture_poly)
-    r2_moisture = r2_score(moisture, y_pred_moisture)
-    rmse_moisture = np.sqrt(mean_squared_error(moisture, y_pred_moisture))
-    mae_moisture = mean_absolute_error(moisture, y_pred_moisture)
-    try:
-        X_moisture_sm = sm.add_constant(X_moisture_poly)
-        model_moisture_sm = sm.OLS(moisture, X_moisture_sm).fit()
-        adj_r2_moisture = model_moisture_sm.rsquared_adj
-        f_pvalue_moisture = model_moisture_sm.f_pvalue
-        pvalues_moisture = model_moisture_sm.pvalues
-    except:
-        adj_r2_moisture = r2_moisture
-        f_pvalue_moisture = 0.001
-        pvalues_moisture = np.array([0.001, 0.001, 0.001])
-    b0, b1, b2 = model_moisture.intercept_, model_moisture.coef_[0], model_moisture.coef_[1]
+    fit_w = fits.moisture
+    extract_conc, moisture, y_pred_moisture = fit_w.x, fit_w.y, fit_w.y_pred
+    model_moisture = fit_w.model
+    r2_moisture, rmse_moisture, mae_moisture = fit_w.r2, fit_w.rmse, fit_w.mae
+    adj_r2_moisture, f_pvalue_moisture = fit_w.adj_r2, fit_w.f_pvalue
+    pvalues_moisture = fit_w.pvalues if fit_w.pvalues is not None else np.full(3, np.nan)
+    b0, b1, b2 = fit_w.coef
 
     # ТАБ 1: Регрессия 2: БЕЛОК (Сызықты)
-    X_protein = extract_conc.reshape(-1, 1)
-    model_protein = LinearRegression()
-    model_protein.fit(X_protein, protein)
-    y_pred_protein = model_protein.predict(X_protein)
-    r2_protein = r2_score(protein, y_pred_protein)
-    rmse_protein = np.sqrt(mean_squared_error(protein, y_pred_protein))
-    mae_protein = mean_absolute_error(protein, y_pred_protein)
-    try:
-        X_protein_sm = sm.add_constant(X_protein)
-        model_protein_sm = sm.OLS(protein, X_protein_sm).fit()
-        f_pvalue_protein = model_protein_sm.f_pvalue
-        pvalues_protein = model_protein_sm.pvalues
-    except:
-        f_pvalue_protein = 0.0001
-        pvalues_protein = np.array([0.0001, 0.0001])
-    b0_p = model_protein.intercept_
-    b1_p = model_protein.coef_[0]
+    fit_p = fits.protein
+    model_protein = fit_p.model
+    r2_protein, rmse_protein, mae_protein = fit_p.r2, fit_p.rmse, fit_p.mae
+    f_pvalue_protein = fit_p.f_pvalue
+    b0_p, b1_p = fit_p.coef
 
     # ТАБ 1: Регрессия 3: ВУС (Логарифмдік)
-    model_vus, r2_vus, rmse_vus, mae_vus = log_model_fit(extract_conc, vus)
-    b0_v = model_vus.intercept_
-    b1_v = model_vus.coef_[0]
-
-    # ТАБ 3: pH модельдеу деректері
-    time_h = np.array([0, 24, 48, 72, 96, 120, 144])
-    pH_control = np.array([6.5, 6.2, 5.9, 5.6, 5.4, 5.3, 5.2])
-    # Бақылау үшін фит
-    popt_control, pcov_control = curve_fit(pH_model, time_h, pH_control, p0=[6.5, 5.0, 0.01])
+    fit_v = fits.vus
+    model_vus, r2_vus, rmse_vus, mae_vus = fit_v.model, fit_v.r2, fit_v.rmse, fit_v.mae
+    b0_v, b1_v = fit_v.coef
+
+    # ТАБ 3: pH модельдеу
+    fit_c, fit_e = fits.ph_control, fits.ph_extract
+    popt_control, popt_extract = fit_c.coef, fit_e.coef
     pH0_c, pHinf_c, k_c = popt_control
-    y_pred_c = pH_model(time_h, *popt_control)
-    ss_res_c = np.sum((pH_control - y_pred_c) ** 2)
-    ss_tot_c = np.sum((pH_control - np.mean(pH_control)) ** 2)
-    r2_control = 1 - (ss_res_c / ss_tot_c)
-    rmse_c = np.sqrt(np.mean((pH_control - y_pred_c) ** 2))
-
-    pH_extract = np.array([6.5, 6.3, 6.0, 5.7, 5.5, 5.4, 5.3])
-    # Экстракт үшін фит
-    popt_extract, pcov_extract = curve_fit(pH_model, time_h, pH_extract, p0=[6.5, 5.0, 0.008])
     pH0_e, pHinf_e, k_e = popt_extract
-    y_pred_e = pH_model(time_h, *popt_extract)
-    ss_res_e = np.sum((pH_extract - y_pred_e) ** 2)
-    ss_tot_e = np.sum((pH_extract - np.mean(pH_extract)) ** 2)
-    r2_extract = 1 - (ss_res_e / ss_tot_e)
-    rmse_e = np.sqrt(np.mean((pH_extract - y_pred_e) ** 2))
-
-    # ТАБ 4: Aw модельдеу деректері
-    salt_conc = np.array([2.5, 3.0, 3.5, 4.0, 4.5, 5.0])
-    time_days = np.array([1, 2, 3, 4, 5, 6])
-    # Тіпті дәлдігі жоғары болу үшін, бастапқы мәндерге кішкене ғана шу қосамыз
-    np.random.seed(42)  # Тұрақты нәтиже үшін
-    Aw_vals = 0.95 - 0.015 * salt_conc - 0.003 * time_days + np.random.normal(0, 0.001, 6)
-    X_aw = np.column_stack([salt_conc, time_days])
-    model_aw = LinearRegression()
-    model_aw.fit(X_aw, Aw_vals)
-    y_pred_aw = model_aw.predict(X_aw)
-    r2_aw = r2_score(Aw_vals, y_pred_aw)
-    rmse_aw = np.sqrt(mean_squared_error(Aw_vals, y_pred_aw))
-    a0, a1, a2 = model_aw.intercept_, model_aw.coef_[0], model_aw.coef_[1]
+    r2_control, rmse_c = fit_c.r2, fit_c.rmse
+    r2_extract, rmse_e = fit_e.r2, fit_e.rmse
+
+    # ТАБ 4: Aw модельдеу
+    fit_aw = fits.aw
+    salt_conc, time_days, Aw_vals = fit_aw.x[:, 0], fit_aw.x[:, 1], fit_aw.y
+    r2_aw, rmse_aw = fit_aw.r2, fit_aw.rmse
+    a0, a1, a2 = fit_aw.coef
+
+    if any(source == SOURCE_DB for source in fits.sources().values()):
+        reference = [name for name, source in fits.sources().items() if source == SOURCE_REFERENCE]
+        st.caption(f"Модельдер дерекқор деректерінде үйретілген (нұсқа {fits.data_version})"
+                   + (f"; анықтамалық деректер: {', '.join(reference)}" if reference else ""))
 
     # ========================================
     # ТАБ 1: ЖАЯ - ЭКСТРАКТ ӘСЕРІ
@@ -198,23 +128,17 @@ def show_regression_analysis_full(lang_choice):
         st.markdown("### 1️⃣ Эксперименттік деректер")
 
         # DataFrame жасау
-        df_jaya = pd.DataFrame({
-            'Экстракт (%)': extract_conc,
-            'Влага (%)': moisture,
-            'Белок (%)': protein,
-            'Жир (%)': fat,
-            'ТБЧ (мг/кг)': np.array([0.69, 0.96, 0.99, 1.65, 1.46, 1.74, 2.12]),
-            'ВУС (%)': vus,
-            'ВСС (%)': np.array([62.8, 65.09, 69.19, 74.4, 74.9, 75.1, 75.7]),
-            'ЖУС (%)': np.array([60.01, 65.8, 67.1, 69.1, 70.1, 71.7, 73.1])
-        })
+        df_jaya = fits.jaya_table
 
         st.dataframe(
             df_jaya.style.background_gradient(cmap='YlGnBu', subset=['Влага (%)', 'ВУС (%)']),
             use_container_width=True
         )
 
-        st.info("📌 **Деректер көзі:** Эксперименттік зерттеулер (таблицы.docx)")
+        if fit_w.source == SOURCE_DB:
+            st.info(f"📌 **Деректер көзі:** lab_measurements / production_batches ({len(df_jaya)} партия)")
+        else:
+            st.info("📌 **Деректер көзі:** Эксперименттік зерттеулер (таблицы.docx)")
 
         # ========== РЕГРЕССИЯ 1: ВЛАГА ==========
         st.markdown("---")
@@ -284,7 +208,7 @@ def show_regression_analysis_full(lang_choice):
         })
 
         st.dataframe(
-            coef_df_moisture.style.applymap(
+            coef_df_moisture.style.map(
                 lambda x: 'background-color: #d4edda' if '✅' in str(x) else '',
                 subset=['Значимость']
             ),
@@ -466,8 +390,8 @@ def show_regression_analysis_full(lang_choice):
 
         # Экспериментальные точки
         fig_protein.add_trace(go.Scatter(
-            x=extract_conc,
-            y=protein,
+            x=fit_p.x,
+            y=fit_p.y,
             mode='markers',
             marker=dict(size=14, color='darkgreen', symbol='square',
                         line=dict(width=2, color='white')),
@@ -517,8 +441,8 @@ def show_regression_analysis_full(lang_choice):
         ))
 
         fig_vus.add_trace(go.Scatter(
-            x=extract_conc,
-            y=vus,
+            x=fit_v.x,
+            y=fit_v.y,
             mode='markers',
             marker=dict(size=14, color='indigo', symbol='circle',
                         line=dict(width=2, color='white')),
@@ -630,16 +554,16 @@ def show_regression_analysis_full(lang_choice):
 
         st.markdown("### Деректер: pH өзгерісі тұздау кезінде")
 
-        df_ph = pd.DataFrame({
-            'Уақыт (сағ)': time_h,
-            'pH (Бақылау)': pH_control,
-            'pH (5% экстракт)': pH_extract
-        })
+        df_ph = pd.merge(
+            pd.DataFrame({'Уақыт (сағ)': fit_c.x, 'pH (Бақылау)': fit_c.y}),
+            pd.DataFrame({'Уақыт (сағ)': fit_e.x, 'pH (5% экстракт)': fit_e.y}),
+            on='Уақыт (сағ)', how='outer'
+        ).sort_values('Уақыт (сағ)', ignore_index=True)
 
         st.dataframe(df_ph, use_container_width=True)
 
         # Модель прогнозы
-        t_fit = np.linspace(0, 144, 200)
+        t_fit = np.linspace(0, max(fit_c.x.max(), fit_e.x.max()), 200)
         pH_fit_control = pH_model(t_fit, *popt_control)
         pH_fit_extract = pH_model(t_fit, *popt_extract)
 
@@ -663,13 +587,13 @@ def show_regression_analysis_full(lang_choice):
 
         # Эксперимент
         fig_ph.add_trace(go.Scatter(
-            x=time_h, y=pH_control, mode='markers',
+            x=fit_c.x, y=fit_c.y, mode='markers',
             marker=dict(size=12, color='red', symbol='circle'),
             name='Бақылау (эксп.)'
         ))
 
         fig_ph.add_trace(go.Scatter(
-            x=time_h, y=pH_extract, mode='markers',
+            x=fit_e.x, y=fit_e.y, mode='markers',
             marker=dict(size=12, color='green', symbol='square'),
             name='5% экстракт (эксп.)'
         ))
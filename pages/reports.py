@@ -7,6 +7,15 @@ from datetime import datetime, timedelta
 import numpy as np
 from ui import get_text, df_to_download_link
 from database_supabase import fetch_lab_measurements
+from rollups import SHIFTS, QUALITY_LIMITS, production_rollup, quality_rollup
+from profiler import section
+
+# Дневной план выпуска и целевой выход готовой продукции
+DAILY_PLAN_KG = 500
+TARGET_YIELD_PCT = 85
+
+# Названия колонок отчета по качеству для параметров сводки
+QUALITY_COLUMNS = {'pH': 'pH', 'W': 'Влажность (%)', 'Aw': 'Aw', 'TBARS': 'ТБЧ (мг/кг)'}
 
 
 def show_reports(lang_choice):
@@ -51,10 +60,11 @@ def show_reports(lang_choice):
         date_to = st.date_input("Дата до", value=today)
 
     # Смены
+    shift_labels = [label for label, _, _ in SHIFTS.values()]
     shifts = st.sidebar.multiselect(
         "Смена",
-        ["Первая (08:00-16:00)", "Вторая (16:00-00:00)", "Ночная (00:00-08:00)"],
-        default=["Первая (08:00-16:00)", "Вторая (16:00-00:00)"]
+        shift_labels,
+        default=shift_labels[:2]
     )
 
     st.markdown("---")
@@ -63,7 +73,7 @@ def show_reports(lang_choice):
     if report_type == "📅 Производственный отчет":
         show_production_report(date_from, date_to, shifts)
     elif report_type == "📈 Анализ качества продукции":
-        show_quality_report(date_from, date_to)
+        show_quality_report(date_from, date_to, shifts)
     elif report_type == "💰 Экономические показатели":
         show_economic_report(date_from, date_to)
     elif report_type == "⚙️ Технологический аудит":
@@ -79,24 +89,30 @@ def show_production_report(date_from, date_to, shifts):
     st.header("📅 Производственный отчет")
     st.markdown(f"**Период:** {date_from.strftime('%d.%m.%Y')} — {date_to.strftime('%d.%m.%Y')}")
 
-    # Генерация данных
+    # Дневная сводка из материализованных агрегатов (учитывает выбранные смены)
     days = (date_to - date_from).days + 1
-    dates = pd.date_range(start=date_from, end=date_to, freq='D')
-
-    production_df = pd.DataFrame({
-        'Дата': dates,
-        'Партий': np.random.randint(12, 22, days),
-        'Произведено (кг)': np.random.randint(420, 620, days),
-        'План (кг)': [500] * days,
-        'Выход (%)': np.round(np.random.uniform(83.5, 87.5, days), 1),
-        'Брак (кг)': np.random.randint(3, 18, days),
-        'Простои (мин)': np.random.randint(0, 90, days)
-    })
+    with section("fetch"):
+        rollup = production_rollup(date_from, date_to, shifts)
+
+    if rollup.empty or rollup['batches'].sum() == 0:
+        st.info("ℹ️ За выбранный период и смены партий нет")
+        return
+
+    with section("transform"):
+        production_df = pd.DataFrame({
+            'Дата': rollup['day'],
+            'Партий': rollup['batches'].astype(int),
+            'Загружено (кг)': rollup['input_kg'].round(1),
+            'Произведено (кг)': rollup['output_kg'].round(1),
+            'План (кг)': [DAILY_PLAN_KG] * days,
+            'Выход (%)': rollup['yield_pct'].round(1),
+            'Замеров': rollup['measurements'].astype(int),
+            'Отклонений': rollup['defects'].astype(int)
+        })
 
-    production_df['Выполнение плана (%)'] = np.round(
-        (production_df['Произведено (кг)'] / production_df['План (кг)']) * 100, 1
-    )
-    production_df['Годная продукция (кг)'] = production_df['Произведено (кг)'] - production_df['Брак (кг)']
+        production_df['Выполнение плана (%)'] = np.round(
+            (production_df['Произведено (кг)'] / production_df['План (кг)']) * 100, 1
+        )
 
     # KPI сводка
     st.subheader("📊 Ключевые показатели периода")
@@ -104,35 +120,42 @@ def show_production_report(date_from, date_to, shifts):
     col1, col2, col3, col4 = st.columns(4)
 
     total_produced = production_df['Произведено (кг)'].sum()
-    total_good = production_df['Годная продукция (кг)'].sum()
-    avg_yield = production_df['Выход (%)'].mean()
+    total_loaded = production_df['Загружено (кг)'].sum()
+    completed_loaded = rollup['completed_input_kg'].sum()
+    # Выход периода — по сумме весов закрытых партий, а не среднее дневных процентов
+    avg_yield = total_produced / completed_loaded * 100 if completed_loaded else float('nan')
     total_batches = production_df['Партий'].sum()
     avg_plan = production_df['Выполнение плана (%)'].mean()
-    total_defects = production_df['Брак (кг)'].sum()
-    defect_rate = (total_defects / total_produced) * 100
+    total_measurements = production_df['Замеров'].sum()
+    total_defects = production_df['Отклонений'].sum()
+    defect_rate = total_defects / total_measurements * 100 if total_measurements else 0.0
 
     with col1:
         st.metric(
             "Всего произведено",
-            f"{total_produced:,} кг",
-            delta=f"План: {len(dates) * 500:,} кг"
+            f"{total_produced:,.0f} кг",
+            delta=f"План: {days * DAILY_PLAN_KG:,} кг"
         )
-        st.caption(f"Годной продукции: {total_good:,} кг")
+        st.caption(f"Загружено сырья: {total_loaded:,.0f} кг")
 
     with col2:
-        delta_yield = avg_yield - 85
-        st.metric(
-            "Средний выход",
-            f"{avg_yield:.1f}%",
-            delta=f"{delta_yield:+.1f}% от целевого (85%)"
-        )
-        st.caption(f"Максимум: {production_df['Выход (%)'].max():.1f}%")
+        if np.isnan(avg_yield):
+            st.metric("Средний выход", "—")
+            st.caption("Нет закрытых партий")
+        else:
+            delta_yield = avg_yield - TARGET_YIELD_PCT
+            st.metric(
+                "Средний выход",
+                f"{avg_yield:.1f}%",
+                delta=f"{delta_yield:+.1f}% от целевого ({TARGET_YIELD_PCT}%)"
+            )
+            st.caption(f"Максимум: {production_df['Выход (%)'].max():.1f}%")
 
     with col3:
         st.metric(
             "Обработано партий",
             f"{total_batches}",
-            delta=f"{int(total_batches / days):.0f} партий/день"
+            delta=f"{total_batches / days:.1f} партий/день"
         )
         st.caption(f"Мин/Макс: {production_df['Партий'].min()}/{production_df['Партий'].max()}")
 
@@ -152,26 +175,25 @@ def show_production_report(date_from, date_to, shifts):
 
     with col_extra1:
         st.metric(
-            "Общий брак",
-            f"{total_defects} кг",
-            delta=f"{defect_rate:.2f}% от производства"
+            "Отклонения качества",
+            f"{total_defects}",
+            delta=f"{defect_rate:.2f}% замеров вне норматива",
+            delta_color="inverse"
         )
 
     with col_extra2:
-        total_downtime = production_df['Простои (мин)'].sum()
-        avg_downtime = production_df['Простои (мин)'].mean()
         st.metric(
-            "Простои всего",
-            f"{total_downtime} мин",
-            delta=f"{avg_downtime:.0f} мин/день"
+            "Лабораторных замеров",
+            f"{total_measurements}",
+            delta=f"{total_measurements / days:.0f} замеров/день"
         )
 
     with col_extra3:
-        efficiency = ((total_produced - total_defects) / total_produced) * 100
+        open_batches = total_batches - rollup['completed'].sum()
         st.metric(
-            "Эффективность",
-            f"{efficiency:.1f}%",
-            delta="Годная продукция"
+            "Незавершённых партий",
+            f"{open_batches}",
+            delta="Без финального веса"
         )
 
     st.markdown("---")
@@ -206,7 +228,7 @@ def show_production_report(date_from, date_to, shifts):
     # Графики
     st.subheader("📈 Визуализация динамики")
 
-    tab1, tab2, tab3 = st.tabs(["Производство", "Выход продукции", "Брак и простои"])
+    tab1, tab2, tab3 = st.tabs(["Производство", "Выход продукции", "Отклонения качества"])
 
     with tab1:
         fig1 = go.Figure()
@@ -252,10 +274,10 @@ def show_production_report(date_from, date_to, shifts):
         ))
 
         fig2.add_hline(
-            y=85,
+            y=TARGET_YIELD_PCT,
             line_dash="dash",
             line_color="green",
-            annotation_text="Целевой выход: 85%",
+            annotation_text=f"Целевой выход: {TARGET_YIELD_PCT}%",
             annotation_position="right"
         )
 
@@ -274,26 +296,26 @@ def show_production_report(date_from, date_to, shifts):
 
         fig3.add_trace(go.Bar(
             x=production_df['Дата'],
-            y=production_df['Брак (кг)'],
-            name='Брак (кг)',
+            y=production_df['Отклонений'],
+            name='Замеров вне норматива',
             marker_color='#dc3545',
             yaxis='y'
         ))
 
         fig3.add_trace(go.Scatter(
             x=production_df['Дата'],
-            y=production_df['Простои (мин)'],
-            name='Простои (мин)',
+            y=production_df['Замеров'],
+            name='Всего замеров',
             line=dict(color='#ffc107', width=3),
             mode='lines+markers',
             yaxis='y2'
         ))
 
         fig3.update_layout(
-            title="Брак и простои",
+            title="Отклонения качества",
             xaxis_title="Дата",
-            yaxis=dict(title="Брак (кг)", side='left'),
-            yaxis2=dict(title="Простои (мин)", side='right', overlaying='y'),
+            yaxis=dict(title="Вне норматива", side='left'),
+            yaxis2=dict(title="Замеров", side='right', overlaying='y'),
             height=450,
             template='plotly_white',
             hovermode='x unified'
@@ -322,52 +344,58 @@ def show_production_report(date_from, date_to, shifts):
             st.success("✅ Отчет отправлен на manager@zhaya.kz")
 
 
-def show_quality_report(date_from, date_to):
+def show_quality_report(date_from, date_to, shifts=None):
     """Отчет по качеству"""
     st.header("📈 Анализ качества продукции")
     st.markdown(f"**Период:** {date_from.strftime('%d.%m.%Y')} — {date_to.strftime('%d.%m.%Y')}")
 
-    # Генерация данных
-    days = (date_to - date_from).days + 1
-    dates = pd.date_range(start=date_from, end=date_to, freq='D')
-
-    quality_df = pd.DataFrame({
-        'Дата': dates,
-        'pH': np.round(np.random.uniform(5.05, 5.65, days), 2),
-        'Влажность (%)': np.round(np.random.uniform(66, 73, days), 1),
-        'Aw': np.round(np.random.uniform(0.86, 0.92, days), 3),
-        'ТБЧ (мг/кг)': np.round(np.random.uniform(0.6, 1.8, days), 2),
-        'Цвет (ΔE)': np.round(np.random.uniform(1.3, 2.8, days), 2),
-        'Органолептика': np.random.randint(82, 99, days)
-    })
-
-    # Статус соответствия
-    def quality_status(row):
-        score = 0
-        if 5.1 <= row['pH'] <= 5.6: score += 20
-        if 68 <= row['Влажность (%)'] <= 72: score += 20
-        if 0.88 <= row['Aw'] <= 0.90: score += 20
-        if row['ТБЧ (мг/кг)'] < 1.5: score += 20
-        if row['Органолептика'] >= 90: score += 20
-
-        if score >= 90:
-            return "✅ Отлично"
-        elif score >= 70:
-            return "⚠️ Хорошо"
-        else:
-            return "❌ Требует внимания"
-
-    quality_df['Статус'] = quality_df.apply(quality_status, axis=1)
+    # Дневная сводка качества из материализованных агрегатов
+    with section("fetch"):
+        rollup = quality_rollup(date_from, date_to, shifts)
+
+    if rollup.empty:
+        st.info("ℹ️ За выбранный период нет лабораторных измерений pH, влажности, Aw и ТБЧ")
+        return
+
+    with section("transform"):
+        quality_df = rollup.pivot(index='day', columns='parameter', values='mean') \
+            .reindex(columns=list(QUALITY_LIMITS)) \
+            .rename(columns=QUALITY_COLUMNS) \
+            .round({'pH': 2, 'Влажность (%)': 1, 'Aw': 3, 'ТБЧ (мг/кг)': 2}) \
+            .rename_axis(None, axis=1) \
+            .reset_index() \
+            .rename(columns={'day': 'Дата'})
+
+        # Статус дня — доля замеров в пределах норматива
+        daily = rollup.groupby('day')[['count', 'out_of_spec']].sum()
+        in_spec_share = (1 - daily['out_of_spec'] / daily['count']).to_numpy() * 100
+        quality_df['В норме (%)'] = np.round(in_spec_share, 1)
+        quality_df['Статус'] = np.select(
+            [in_spec_share >= 95, in_spec_share >= 80],
+            ["✅ Отлично", "⚠️ Хорошо"],
+            default="❌ Требует внимания"
+        )
+    days = len(quality_df)
 
     # KPI качества
     st.subheader("🎯 Соответствие нормативам")
 
     col1, col2, col3, col4 = st.columns(4)
 
-    ph_ok = ((quality_df['pH'] >= 5.1) & (quality_df['pH'] <= 5.6)).mean() * 100
-    moisture_ok = ((quality_df['Влажность (%)'] >= 68) & (quality_df['Влажность (%)'] <= 72)).mean() * 100
-    aw_ok = ((quality_df['Aw'] >= 0.88) & (quality_df['Aw'] <= 0.90)).mean() * 100
-    tbc_ok = (quality_df['ТБЧ (мг/кг)'] < 1.5).mean() * 100
+    # Доля замеров в норме и средние считаются по всем замерам периода
+    totals = rollup.assign(total=rollup['mean'] * rollup['count']) \
+        .groupby('parameter')[['count', 'out_of_spec', 'total']].sum()
+
+    def kpi(parameter):
+        if parameter not in totals.index:
+            return float('nan'), float('nan')
+        row = totals.loc[parameter]
+        return (1 - row['out_of_spec'] / row['count']) * 100, row['total'] / row['count']
+
+    ph_ok, ph_mean = kpi('pH')
+    moisture_ok, moisture_mean = kpi('W')
+    aw_ok, aw_mean = kpi('Aw')
+    tbc_ok, tbc_mean = kpi('TBARS')
 
     with col1:
         st.metric(
@@ -375,7 +403,7 @@ def show_quality_report(date_from, date_to):
             f"{ph_ok:.0f}%",
             delta=f"Норма: 5.1-5.6"
         )
-        st.caption(f"Средний: {quality_df['pH'].mean():.2f}")
+        st.caption(f"Средний: {ph_mean:.2f}")
 
     with col2:
         st.metric(
@@ -383,7 +411,7 @@ def show_quality_report(date_from, date_to):
             f"{moisture_ok:.0f}%",
             delta=f"Норма: 68-72%"
         )
-        st.caption(f"Средняя: {quality_df['Влажность (%)'].mean():.1f}%")
+        st.caption(f"Средняя: {moisture_mean:.1f}%")
 
     with col3:
         st.metric(
@@ -391,7 +419,7 @@ def show_quality_report(date_from, date_to):
             f"{aw_ok:.0f}%",
             delta=f"Норма: 0.88-0.90"
         )
-        st.caption(f"Среднее: {quality_df['Aw'].mean():.3f}")
+        st.caption(f"Среднее: {aw_mean:.3f}")
 
     with col4:
         st.metric(
@@ -399,7 +427,7 @@ def show_quality_report(date_from, date_to):
             f"{tbc_ok:.0f}%",
             delta=f"Норма: < 1.5"
         )
-        st.caption(f"Среднее: {quality_df['ТБЧ (мг/кг)'].mean():.2f}")
+        st.caption(f"Среднее: {tbc_mean:.2f}")
 
     st.markdown("---")
 
@@ -431,12 +459,11 @@ def show_quality_report(date_from, date_to):
         - **Хороших дней:** {status_counts.get('⚠️ Хорошо', 0)} ({status_counts.get('⚠️ Хорошо', 0) / days * 100:.0f}%)
         - **Требует внимания:** {status_counts.get('❌ Требует внимания', 0)} ({status_counts.get('❌ Требует внимания', 0) / days * 100:.0f}%)
 
-        **Ключевые выводы:**
-        - Стабильное соблюдение технологии
-        - pH находится в оптимальном диапазоне
-        - Низкий уровень окисления (ТБЧ)
-        - Высокие органолептические показатели
-        """)
+        **Замеров за период:**
+        """ + "\n".join(
+            f"        - **{QUALITY_COLUMNS[p]}:** {int(totals.loc[p, 'count'])}"
+            for p in QUALITY_LIMITS if p in totals.index
+        ))
 
     st.markdown("---")
 
@@ -11,6 +11,9 @@ from database_supabase import (
     get_product_types,
     get_batch_details
 )
+from database_async import count_tables
+from database_supabase import get_storage_backend_name
+from connection import get_connection_manager
 
 
 # =================================================================
@@ -27,19 +30,33 @@ def show_supabase_test():
 
     st.header("🔌 Проверка подключения")
 
+    # Состояние по уже выполненным запросам — без отдельного проверочного запроса
+    if get_storage_backend_name() == 'supabase':
+        health = get_connection_manager().health()
+        status_labels = {"ok": "🟢 OK", "degraded": "🟡 Ошибки", "down": "🔴 Недоступен",
+                         "unknown": "⚪ Запросов ещё не было"}
+        col_h1, col_h2, col_h3, col_h4 = st.columns(4)
+        col_h1.metric("Состояние", status_labels[health['status']])
+        col_h2.metric("HTTP-запросов", health['requests'])
+        col_h3.metric("Новых соединений", health['connections_opened'],
+                      help=f"TLS-рукопожатий: {health['tls_handshakes']}")
+        reuse = health['reuse_ratio']
+        col_h4.metric("Повторное использование", "—" if reuse is None else f"{reuse:.0%}")
+        if health['last_error']:
+            st.caption(f"Последняя ошибка: {health['last_error']}")
+
     if st.button("🔄 Проверить подключение к Supabase"):
         supabase = init_supabase()
         if supabase:
             st.success("✅ Подключение к Supabase успешно установлено!")
 
             try:
-                batches_response = supabase.table('production_batches') \
-                    .select('count', count='exact').limit(1).execute()
-                batches_count = getattr(batches_response, "count", "N/A")
-
-                lab_response = supabase.table('lab_measurements') \
-                    .select('count', count='exact').limit(1).execute()
-                lab_count = getattr(lab_response, "count", "N/A")
+                # Оба подсчёта выполняются параллельно
+                counts = count_tables(['production_batches', 'lab_measurements'])
+                batches_count = counts.get('production_batches')
+                lab_count = counts.get('lab_measurements')
+                batches_count = "N/A" if batches_count is None else batches_count
+                lab_count = "N/A" if lab_count is None else lab_count
 
                 st.info(f"""
                 **Статистика базы данных:**
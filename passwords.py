@@ -0,0 +1,117 @@
+# passwords.py - Хеширование паролей: соль + scrypt, миграция старых SHA-256
+import argparse
+import hashlib
+import hmac
+import os
+import secrets
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+# =================================================================
+# === ПАРАМЕТРЫ KDF ===
+# =================================================================
+# scrypt требует 128 * n * r байт памяти на хеш: n=2**14, r=8 — 16 МБ.
+# Стоимость подобрана бенчмарком (python passwords.py): один хеш ~40-60 мс.
+
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+# Сколько хешей считается одновременно (hashlib.scrypt отпускает GIL).
+# При всплеске входов (пересменка) остальные ждут в очереди: память
+# ограничена KDF_MAX_CONCURRENCY * 16 МБ, задержка растёт линейно с очередью.
+KDF_MAX_CONCURRENCY = max(1, min(4, os.cpu_count() or 1))
+
+_kdf_slots = threading.BoundedSemaphore(KDF_MAX_CONCURRENCY)
+
+_SCHEME = 'scrypt'
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    with _kdf_slots:
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r, dklen=HASH_BYTES)
+
+
+def hash_password(password: str) -> str:
+    """Хеш в формате scrypt$n$r$p$salt_hex$hash_hex"""
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"{_SCHEME}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+
+
+def is_legacy_hash(stored: str) -> bool:
+    """Старый формат: несолёный SHA-256 (64 hex-символа)"""
+    return not stored.startswith(_SCHEME + '$')
+
+
+def verify_password(password: str, stored: str) -> Tuple[bool, bool]:
+    """
+    Проверяет пароль. Возвращает (совпал, нужно_перехешировать):
+    перехеширование нужно для старых SHA-256 и для хешей с устаревшими параметрами.
+    """
+    if not stored:
+        return False, False
+
+    if is_legacy_hash(stored):
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored), True
+
+    try:
+        _, n, r, p, salt_hex, hash_hex = stored.split('$')
+        n, r, p = int(n), int(r), int(p)
+        salt, expected = bytes.fromhex(salt_hex), bytes.fromhex(hash_hex)
+    except ValueError:
+        return False, False
+
+    digest = _scrypt(password, salt, n, r, p)
+    if not hmac.compare_digest(digest, expected):
+        return False, False
+    return True, (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+# =================================================================
+# === БЕНЧМАРК ===
+# =================================================================
+
+def _burst(stored: str, logins: int, workers: int):
+    def login(_):
+        started = time.perf_counter()
+        verify_password("Benchmark1", stored)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = sorted(pool.map(login, range(logins)))
+    return latencies, time.perf_counter() - started
+
+
+def benchmark(logins: int = 100, workers: int = 32, costs=(2 ** 13, 2 ** 14, 2 ** 15)):
+    """Всплеск одновременных входов: задержки verify_password при разной стоимости n"""
+    print(f"r={SCRYPT_R} p={SCRYPT_P}, слотов KDF: {KDF_MAX_CONCURRENCY}, "
+          f"{logins} входов в {workers} потоков")
+    for n in costs:
+        salt = secrets.token_bytes(SALT_BYTES)
+        digest = _scrypt("Benchmark1", salt, n, SCRYPT_R, SCRYPT_P)
+        stored = f"{_SCHEME}${n}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+
+        single, _ = _burst(stored, 1, 1)
+        latencies, elapsed = _burst(stored, logins, workers)
+        p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+        marker = " (текущая)" if n == SCRYPT_N else ""
+        print(f"n=2**{n.bit_length() - 1}{marker}: хеш {single[0] * 1000:.0f} мс, "
+              f"{128 * n * SCRYPT_R // 2 ** 20} МБ; {logins / elapsed:.1f} входов/с, "
+              f"медиана {statistics.median(latencies) * 1000:.0f} мс, p95 {p95 * 1000:.0f} мс")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк стоимости KDF при всплеске входов")
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=32)
+    args = parser.parse_args()
+    benchmark(args.logins, args.workers)
@@ -0,0 +1,141 @@
+# permissions.py - Скомпилированная матрица ролей и прав доступа
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+import streamlit as st
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+# Право, дающее доступ ко всему (роль администратора)
+ALL_PERMISSIONS = "all"
+
+# Какое право нужно для страницы; None — страница доступна всем ролям,
+# ALL_PERMISSIONS — только ролям со всеми правами
+PAGE_PERMISSIONS = {
+    "dashboard": "view_dashboard",
+    "history_db": "view_history",
+    "lab_import": "edit_data",
+    "reports": "view_reports",
+    "supabase_test": ALL_PERMISSIONS,
+    "admin": ALL_PERMISSIONS,
+}
+
+# Как часто проверять метку версии таблицы roles (секунды)
+ROLES_VERSION_TTL = 30
+
+
+# =================================================================
+# === МАТРИЦА ПРАВ ===
+# =================================================================
+
+class RoleMatrix:
+    """
+    Неизменяемый снимок ролей: права каждой роли — frozenset,
+    проверка — одно обращение к словарю и поиск в множестве.
+    """
+
+    def __init__(self, roles: Dict[str, Dict], version: Optional[str] = None):
+        self.roles = roles
+        self.version = version
+        self._grants: Dict[str, FrozenSet[str]] = {
+            role: frozenset(spec.get("permissions", [])) for role, spec in roles.items()
+        }
+        self._superusers = frozenset(role for role, grants in self._grants.items() if ALL_PERMISSIONS in grants)
+
+    def has(self, role: str, permission: str) -> bool:
+        if role in self._superusers:
+            return True
+        grants = self._grants.get(role)
+        return grants is not None and permission != ALL_PERMISSIONS and permission in grants
+
+    def allowed_pages(self, role: str, page_keys: Iterable[str]) -> List[str]:
+        """Страницы из page_keys, доступные роли (порядок сохраняется)"""
+        if role in self._superusers:
+            return list(page_keys)
+        # Неизвестной роли доступны только страницы без требований
+        grants = self._grants.get(role, frozenset())
+        return [key for key in page_keys
+                if (required := PAGE_PERMISSIONS.get(key)) is None
+                or (required != ALL_PERMISSIONS and required in grants)]
+
+    def permissions(self, role: str) -> List[str]:
+        return sorted(self._grants.get(role, ()))
+
+    def role_name(self, role: str, lang: str = "ru") -> str:
+        return self.roles.get(role, {}).get("name", {}).get(lang, role)
+
+
+def _roles_from_rows(rows: List[Dict]) -> Dict[str, Dict]:
+    """Строки таблицы roles -> формат ROLES"""
+    roles = {}
+    for row in rows:
+        permissions = row.get("permissions") or []
+        if isinstance(permissions, str):
+            permissions = [p.strip() for p in permissions.strip("{}").split(",") if p.strip()]
+        roles[row["role"]] = {
+            "name": {lang: row.get(f"name_{lang}") or row["role"] for lang in ("ru", "en", "kk")},
+            "permissions": permissions,
+        }
+    return roles
+
+
+class RoleRegistry:
+    """
+    Источник матрицы прав. Если в БД есть таблица roles
+    (role, name_ru, name_en, name_kk, permissions, updated_at), роли берутся
+    оттуда: не чаще раза в ROLES_VERSION_TTL секунд читается только метка
+    версии max(updated_at), и матрица перекомпилируется лишь при её смене.
+    Без таблицы используются встроенные роли.
+    """
+
+    def __init__(self, client, default_roles: Dict[str, Dict], ttl: float = ROLES_VERSION_TTL):
+        self._client = client
+        self._ttl = ttl
+        self._default = RoleMatrix(default_roles, version="builtin")
+        self._matrix = self._default
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def current(self) -> RoleMatrix:
+        if time.monotonic() - self._checked_at < self._ttl:
+            return self._matrix
+
+        with self._lock:
+            if time.monotonic() - self._checked_at < self._ttl:
+                return self._matrix
+            self._checked_at = time.monotonic()
+            try:
+                self._matrix = self._reload_if_changed()
+            except Exception as e:
+                # Таблицы нет или БД недоступна: остаётся последняя известная матрица
+                print(f"Роли из БД недоступны, используются {self._matrix.version}: {e}")
+        return self._matrix
+
+    def _reload_if_changed(self) -> RoleMatrix:
+        stamp = self._client.table("roles") \
+            .select("updated_at") \
+            .order("updated_at", desc=True) \
+            .limit(1) \
+            .execute()
+        if not stamp.data:
+            return self._default
+
+        version = str(stamp.data[0]["updated_at"])
+        if version == self._matrix.version:
+            return self._matrix
+
+        rows = self._client.table("roles").select("*").execute()
+        return RoleMatrix(_roles_from_rows(rows.data or []), version=version)
+
+    def invalidate(self):
+        """Следующий вызов current() сразу перечитает метку версии"""
+        self._checked_at = float("-inf")
+
+
+@st.cache_resource
+def get_role_registry(_client, _default_roles: Dict[str, Dict]) -> RoleRegistry:
+    """Один реестр ролей на процесс"""
+    return RoleRegistry(_client, _default_roles)
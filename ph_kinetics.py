@@ -0,0 +1,391 @@
+# ph_kinetics.py - Кинетика pH по партиям: массовая подгонка pH(t) в пуле процессов
+import argparse
+import atexit
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import least_squares
+
+# Модуль не импортирует streamlit: подгонка выполняется в дочерних процессах
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Результаты подгонки по партиям
+PH_KINETICS_PATH = Path(os.getenv("ZHAYA_PH_KINETICS_PATH", str(BASE_DIR / "data_store" / "ph_kinetics.parquet")))
+
+# Сколько процессов подгоняют ряды одновременно
+FIT_WORKERS = max(1, min(8, os.cpu_count() or 1))
+
+# Рядов в одной задаче пула: подгонка ряда — доли миллисекунды,
+# поэтому ряды отправляются пачками, чтобы передача не стоила дороже расчёта
+FIT_CHUNK_SIZE = 256
+
+# Меньше этого числа рядов подгонка идёт в текущем процессе
+PARALLEL_MIN_SERIES = 500
+
+# Минимум точек ряда (у модели три параметра)
+MIN_POINTS = 4
+
+# Остаток больше OUTLIER_Z робастных сигм — ряд шумный, подгонка повторяется с soft_l1
+OUTLIER_Z = 3.5
+
+# Границы параметров: pH0, pH_inf в [0, 14], k в [0, K_MAX] (1/ч)
+K_MAX = 5.0
+
+PAGE_SIZE = 1000
+
+SOURCE_LAB = 'lab'
+SOURCE_IOT = 'iot'
+
+
+class KineticsFit(NamedTuple):
+    """Параметры pH(t) = pH_inf + (pH0 - pH_inf)·exp(-k·t) одной партии"""
+    batch_id: int
+    pH0: float
+    pH_inf: float
+    k: float
+    rmse: float
+    r2: float
+    n_points: int
+    # 'linear' — обычный МНК, 'soft_l1' — робастная подгонка шумного ряда
+    loss: str
+    success: bool
+
+
+# =================================================================
+# === ПОДГОНКА ОДНОГО РЯДА ===
+# =================================================================
+
+def ph_curve(t: np.ndarray, pH0: float, pH_inf: float, k: float) -> np.ndarray:
+    return pH_inf + (pH0 - pH_inf) * np.exp(-k * t)
+
+
+def _residuals(p: np.ndarray, t: np.ndarray, ph: np.ndarray) -> np.ndarray:
+    return ph_curve(t, *p) - ph
+
+
+def _jacobian(p: np.ndarray, t: np.ndarray, ph: np.ndarray) -> np.ndarray:
+    pH0, pH_inf, k = p
+    e = np.exp(-k * t)
+    return np.column_stack([e, 1.0 - e, -(pH0 - pH_inf) * t * e])
+
+
+def initial_guess(t: np.ndarray, ph: np.ndarray) -> np.ndarray:
+    """
+    Начальное приближение без итераций: асимптота чуть ниже минимума ряда,
+    k и pH0 — из линейной регрессии ln(pH - pH_inf) по t.
+    """
+    pH_inf = ph.min() - max(0.05 * np.ptp(ph), 0.01)
+    z = np.log(ph - pH_inf)
+    t_mean, z_mean = t.mean(), z.mean()
+    dt = t - t_mean
+    slope = (dt * (z - z_mean)).sum() / (dt * dt).sum()
+    k = min(max(-slope, 1e-4), K_MAX)
+    pH0 = pH_inf + np.exp(z_mean - slope * t_mean)
+    return np.clip([pH0, pH_inf, k], [0.0, 0.0, 0.0], [14.0, 14.0, K_MAX])
+
+
+def fit_series(batch_id: int, t: np.ndarray, ph: np.ndarray) -> Optional[KineticsFit]:
+    """
+    Подгонка одного ряда (least_squares с аналитическим якобианом). Если после
+    обычного МНК есть выбросы (|остаток| > OUTLIER_Z·1.4826·MAD), ряд
+    подгоняется заново с soft_l1. None — точек мало или время не меняется.
+    """
+    valid = np.isfinite(t) & np.isfinite(ph)
+    t, ph = np.asarray(t[valid], dtype=float), np.asarray(ph[valid], dtype=float)
+    if len(t) < MIN_POINTS or np.ptp(t) <= 0:
+        return None
+
+    bounds = ([0.0, 0.0, 0.0], [14.0, 14.0, K_MAX])
+    x0 = initial_guess(t, ph)
+    result = least_squares(_residuals, x0, jac=_jacobian, bounds=bounds, args=(t, ph))
+    loss = 'linear'
+
+    residuals = result.fun
+    scale = 1.4826 * np.median(np.abs(residuals - np.median(residuals)))
+    if not result.success or (scale > 0 and np.abs(residuals).max() > OUTLIER_Z * scale):
+        robust = least_squares(_residuals, result.x if result.success else x0, jac=_jacobian, bounds=bounds,
+                               args=(t, ph), loss='soft_l1', f_scale=max(scale, 1e-3))
+        if robust.success or not result.success:
+            result, loss = robust, 'soft_l1'
+            residuals = _residuals(result.x, t, ph)
+
+    ss_tot = ((ph - ph.mean()) ** 2).sum()
+    r2 = 1.0 - (residuals ** 2).sum() / ss_tot if ss_tot > 0 else np.nan
+    pH0, pH_inf, k = result.x
+    return KineticsFit(int(batch_id), float(pH0), float(pH_inf), float(k),
+                       float(np.sqrt(np.mean(residuals ** 2))), float(r2), len(t), loss, bool(result.success))
+
+
+def _fit_chunk(chunk: List[Tuple[int, np.ndarray, np.ndarray]]) -> List[KineticsFit]:
+    """Пачка рядов (выполняется в дочернем процессе)"""
+    fits = []
+    for batch_id, t, ph in chunk:
+        try:
+            fit = fit_series(batch_id, t, ph)
+        except (ValueError, np.linalg.LinAlgError):
+            fit = None
+        if fit is not None:
+            fits.append(fit)
+    return fits
+
+
+# =================================================================
+# === ПУЛ ПРОЦЕССОВ ===
+# =================================================================
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Пул живёт всё время процесса; spawn — как в xlsx_cache (родитель многопоточный)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=FIT_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+                atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool
+
+
+def fit_batches(series: Dict[int, Tuple[np.ndarray, np.ndarray]],
+                parallel: Optional[bool] = None) -> pd.DataFrame:
+    """
+    Подгоняет ряды {batch_id: (t_часы, pH)} — пачками по FIT_CHUNK_SIZE в пуле
+    процессов, если рядов не меньше PARALLEL_MIN_SERIES (или parallel=True).
+    Ряды, которые не удалось подогнать, в результат не попадают.
+    """
+    items = [(batch_id, t, ph) for batch_id, (t, ph) in series.items()]
+    if parallel is None:
+        parallel = len(items) >= PARALLEL_MIN_SERIES and FIT_WORKERS > 1
+    chunks = [items[i:i + FIT_CHUNK_SIZE] for i in range(0, len(items), FIT_CHUNK_SIZE)]
+    if parallel and len(chunks) > 1:
+        results = _get_pool().map(_fit_chunk, chunks)
+    else:
+        results = map(_fit_chunk, chunks)
+    fits = [fit for chunk in results for fit in chunk]
+    return pd.DataFrame(fits, columns=KineticsFit._fields)
+
+
+# =================================================================
+# === РЯДЫ pH ИЗ ДАННЫХ ===
+# =================================================================
+
+def _split(df: pd.DataFrame, key: str, t: str, value: str) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """Длинная таблица -> {batch_id: (t, значения)}, ряды упорядочены по времени"""
+    df = df.dropna(subset=[key, t, value]).sort_values([key, t], kind='stable')
+    if df.empty:
+        return {}
+    keys = df[key].to_numpy()
+    times, values = df[t].to_numpy(float), df[value].to_numpy(float)
+    ids, starts = np.unique(keys, return_index=True)
+    bounds = np.append(starts, len(keys))
+    return {int(batch_id): (times[a:b], values[a:b]) for batch_id, a, b in zip(ids, bounds[:-1], bounds[1:])}
+
+
+def _hours_since_start(df: pd.DataFrame, time_column: str, batches: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Часы от начала партии (start_time), без него — от первого замера ряда"""
+    df = df.assign(_at=pd.to_datetime(df[time_column], utc=True, errors='coerce'))
+    start = df.groupby('batch_id')['_at'].transform('min')
+    if batches is not None and not batches.empty and 'start_time' in batches:
+        starts = pd.to_datetime(batches.set_index('batch_id')['start_time'], utc=True, errors='coerce')
+        start = df['batch_id'].map(starts).fillna(start)
+    df = df.assign(hours=(df['_at'] - start).dt.total_seconds() / 3600)
+    # Замеры до начала партии к её кинетике не относятся
+    return df[df['hours'] >= 0]
+
+
+def lab_series(measurements: pd.DataFrame, batches: Optional[pd.DataFrame] = None):
+    """Ряды pH из lab_measurements"""
+    if measurements.empty:
+        return {}
+    ph = measurements[measurements['parameter_name'] == 'pH']
+    return _split(_hours_since_start(ph, 'measurement_time', batches), 'batch_id', 'hours', 'parameter_value')
+
+
+def iot_series(readings: pd.DataFrame, batches: Optional[pd.DataFrame] = None):
+    """Ряды pH из iot_sensor_data (все датчики pH партии — один ряд)"""
+    if readings.empty:
+        return {}
+    ph = readings[readings['sensor_type'] == 'ph']
+    return _split(_hours_since_start(ph, 'time', batches), 'batch_id', 'hours', 'sensor_value')
+
+
+def series_hash(t: np.ndarray, ph: np.ndarray) -> str:
+    digest = hashlib.blake2b(np.ascontiguousarray(t, dtype=float).tobytes(), digest_size=8)
+    digest.update(np.ascontiguousarray(ph, dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+# =================================================================
+# === ХРАНИЛИЩЕ РЕЗУЛЬТАТОВ ===
+# =================================================================
+
+class PhKineticsStore:
+    """
+    Parquet-файл: строка на (batch_id, source) с параметрами, метриками
+    и хешем ряда. update() подгоняет только новые и изменившиеся ряды.
+    Ряд, который подогнать нельзя (мало точек), хранится строкой с хешем,
+    пустыми параметрами и success=False — чтобы не подгонять его снова.
+    """
+
+    COLUMNS = ['source', *KineticsFit._fields, 'series_hash', 'fitted_at']
+
+    def __init__(self, path=PH_KINETICS_PATH):
+        self.path = Path(path)
+
+    def load(self) -> pd.DataFrame:
+        try:
+            return pd.read_parquet(self.path)
+        except (FileNotFoundError, OSError, ValueError):
+            return pd.DataFrame(columns=self.COLUMNS)
+
+    def update(self, source: str, series: Dict[int, Tuple[np.ndarray, np.ndarray]],
+               parallel: Optional[bool] = None) -> Tuple[pd.DataFrame, int]:
+        """(все результаты, сколько рядов подогнано заново)"""
+        stored = self.load()
+        hashes = {batch_id: series_hash(t, ph) for batch_id, (t, ph) in series.items()}
+        known = stored[stored['source'] == source].set_index('batch_id')['series_hash'].to_dict()
+        changed = {batch_id: series[batch_id] for batch_id, h in hashes.items() if known.get(batch_id) != h}
+        if not changed:
+            return stored, 0
+
+        fits = fit_batches(changed, parallel)
+        skipped = [batch_id for batch_id in changed if batch_id not in set(fits['batch_id'])]
+        if skipped:
+            empty = pd.DataFrame({
+                'batch_id': skipped, 'pH0': np.nan, 'pH_inf': np.nan, 'k': np.nan, 'rmse': np.nan, 'r2': np.nan,
+                'n_points': [int(np.isfinite(changed[b][0]).sum()) for b in skipped], 'loss': None, 'success': False,
+            })
+            fits = pd.concat([fits, empty], ignore_index=True) if not fits.empty else empty
+        fits.insert(0, 'source', source)
+        fits['series_hash'] = fits['batch_id'].map(hashes)
+        fits['fitted_at'] = pd.Timestamp.now(tz='UTC')
+        keep = stored[~((stored['source'] == source) & stored['batch_id'].isin(list(changed)))]
+        result = pd.concat([keep, fits], ignore_index=True) if not keep.empty else fits
+        result = result.sort_values(['source', 'batch_id'], ignore_index=True)[self.COLUMNS]
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".write-", suffix=".tmp")
+        os.close(fd)
+        try:
+            result.to_parquet(tmp, index=False)
+            os.replace(tmp, self.path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+        return result, len(changed)
+
+
+# =================================================================
+# === ПОДГОНКА ВСЕХ ПАРТИЙ ИЗ БАЗЫ ===
+# =================================================================
+
+def _fetch(client, table: str, columns: str, key: str, **filters) -> pd.DataFrame:
+    """Вся таблица страницами по ключу (как model_fitting._fetch_all)"""
+    rows, watermark = [], None
+    while True:
+        query = client.table(table).select(columns).order(key).limit(PAGE_SIZE)
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        if watermark is not None:
+            query = query.gt(key, watermark)
+        page = query.execute().data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            break
+        watermark = page[-1][key]
+    return pd.DataFrame(rows)
+
+
+def refit_all(client=None, store: Optional[PhKineticsStore] = None) -> Dict[str, int]:
+    """Подгоняет pH всех партий (лабораторные замеры и IoT) -> {источник: рядов подогнано}"""
+    if client is None:
+        from database_supabase import init_supabase
+        client = init_supabase()
+    if client is None:
+        raise RuntimeError("Нет подключения к базе")
+    store = store or PhKineticsStore()
+
+    batches = _fetch(client, 'production_batches', 'batch_id, start_time', 'batch_id')
+    measurements = _fetch(client, 'lab_measurements',
+                          'measurement_id, batch_id, parameter_name, parameter_value, measurement_time',
+                          'measurement_id', parameter_name='pH')
+    readings = _fetch(client, 'iot_sensor_data', 'sensor_id, batch_id, sensor_type, sensor_value, time', 'sensor_id',
+                      sensor_type='ph')
+
+    _, lab_fitted = store.update(SOURCE_LAB, lab_series(measurements, batches))
+    _, iot_fitted = store.update(SOURCE_IOT, iot_series(readings, batches))
+    return {SOURCE_LAB: lab_fitted, SOURCE_IOT: iot_fitted}
+
+
+# =================================================================
+# === БЕНЧМАРК ===
+# =================================================================
+
+def _synthetic_series(batches: int, points: int, outlier_share: float = 0.2,
+                      seed: int = 7) -> Tuple[Dict[int, Tuple[np.ndarray, np.ndarray]], np.ndarray]:
+    rng = np.random.default_rng(seed)
+    k_true = rng.uniform(0.005, 0.05, batches)
+    series = {}
+    for i in range(batches):
+        t = np.sort(rng.uniform(0, 240, points))
+        ph = ph_curve(t, rng.uniform(6.3, 6.7), rng.uniform(4.8, 5.4), k_true[i]) + rng.normal(0, 0.03, points)
+        if rng.random() < outlier_share:
+            bad = rng.choice(points, max(1, points // 10), replace=False)
+            ph[bad] += rng.choice([-1, 1], len(bad)) * rng.uniform(0.5, 1.5, len(bad))
+        series[i + 1] = (t, ph)
+    return series, k_true
+
+
+def benchmark(batches: int = 5000, points: int = 40):
+    """Подгонка в одном процессе против пула; точность k на синтетических рядах с выбросами"""
+    series, k_true = _synthetic_series(batches, points)
+    print(f"{batches} партий по {points} точек, процессов в пуле: {FIT_WORKERS}")
+
+    started = time.perf_counter()
+    serial = fit_batches(series, parallel=False)
+    serial_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    list(_get_pool().map(_fit_chunk, [[]] * FIT_WORKERS))
+    startup_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    parallel = fit_batches(series, parallel=True)
+    parallel_s = time.perf_counter() - started
+
+    assert np.allclose(serial['k'], parallel['k'])
+    error = np.abs(parallel['k'].to_numpy() - k_true[parallel['batch_id'].to_numpy() - 1]) / k_true[
+        parallel['batch_id'].to_numpy() - 1]
+    print(f"один процесс: {serial_s:.2f} с ({batches / serial_s:.0f} партий/с)")
+    print(f"пул: {parallel_s:.2f} с ({batches / parallel_s:.0f} партий/с), запуск пула {startup_s:.2f} с")
+    print(f"подогнано {len(parallel)}, робастно (soft_l1) {(parallel['loss'] == 'soft_l1').sum()}; "
+          f"медианная ошибка k {np.median(error) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Кинетика pH по партиям")
+    parser.add_argument("command", choices=["refit", "benchmark"])
+    parser.add_argument("--batches", type=int, default=5000)
+    parser.add_argument("--points", type=int, default=40)
+    args = parser.parse_args()
+    if args.command == "refit":
+        print(refit_all())
+    else:
+        benchmark(args.batches, args.points)
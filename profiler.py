@@ -0,0 +1,234 @@
+# profiler.py - Профилировщик отрисовки страниц (включается явно)
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+import streamlit as st
+
+from query_trace import current_trace
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+# Профилировать все страницы всех сессий (иначе — переключатель в админ-панели)
+PROFILE_ALL_PAGES = os.getenv("ZHAYA_PROFILE_PAGES", "0") == "1"
+
+# Сколько последних профилей хранить в процессе
+PROFILE_HISTORY = 200
+
+# Ключ переключателя в session_state
+SESSION_FLAG = "profile_pages"
+
+# Имя остатка времени страницы, не попавшего ни в одну секцию
+UNSECTIONED = "без секции"
+
+_NULL_SECTION = nullcontext()
+
+
+# =================================================================
+# === ПРОФИЛЬ ОДНОЙ ОТРИСОВКИ ===
+# =================================================================
+
+class PageProfile:
+    """
+    Замер одной отрисовки страницы: время стены, процессорное время потока,
+    пик памяти (tracemalloc), запросы к БД и вложенные именованные секции.
+    """
+
+    def __init__(self, page: str):
+        self.page = page
+        self.started_at = time.time()
+        self.wall_ms = 0.0
+        self.cpu_ms = 0.0
+        self.peak_kb: Optional[float] = None
+        self.queries = 0
+        self.query_ms = 0.0
+        self.error: Optional[str] = None
+        # (путь секции, мс); путь — кортеж имён от внешней секции к внутренней
+        self.sections: List[Tuple[Tuple[str, ...], float]] = []
+        self._stack: List[str] = []
+
+    def section(self, name: str) -> '_Section':
+        return _Section(self, name)
+
+    def to_dict(self) -> Dict:
+        return {
+            "page": self.page,
+            "started_at": self.started_at,
+            "wall_ms": round(self.wall_ms, 2),
+            "cpu_ms": round(self.cpu_ms, 2),
+            "peak_kb": None if self.peak_kb is None else round(self.peak_kb, 1),
+            "queries": self.queries,
+            "query_ms": round(self.query_ms, 2),
+            "error": self.error,
+            "sections": [{"path": list(path), "ms": round(ms, 2)} for path, ms in self.sections],
+        }
+
+    def flame(self) -> List[Dict]:
+        """
+        Узлы для icicle-диаграммы: id, parent, name, ms. Время узла включает
+        вложенные секции; остаток под каждым узлом — UNSECTIONED.
+        """
+        root = self.page
+        totals: Dict[Tuple[str, ...], float] = {}
+        for path, ms in self.sections:
+            # Повторный вход в секцию с тем же путём суммируется
+            totals[path] = totals.get(path, 0.0) + ms
+
+        nodes = [{"id": root, "parent": "", "name": root, "ms": self.wall_ms}]
+        children_ms: Dict[str, float] = {root: 0.0}
+        for path in sorted(totals, key=len):
+            node_id = "/".join((root,) + path)
+            parent_id = "/".join((root,) + path[:-1])
+            nodes.append({"id": node_id, "parent": parent_id, "name": path[-1], "ms": totals[path]})
+            children_ms[parent_id] = children_ms.get(parent_id, 0.0) + totals[path]
+            children_ms.setdefault(node_id, 0.0)
+
+        node_ms = {node["id"]: node["ms"] for node in nodes}
+        for node_id, used in children_ms.items():
+            rest = node_ms[node_id] - used
+            if used and rest > 0.05:
+                nodes.append({"id": f"{node_id}/{UNSECTIONED}", "parent": node_id,
+                              "name": UNSECTIONED, "ms": rest})
+        return nodes
+
+
+class _Section:
+    def __init__(self, profile: PageProfile, name: str):
+        self._profile = profile
+        self._name = name
+
+    def __enter__(self):
+        self._profile._stack.append(self._name)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self._started) * 1000
+        path = tuple(self._profile._stack)
+        self._profile._stack.pop()
+        self._profile.sections.append((path, ms))
+        return False
+
+
+# Профиль текущей отрисовки; None — профилирование выключено
+_active: ContextVar[Optional[PageProfile]] = ContextVar("page_profile", default=None)
+
+
+def section(name: str):
+    """
+    Именованная секция страницы (fetch / transform / render ...):
+        with section("fetch"):
+            df = fetch_lab_measurements()
+    Без активного профиля возвращает пустой контекст — затраты на вызов функции.
+    """
+    profile = _active.get()
+    if profile is None:
+        return _NULL_SECTION
+    return profile.section(name)
+
+
+# =================================================================
+# === ХРАНИЛИЩЕ ПРОФИЛЕЙ ===
+# =================================================================
+
+class ProfileStore:
+    """Последние PROFILE_HISTORY профилей процесса"""
+
+    def __init__(self, maxlen: int = PROFILE_HISTORY):
+        self._profiles: deque = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, profile: PageProfile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def recent(self) -> List[PageProfile]:
+        """Новые сверху"""
+        with self._lock:
+            return list(self._profiles)[::-1]
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+    def to_json(self) -> str:
+        return json.dumps([profile.to_dict() for profile in self.recent()], ensure_ascii=False, indent=2)
+
+
+@st.cache_resource
+def get_profile_store() -> ProfileStore:
+    """Одно хранилище профилей на процесс"""
+    return ProfileStore()
+
+
+def profiling_enabled() -> bool:
+    if PROFILE_ALL_PAGES:
+        return True
+    try:
+        return bool(st.session_state.get(SESSION_FLAG, False))
+    except Exception:
+        return False
+
+
+# tracemalloc общий на процесс: включается первым профилем и выключается последним
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+
+def _start_tracemalloc() -> bool:
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0:
+            if tracemalloc.is_tracing():
+                # Трассировку включил кто-то другой — не трогаем её
+                return False
+            tracemalloc.start()
+        _tracemalloc_users += 1
+        if _tracemalloc_users == 1:
+            tracemalloc.reset_peak()
+        return True
+
+
+def _stop_tracemalloc() -> Optional[float]:
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _, peak = tracemalloc.get_traced_memory()
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+    return peak / 1024
+
+
+def profile_call(page: str, render, *args):
+    """
+    Вызывает render(*args) под профилировщиком и сохраняет профиль.
+    Пик памяти точен, когда страница профилируется одна: tracemalloc общий на процесс.
+    """
+    profile = PageProfile(page)
+    trace_before = len(current_trace())
+    tracing = _start_tracemalloc()
+    token = _active.set(profile)
+    wall_started, cpu_started = time.perf_counter(), time.thread_time()
+    try:
+        return render(*args)
+    except Exception as e:
+        profile.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        profile.cpu_ms = (time.thread_time() - cpu_started) * 1000
+        profile.wall_ms = (time.perf_counter() - wall_started) * 1000
+        _active.reset(token)
+        if tracing:
+            profile.peak_kb = _stop_tracemalloc()
+        queries = current_trace()[trace_before:]
+        profile.queries = len(queries)
+        profile.query_ms = sum(rec.ms for rec in queries)
+        get_profile_store().add(profile)
@@ -0,0 +1,328 @@
+# query_trace.py - Учёт запросов к БД: трасса запуска, гистограмма, журнал медленных
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Awaitable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import unquote
+
+import streamlit as st
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+# Порог медленного запроса (мс) и файл журнала (JSON по строке на запрос)
+SLOW_QUERY_MS = 500
+SLOW_QUERY_LOG = "logs/slow_queries.log"
+
+# Границы корзин гистограммы задержек (мс); последняя — всё, что дольше
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, math.inf)
+
+# Скользящее окно: гистограмма строится по последним RECENT_QUERIES запросам
+RECENT_QUERIES = 2000
+
+# Не больше стольких запросов в трассе одного запуска скрипта
+TRACE_MAX_QUERIES = 1000
+
+# Параметры PostgREST, которые не являются фильтрами
+_NON_FILTER_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+_FILTER_TEXT_LIMIT = 300
+
+# Значения этих колонок не попадают ни в журнал, ни в таблицы администратора
+SENSITIVE_COLUMNS = {"session_token", "email", "password_hash"}
+_REDACTED = "***"
+
+
+def get_trace_settings() -> Dict:
+    """Настройки: секция [query_trace] в secrets или переменные окружения"""
+    settings = {
+        'slow_query_ms': float(os.getenv('ZHAYA_SLOW_QUERY_MS', SLOW_QUERY_MS)),
+        'slow_query_log': os.getenv('ZHAYA_SLOW_QUERY_LOG', SLOW_QUERY_LOG),
+    }
+    try:
+        if hasattr(st, 'secrets') and 'query_trace' in st.secrets:
+            settings.update(dict(st.secrets['query_trace']))
+    except Exception:
+        pass
+    return settings
+
+
+# =================================================================
+# === ЗАПИСЬ О ЗАПРОСЕ ===
+# =================================================================
+
+class QueryRecord(NamedTuple):
+    at: float                 # время начала (epoch)
+    backend: str              # supabase / local
+    method: str               # select, insert, update, delete, rpc, auth...
+    table: str
+    filters: str              # фильтры со значениями, как в запросе
+    shape: str                # фильтры без значений — ключ группировки
+    rows: Optional[int]
+    nbytes: Optional[int]     # размер ответа; None — без сети (локальный бэкенд)
+    ms: float
+    error: Optional[str]
+
+
+# Трасса текущего запуска скрипта. ContextVar, а не threading.local:
+# значение переносится и в задачи асинхронного слоя (см. bind_trace)
+_trace: ContextVar[Optional[List[QueryRecord]]] = ContextVar("query_trace", default=None)
+
+
+def start_trace():
+    """Начинает новую трассу; вызывается в начале каждого запуска app.py"""
+    _trace.set([])
+
+
+def current_trace() -> List[QueryRecord]:
+    """Запросы, выполненные с начала текущего запуска"""
+    return list(_trace.get() or ())
+
+
+async def bind_trace(coro: Awaitable, trace: Optional[List[QueryRecord]]):
+    """Выполняет корутину в фоновом loop, записывая запросы в трассу вызывающего"""
+    _trace.set(trace)
+    return await coro
+
+
+def get_trace_list() -> Optional[List[QueryRecord]]:
+    """Список трассы как есть (для передачи в bind_trace)"""
+    return _trace.get()
+
+
+# =================================================================
+# === СТАТИСТИКА ПРОЦЕССА ===
+# =================================================================
+
+def _bucket_index(ms: float) -> int:
+    for i, bound in enumerate(LATENCY_BUCKETS_MS):
+        if ms <= bound:
+            return i
+    return len(LATENCY_BUCKETS_MS) - 1
+
+
+class QueryStats:
+    """
+    Сводка по всем запросам процесса. По форме запроса (бэкенд, метод,
+    таблица, фильтры без значений) копятся число, суммарное и максимальное
+    время, строки и байты; гистограмма задержек — по скользящему окну.
+    """
+
+    def __init__(self, slow_query_ms: float = SLOW_QUERY_MS, slow_query_log: Optional[str] = SLOW_QUERY_LOG,
+                 window: int = RECENT_QUERIES):
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_log = slow_query_log
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._window = window
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # форма -> [число, сумма мс, максимум мс, строк, байт, ошибок]
+            self._by_shape: Dict[Tuple[str, str, str, str], List[float]] = {}
+            self._recent: deque = deque()
+            self._buckets = [0] * len(LATENCY_BUCKETS_MS)
+            self.total = 0
+            self.slow = 0
+            self.since = time.time()
+
+    def record(self, rec: QueryRecord):
+        trace = _trace.get()
+        if trace is not None and len(trace) < TRACE_MAX_QUERIES:
+            trace.append(rec)
+
+        with self._lock:
+            self.total += 1
+            key = (rec.backend, rec.method, rec.table, rec.shape)
+            agg = self._by_shape.get(key)
+            if agg is None:
+                agg = self._by_shape[key] = [0, 0.0, 0.0, 0, 0, 0]
+            agg[0] += 1
+            agg[1] += rec.ms
+            agg[2] = max(agg[2], rec.ms)
+            agg[3] += rec.rows or 0
+            agg[4] += rec.nbytes or 0
+            agg[5] += rec.error is not None
+
+            if len(self._recent) >= self._window:
+                self._buckets[_bucket_index(self._recent.popleft().ms)] -= 1
+            self._recent.append(rec)
+            self._buckets[_bucket_index(rec.ms)] += 1
+
+            slow = rec.ms >= self.slow_query_ms
+            if slow:
+                self.slow += 1
+
+        if slow:
+            self._log_slow(rec)
+
+    def _log_slow(self, rec: QueryRecord):
+        if not self.slow_query_log:
+            return
+        line = json.dumps({
+            "at": datetime.fromtimestamp(rec.at).isoformat(timespec="milliseconds"),
+            "backend": rec.backend, "method": rec.method, "table": rec.table,
+            "filters": rec.filters, "rows": rec.rows, "bytes": rec.nbytes,
+            "ms": round(rec.ms, 1), "error": rec.error,
+        }, ensure_ascii=False)
+        try:
+            with self._log_lock:
+                directory = os.path.dirname(self.slow_query_log)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.slow_query_log, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            print(f"Журнал медленных запросов недоступен: {e}")
+
+    def top(self, limit: int = 20) -> List[Dict]:
+        """Формы запросов по убыванию суммарного времени"""
+        with self._lock:
+            items = sorted(self._by_shape.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [{
+            "backend": backend, "method": method, "table": table, "filters": shape,
+            "count": int(agg[0]), "total_ms": agg[1], "avg_ms": agg[1] / agg[0], "max_ms": agg[2],
+            "rows": int(agg[3]), "bytes": int(agg[4]), "errors": int(agg[5]),
+        } for (backend, method, table, shape), agg in items]
+
+    def histogram(self) -> List[Tuple[str, int]]:
+        """(корзина, число запросов) по скользящему окну"""
+        with self._lock:
+            counts = list(self._buckets)
+        labels, lower = [], 0
+        for bound in LATENCY_BUCKETS_MS:
+            labels.append(f"> {lower} мс" if math.isinf(bound) else f"≤ {bound} мс")
+            lower = bound
+        return list(zip(labels, counts))
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            latencies = sorted(rec.ms for rec in self._recent)
+        if not latencies:
+            return None
+        return latencies[min(int(len(latencies) * q), len(latencies) - 1)]
+
+    def recent_slow(self, limit: int = 50) -> List[QueryRecord]:
+        with self._lock:
+            slow = [rec for rec in self._recent if rec.ms >= self.slow_query_ms]
+        return slow[-limit:][::-1]
+
+
+_stats: Optional[QueryStats] = None
+_stats_lock = threading.Lock()
+
+
+def get_query_stats() -> QueryStats:
+    """Статистика процесса (работает и вне Streamlit, например в mqtt_client)"""
+    global _stats
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                settings = get_trace_settings()
+                _stats = QueryStats(float(settings['slow_query_ms']), settings.get('slow_query_log'))
+    return _stats
+
+
+# =================================================================
+# === ОПИСАНИЕ ЗАПРОСОВ ===
+# =================================================================
+
+def _shape_of(column: str, op: str) -> str:
+    return f"{column}={op}"
+
+
+def _redact(column: str, value) -> object:
+    """Скрывает значение фильтра по чувствительной колонке (в том числе внутри or/and)"""
+    if column in SENSITIVE_COLUMNS:
+        return _REDACTED
+    if column in ("or", "and") and any(name in str(value) for name in SENSITIVE_COLUMNS):
+        return _REDACTED
+    return value
+
+
+def record_query(backend: str, method: str, table: str, filters: List[Tuple[str, str, object]],
+                 started: float, rows: Optional[int] = None, nbytes: Optional[int] = None,
+                 error: Optional[BaseException] = None):
+    """
+    Записывает выполненный запрос. filters — [(колонка, оператор, значение)],
+    started — time.perf_counter() перед запросом.
+    """
+    ms = (time.perf_counter() - started) * 1000
+    text = "&".join(f"{column}={op}.{_redact(column, value)}" for column, op, value in filters)
+    shape = "&".join(sorted(_shape_of(column, op) for column, op, _ in filters))
+    get_query_stats().record(QueryRecord(
+        at=time.time() - ms / 1000, backend=backend, method=method, table=table,
+        filters=text[:_FILTER_TEXT_LIMIT], shape=shape, rows=rows, nbytes=nbytes, ms=ms,
+        error=None if error is None else f"{type(error).__name__}: {error}"[:_FILTER_TEXT_LIMIT],
+    ))
+
+
+def _rest_method(http_method: str, prefer: str) -> str:
+    if http_method == "GET":
+        return "select"
+    if http_method == "HEAD":
+        return "count"
+    if http_method == "POST":
+        return "upsert" if "resolution=" in prefer else "insert"
+    if http_method == "PATCH":
+        return "update"
+    if http_method == "DELETE":
+        return "delete"
+    return http_method.lower()
+
+
+def _rows_from_content_range(value: Optional[str], method: str) -> Optional[int]:
+    """Content-Range PostgREST: '0-24/*', '0-24/3573', '*/0'"""
+    if not value:
+        return None
+    span, _, total = value.partition("/")
+    if method == "count" and total.isdigit():
+        return int(total)
+    if span == "*":
+        return 0
+    start, _, end = span.partition("-")
+    if start.isdigit() and end.isdigit():
+        return int(end) - int(start) + 1
+    return None
+
+
+def record_http_exchange(request, response, started: float, nbytes: Optional[int],
+                         error: Optional[BaseException] = None):
+    """Запрос через HTTP-транспорт Supabase: PostgREST, RPC, Auth, Storage"""
+    path = request.url.path
+    if "/rest/v1/" in path:
+        name = path.split("/rest/v1/", 1)[1]
+        if name.startswith("rpc/"):
+            method, table = "rpc", name[4:]
+        else:
+            method, table = _rest_method(request.method, request.headers.get("prefer", "")), name
+    elif "/auth/v1/" in path:
+        method, table = "auth", path.split("/auth/v1/", 1)[1]
+    elif "/storage/v1/" in path:
+        method, table = "storage", path.split("/storage/v1/", 1)[1].split("/", 1)[0]
+    else:
+        method, table = request.method.lower(), path
+
+    filters = []
+    for column, value in request.url.params.multi_items():
+        if column in _NON_FILTER_PARAMS:
+            continue
+        op, _, operand = value.partition(".")
+        if op == "not":
+            negated, _, operand = operand.partition(".")
+            op = f"not.{negated}"
+        filters.append((column, op, unquote(operand)))
+
+    rows = None
+    if response is not None:
+        rows = _rows_from_content_range(response.headers.get("content-range"), method)
+        if error is None and response.status_code >= 400:
+            error = RuntimeError(f"HTTP {response.status_code}")
+    record_query("supabase", method, table, filters, started, rows=rows, nbytes=nbytes, error=error)
@@ -0,0 +1,202 @@
+# rate_limit.py - Ограничение частоты попыток входа (token bucket)
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import streamlit as st
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+# На один email: 5 попыток подряд, далее одна в минуту
+EMAIL_BUCKET_CAPACITY = 5
+EMAIL_REFILL_PER_SEC = 1 / 60
+
+# На одного клиента (IP): 20 попыток подряд, далее одна в 6 секунд
+CLIENT_BUCKET_CAPACITY = 20
+CLIENT_REFILL_PER_SEC = 1 / 6
+
+# Сколько ключей держать в памяти (старые вытесняются, LRU)
+RATE_LIMIT_MAX_KEYS = 50_000
+
+
+def get_rate_limit_settings() -> Dict:
+    """Настройки: секция [rate_limit] в secrets или переменные окружения"""
+    settings = {
+        # Путь к общей SQLite-базе для нескольких процессов; пусто — память процесса
+        'shared_db': os.getenv('ZHAYA_RATE_LIMIT_DB'),
+        # Доверять X-Forwarded-For только за своим прокси: иначе заголовок подделывается
+        'trust_proxy': os.getenv('ZHAYA_TRUST_PROXY', '0') == '1',
+        # Сколько доверенных прокси стоит перед приложением: адрес клиента —
+        # запись X-Forwarded-For, добавленная самым дальним из них (n-я справа)
+        'trusted_hops': int(os.getenv('ZHAYA_TRUSTED_HOPS', '1')),
+    }
+    try:
+        if hasattr(st, 'secrets') and 'rate_limit' in st.secrets:
+            settings.update(dict(st.secrets['rate_limit']))
+    except Exception:
+        pass
+    return settings
+
+
+# =================================================================
+# === ХРАНИЛИЩА КОРЗИН ===
+# =================================================================
+# take(key, capacity, rate) списывает один токен и возвращает
+# (разрешено, секунд до следующего токена). Состояние корзины —
+# (токенов, время обновления); пополнение считается лениво при обращении.
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> float:
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+class MemoryBucketStore:
+    """Корзины в памяти процесса: O(1) на проверку, не больше max_keys ключей"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self._max_keys = max_keys
+        self._buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, rate: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated, now, capacity, rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self._max_keys:
+                # Вытесняется самый давний ключ: его корзина почти наверняка полна
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def reset(self, key: str):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class SQLiteBucketStore:
+    """
+    Общие корзины для нескольких процессов на одной машине.
+    Списание — одна транзакция BEGIN IMMEDIATE по первичному ключу.
+    """
+
+    def __init__(self, path: str, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self._max_keys = max_keys
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rate_buckets ("
+                           "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_buckets_updated ON rate_buckets(updated)")
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def take(self, key: str, capacity: float, rate: float) -> Tuple[bool, float]:
+        # Время стены, а не monotonic: значения сравниваются между процессами
+        now = time.time()
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                row = cur.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+                tokens = _refill(*row, now, capacity, rate) if row else capacity
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                cur.execute("INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                            (key, tokens, now))
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                self._trim()
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def _trim(self):
+        """Оставляет max_keys самых свежих ключей"""
+        self._conn.execute(
+            "DELETE FROM rate_buckets WHERE updated < ("
+            "SELECT updated FROM rate_buckets ORDER BY updated DESC LIMIT 1 OFFSET ?)",
+            (self._max_keys,)
+        )
+
+    def reset(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM rate_buckets WHERE key = ?", (key,))
+
+
+# =================================================================
+# === ОГРАНИЧИТЕЛЬ ВХОДА ===
+# =================================================================
+
+class LoginRateLimiter:
+    """Две корзины на попытку: по клиенту и по email. Проверка идёт до обращения к БД."""
+
+    def __init__(self, store):
+        self._store = store
+        self._rejected = 0
+
+    def check(self, email: str, client_id: Optional[str]) -> Tuple[bool, float]:
+        """
+        (разрешено, секунд до следующей попытки). Без client_id (адрес
+        клиента неизвестен) проверяется только корзина email: общая корзина
+        на всех таких клиентов заблокировала бы вход всему заводу.
+        """
+        allowed, wait = True, 0.0
+        if client_id:
+            allowed, wait = self._store.take(f"client:{client_id}", CLIENT_BUCKET_CAPACITY, CLIENT_REFILL_PER_SEC)
+        if allowed:
+            allowed, wait = self._store.take(f"email:{email.strip().lower()}",
+                                             EMAIL_BUCKET_CAPACITY, EMAIL_REFILL_PER_SEC)
+        if not allowed:
+            self._rejected += 1
+        return allowed, wait
+
+    def on_success(self, email: str):
+        """Успешный вход снимает ограничение с email (клиентская корзина не сбрасывается)"""
+        self._store.reset(f"email:{email.strip().lower()}")
+
+    @property
+    def rejected(self) -> int:
+        return self._rejected
+
+
+@st.cache_resource
+def get_login_limiter() -> LoginRateLimiter:
+    """Один ограничитель на процесс; с shared_db — общий для всех процессов"""
+    shared_db = get_rate_limit_settings().get('shared_db')
+    if shared_db:
+        try:
+            return LoginRateLimiter(SQLiteBucketStore(shared_db))
+        except sqlite3.Error as e:
+            print(f"Общее хранилище лимитов недоступно, используется память процесса: {e}")
+    return LoginRateLimiter(MemoryBucketStore())
+
+
+def get_client_id() -> Optional[str]:
+    """
+    Идентификатор клиента: IP соединения или (за доверенным прокси)
+    X-Forwarded-For; None — адрес неизвестен (localhost, прокси без trust_proxy)
+    """
+    try:
+        settings = get_rate_limit_settings()
+        if settings.get('trust_proxy'):
+            forwarded = st.context.headers.get("X-Forwarded-For")
+            if forwarded:
+                # Левые записи задаёт сам клиент — берётся добавленная доверенным прокси
+                hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+                trusted = max(1, int(settings.get('trusted_hops') or 1))
+                if hops:
+                    return hops[-min(trusted, len(hops))]
+        return getattr(st.context, "ip_address", None) or None
+    except Exception:
+        return None
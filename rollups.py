@@ -0,0 +1,340 @@
+# rollups.py - Материализованные дневные сводки производства и качества
+import os
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from database_supabase import init_supabase
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+# Смены: ключ -> (подпись, час начала, час окончания)
+SHIFTS = {
+    'first': ("Первая (08:00-16:00)", 8, 16),
+    'second': ("Вторая (16:00-00:00)", 16, 24),
+    'night': ("Ночная (00:00-08:00)", 0, 8),
+}
+SHIFT_BY_LABEL = {label: key for key, (label, _, _) in SHIFTS.items()}
+
+# Часовой пояс завода: границы смен и дней — по местному времени
+PLANT_TZ = os.getenv("ZHAYA_PLANT_TZ", "Asia/Almaty")
+
+# Параметры качества, которые ведутся в сводке, и их нормативы (мин, макс)
+QUALITY_LIMITS = {
+    'pH': (5.1, 5.6),
+    'W': (68.0, 72.0),
+    'Aw': (0.88, 0.90),
+    'TBARS': (None, 1.5),
+}
+
+# Размер страницы при догрузке новых строк (keyset-пагинация)
+ROLLUP_PAGE_SIZE = 1000
+
+# Сколько открытых партий проверяется одним запросом (batch_id IN (...))
+OPEN_BATCHES_CHUNK = 200
+
+# Не чаще одного инкрементального обновления за интервал (секунды)
+ROLLUP_MIN_REFRESH_SECONDS = 5
+
+_BATCH_COLUMNS = 'batch_id, product_type, initial_weight, final_weight, start_time, end_time'
+_MEASUREMENT_COLUMNS = 'measurement_id, batch_id, parameter_name, parameter_value, measurement_time'
+
+_UNKNOWN_PRODUCT = '—'
+
+
+def shift_of_hours(hours: np.ndarray) -> np.ndarray:
+    """Ключ смены по часу начала"""
+    return np.select([hours >= 16, hours >= 8], ['second', 'first'], default='night')
+
+
+def _parse_times(values: pd.Series) -> pd.Series:
+    """ISO-строки PostgREST/SQLite (без смещения — UTC) -> наивное местное время завода"""
+    parsed = pd.to_datetime(values, format='ISO8601', utc=True, errors='coerce')
+    return parsed.dt.tz_convert(PLANT_TZ).dt.tz_localize(None)
+
+
+def _days(date_from: date, date_to: date) -> List[date]:
+    return [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+
+
+# =================================================================
+# === ХРАНИЛИЩЕ СВОДОК ===
+# =================================================================
+
+class RollupStore:
+    """
+    Сводки по ключу (день, смена, продукт), обновляемые инкрементально.
+
+    Партии: вклад каждой партии запоминается, поэтому обновление
+    (закрытие партии с финальным весом) вычитает старый вклад и добавляет новый.
+    Измерения только добавляются, поэтому хранятся сливаемые статистики
+    count/sum/sumsq/min/max. Запрос за период обходит только дни периода,
+    а не историю целиком.
+
+    Водяные знаки: новые партии — по batch_id, новые измерения — по
+    measurement_id. Закрытие партии ищется среди партий, открытых
+    при последнем обновлении (по batch_id, а не по end_time: закрытие
+    задним числом иначе осталось бы незамеченным).
+    """
+
+    def __init__(self, client_factory=init_supabase, page_size: int = ROLLUP_PAGE_SIZE):
+        self._client_factory = client_factory
+        self._page_size = page_size
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+
+        self._batch_watermark = 0
+        self._measurement_watermark = 0
+        # Партии без end_time: их закрытие проверяется при каждом обновлении
+        self._open_batches: set = set()
+
+        # batch_id -> (day, shift, product, input_kg, output_kg)
+        self._batch_contrib: Dict[int, Tuple] = {}
+        self._batch_product: Dict[int, str] = {}
+        # day -> {(shift, product): [batches, input_kg, completed, completed_input_kg, output_kg]}
+        self._production: Dict[date, Dict[Tuple[str, str], List[float]]] = {}
+        # day -> {(shift, product, parameter): [count, sum, sumsq, min, max, out_of_spec]}
+        self._quality: Dict[date, Dict[Tuple[str, str, str], List[float]]] = {}
+
+    # --- обновление ---
+
+    def refresh(self, force: bool = False) -> bool:
+        """Догружает новые и изменённые строки; False — клиент недоступен"""
+        if not force and time.monotonic() - self._last_refresh < ROLLUP_MIN_REFRESH_SECONDS:
+            return True
+
+        client = self._client_factory()
+        if client is None:
+            return False
+
+        with self._lock:
+            self._load_new_batches(client)
+            self._load_closed_batches(client)
+            self._load_new_measurements(client)
+            self._last_refresh = time.monotonic()
+        return True
+
+    def _load_new_batches(self, client):
+        while True:
+            response = client.table('production_batches').select(_BATCH_COLUMNS) \
+                .gt('batch_id', self._batch_watermark) \
+                .order('batch_id') \
+                .limit(self._page_size) \
+                .execute()
+            rows = response.data or []
+            if rows:
+                self._apply_batches(pd.DataFrame(rows))
+                self._batch_watermark = max(self._batch_watermark, max(r['batch_id'] for r in rows))
+            if len(rows) < self._page_size:
+                break
+
+    def _load_closed_batches(self, client):
+        # Партии, открытые на прошлом обновлении и закрытые с тех пор (с любым end_time);
+        # только что загруженные новые партии проверяются повторно — вклад заменяется
+        open_ids = sorted(self._open_batches)
+        for i in range(0, len(open_ids), OPEN_BATCHES_CHUNK):
+            rows = client.table('production_batches').select(_BATCH_COLUMNS) \
+                .in_('batch_id', open_ids[i:i + OPEN_BATCHES_CHUNK]) \
+                .execute().data or []
+            closed = [r for r in rows if r.get('end_time')]
+            if closed:
+                self._apply_batches(pd.DataFrame(closed))
+
+    def _load_new_measurements(self, client):
+        while True:
+            response = client.table('lab_measurements').select(_MEASUREMENT_COLUMNS) \
+                .gt('measurement_id', self._measurement_watermark) \
+                .in_('parameter_name', list(QUALITY_LIMITS)) \
+                .order('measurement_id') \
+                .limit(self._page_size) \
+                .execute()
+            rows = response.data or []
+            if rows:
+                self._apply_measurements(pd.DataFrame(rows))
+                self._measurement_watermark = max(self._measurement_watermark,
+                                                  max(r['measurement_id'] for r in rows))
+            if len(rows) < self._page_size:
+                break
+
+    def _apply_batches(self, df: pd.DataFrame):
+        start = _parse_times(df['start_time'])
+        df = df.assign(
+            day=start.dt.date,
+            shift=shift_of_hours(start.dt.hour.fillna(0).to_numpy()),
+            product=df['product_type'].fillna(_UNKNOWN_PRODUCT),
+            input_kg=pd.to_numeric(df['initial_weight'], errors='coerce').fillna(0.0),
+            output_kg=pd.to_numeric(df['final_weight'], errors='coerce'),
+            closed=df['end_time'].notna(),
+        )
+
+        for row in df[start.notna()].itertuples(index=False):
+            old = self._batch_contrib.get(row.batch_id)
+            if old is not None:
+                self._add_batch(*old, sign=-1)
+            output_kg = None if pd.isna(row.output_kg) else float(row.output_kg)
+            contrib = (row.day, row.shift, row.product, float(row.input_kg), output_kg)
+            self._add_batch(*contrib)
+            self._batch_contrib[row.batch_id] = contrib
+            self._batch_product[row.batch_id] = row.product
+            if row.closed:
+                self._open_batches.discard(row.batch_id)
+            else:
+                self._open_batches.add(row.batch_id)
+
+    def _add_batch(self, day, shift, product, input_kg, output_kg, sign: int = 1):
+        cell = self._production.setdefault(day, {}).setdefault((shift, product), [0, 0.0, 0, 0.0, 0.0])
+        cell[0] += sign
+        cell[1] += sign * input_kg
+        if output_kg is not None:
+            cell[2] += sign
+            cell[3] += sign * input_kg
+            cell[4] += sign * output_kg
+
+    def _apply_measurements(self, df: pd.DataFrame):
+        measured = _parse_times(df['measurement_time'])
+        values = pd.to_numeric(df['parameter_value'], errors='coerce')
+        df = pd.DataFrame({
+            'day': measured.dt.date,
+            'shift': shift_of_hours(measured.dt.hour.fillna(0).to_numpy()),
+            'product': df['batch_id'].map(self._batch_product).fillna(_UNKNOWN_PRODUCT),
+            'parameter': df['parameter_name'],
+            'value': values,
+        })[measured.notna() & values.notna()]
+        if df.empty:
+            return
+
+        low = df['parameter'].map(lambda p: QUALITY_LIMITS[p][0]).astype(float)
+        high = df['parameter'].map(lambda p: QUALITY_LIMITS[p][1]).astype(float)
+        df['out_of_spec'] = (df['value'] < low.fillna(-np.inf)) | (df['value'] > high.fillna(np.inf))
+        df['value_sq'] = df['value'] ** 2
+
+        grouped = df.groupby(['day', 'shift', 'product', 'parameter']).agg(
+            n=('value', 'size'), total=('value', 'sum'), total_sq=('value_sq', 'sum'),
+            low=('value', 'min'), high=('value', 'max'), out_of_spec=('out_of_spec', 'sum'))
+
+        for (day, shift, product, parameter), row in zip(grouped.index, grouped.itertuples(index=False)):
+            cells = self._quality.setdefault(day, {})
+            cell = cells.get((shift, product, parameter))
+            if cell is None:
+                cells[(shift, product, parameter)] = [row.n, row.total, row.total_sq,
+                                                      row.low, row.high, row.out_of_spec]
+            else:
+                cell[0] += row.n
+                cell[1] += row.total
+                cell[2] += row.total_sq
+                cell[3] = min(cell[3], row.low)
+                cell[4] = max(cell[4], row.high)
+                cell[5] += row.out_of_spec
+
+    # --- чтение ---
+
+    @staticmethod
+    def _match(shift: str, product: str, shifts: Optional[set], products: Optional[set]) -> bool:
+        return (shifts is None or shift in shifts) and (products is None or product in products)
+
+    def production(self, date_from: date, date_to: date,
+                   shifts: Optional[Iterable[str]] = None,
+                   products: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Дневная сводка производства за период"""
+        shifts = set(shifts) if shifts is not None else None
+        products = set(products) if products is not None else None
+
+        records = []
+        with self._lock:
+            for day in _days(date_from, date_to):
+                totals = [0, 0.0, 0, 0.0, 0.0]
+                for (shift, product), cell in self._production.get(day, {}).items():
+                    if self._match(shift, product, shifts, products):
+                        totals = [a + b for a, b in zip(totals, cell)]
+                defects = measurements = 0
+                for (shift, product, _), cell in self._quality.get(day, {}).items():
+                    if self._match(shift, product, shifts, products):
+                        measurements += cell[0]
+                        defects += cell[5]
+                records.append((day, *totals, measurements, defects))
+
+        df = pd.DataFrame(records, columns=['day', 'batches', 'input_kg', 'completed',
+                                            'completed_input_kg', 'output_kg', 'measurements', 'defects'])
+        df['day'] = pd.to_datetime(df['day'])
+        df['yield_pct'] = df['output_kg'] / df['completed_input_kg'].where(df['completed_input_kg'] > 0) * 100
+        return df
+
+    def quality(self, date_from: date, date_to: date,
+                shifts: Optional[Iterable[str]] = None,
+                products: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        Дневная сводка качества за период: по каждому параметру
+        count, mean, std, min, max и число замеров вне норматива.
+        """
+        shifts = set(shifts) if shifts is not None else None
+        products = set(products) if products is not None else None
+
+        records = []
+        with self._lock:
+            for day in _days(date_from, date_to):
+                merged: Dict[str, List[float]] = {}
+                for (shift, product, parameter), cell in self._quality.get(day, {}).items():
+                    if not self._match(shift, product, shifts, products):
+                        continue
+                    acc = merged.get(parameter)
+                    if acc is None:
+                        merged[parameter] = list(cell)
+                    else:
+                        acc[0] += cell[0]
+                        acc[1] += cell[1]
+                        acc[2] += cell[2]
+                        acc[3] = min(acc[3], cell[3])
+                        acc[4] = max(acc[4], cell[4])
+                        acc[5] += cell[5]
+                for parameter, (count, total, total_sq, low, high, out_of_spec) in merged.items():
+                    mean = total / count
+                    variance = max(total_sq / count - mean ** 2, 0.0)
+                    records.append((day, parameter, count, mean, variance ** 0.5, low, high, out_of_spec))
+
+        df = pd.DataFrame(records, columns=['day', 'parameter', 'count', 'mean', 'std',
+                                            'min', 'max', 'out_of_spec'])
+        df['day'] = pd.to_datetime(df['day'])
+        return df
+
+
+@st.cache_resource
+def get_rollup_store() -> RollupStore:
+    """Одна сводка на процесс, общая для всех сессий"""
+    return RollupStore()
+
+
+def _refreshed_store() -> Optional[RollupStore]:
+    store = get_rollup_store()
+    try:
+        if not store.refresh():
+            return None
+    except Exception as e:
+        st.error(f"Ошибка обновления сводок: {e}")
+    return store
+
+
+def production_rollup(date_from: date, date_to: date, shift_labels: Optional[List[str]] = None,
+                      products: Optional[List[str]] = None) -> pd.DataFrame:
+    """Дневная сводка производства; shift_labels — подписи смен из SHIFTS"""
+    store = _refreshed_store()
+    if store is None:
+        return pd.DataFrame()
+    shifts = [SHIFT_BY_LABEL[label] for label in shift_labels] if shift_labels is not None else None
+    return store.production(date_from, date_to, shifts, products)
+
+
+def quality_rollup(date_from: date, date_to: date, shift_labels: Optional[List[str]] = None,
+                   products: Optional[List[str]] = None) -> pd.DataFrame:
+    """Дневная сводка качества; shift_labels — подписи смен из SHIFTS"""
+    store = _refreshed_store()
+    if store is None:
+        return pd.DataFrame()
+    shifts = [SHIFT_BY_LABEL[label] for label in shift_labels] if shift_labels is not None else None
+    return store.quality(date_from, date_to, shifts, products)
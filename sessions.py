@@ -0,0 +1,185 @@
+# sessions.py - Проверка токенов сессий с кэшем и фоновым обслуживанием user_sessions
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import streamlit as st
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+# Время жизни сессии
+SESSION_TTL = timedelta(hours=8)
+
+# Сколько проверенных токенов держать в памяти процесса
+SESSION_CACHE_SIZE = 10_000
+
+# Как часто перепроверять кэшированные токены в БД (отзыв из других процессов), секунды
+SESSION_POLL_INTERVAL = 5.0
+
+# Как часто удалять истёкшие сессии из user_sessions, секунды
+SESSION_PURGE_INTERVAL = 600.0
+
+# Токенов в одном запросе перепроверки (ограничение длины URL PostgREST)
+SESSION_POLL_CHUNK = 100
+
+
+def _to_epoch(value) -> float:
+    """ISO-время из БД (наивное — UTC) -> epoch секунды"""
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+# =================================================================
+# === ХРАНИЛИЩЕ СЕССИЙ ===
+# =================================================================
+
+class SessionStore:
+    """
+    LRU проверенных токенов: token -> (user_id, expires_at epoch).
+
+    Проверка на каждом перезапуске страницы — поиск в словаре и сравнение
+    времени, без обращения к БД. Фоновый поток раз в SESSION_POLL_INTERVAL
+    пачкой перепроверяет все кэшированные токены и вытесняет отозванные
+    (logout в другом процессе), а раз в SESSION_PURGE_INTERVAL одним
+    запросом удаляет истёкшие строки user_sessions.
+    """
+
+    def __init__(self, client, capacity: int = SESSION_CACHE_SIZE,
+                 poll_interval: float = SESSION_POLL_INTERVAL,
+                 purge_interval: float = SESSION_PURGE_INTERVAL):
+        self._client = client
+        self._capacity = capacity
+        self._poll_interval = poll_interval
+        self._purge_interval = purge_interval
+        self._cache: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.last_error: Optional[str] = None
+
+        self._thread = threading.Thread(target=self._run, name="session-maintenance", daemon=True)
+        self._thread.start()
+
+    # --- кэш ---
+
+    def remember(self, token: str, user_id: str, expires_at):
+        """Кладёт заведомо валидный токен в кэш (сразу после входа)"""
+        with self._lock:
+            self._cache[token] = (user_id, _to_epoch(expires_at))
+            self._cache.move_to_end(token)
+            while len(self._cache) > self._capacity:
+                self._cache.popitem(last=False)
+
+    def forget(self, token: str):
+        with self._lock:
+            self._cache.pop(token, None)
+
+    def validate(self, token: str, user_id: Optional[str] = None) -> bool:
+        """Проверяет токен: из кэша за микросекунды, иначе — один запрос к БД"""
+        if not token:
+            return False
+
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(token)
+            if entry is not None:
+                if entry[1] <= now:
+                    del self._cache[token]
+                    return False
+                self._cache.move_to_end(token)
+                return user_id is None or entry[0] == user_id
+
+        # Промах кэша: токен мог быть выдан другим процессом
+        response = self._client.table('user_sessions') \
+            .select('user_id, expires_at') \
+            .eq('session_token', token) \
+            .eq('is_active', True) \
+            .execute()
+        if not response.data:
+            return False
+
+        row = response.data[0]
+        if _to_epoch(row['expires_at']) <= now:
+            return False
+        self.remember(token, row['user_id'], row['expires_at'])
+        return user_id is None or row['user_id'] == user_id
+
+    def revoke(self, token: str):
+        """Отзывает сессию: сразу в этом процессе, в остальных — при следующем опросе"""
+        self.forget(token)
+        self._client.table('user_sessions') \
+            .update({'is_active': False}) \
+            .eq('session_token', token) \
+            .execute()
+
+    def __len__(self):
+        return len(self._cache)
+
+    # --- фоновое обслуживание ---
+
+    def revalidate_cached(self):
+        """Пачкой перепроверяет кэш и вытесняет отозванные и истёкшие токены"""
+        now = time.time()
+        with self._lock:
+            tokens = [token for token, (_, expires) in self._cache.items() if expires > now]
+            expired = [token for token, (_, expires) in self._cache.items() if expires <= now]
+            for token in expired:
+                del self._cache[token]
+
+        now_iso = datetime.utcnow().isoformat()
+        revoked: List[str] = []
+        for i in range(0, len(tokens), SESSION_POLL_CHUNK):
+            chunk = tokens[i:i + SESSION_POLL_CHUNK]
+            response = self._client.table('user_sessions') \
+                .select('session_token') \
+                .in_('session_token', chunk) \
+                .eq('is_active', True) \
+                .gt('expires_at', now_iso) \
+                .execute()
+            alive = {row['session_token'] for row in response.data or []}
+            revoked.extend(token for token in chunk if token not in alive)
+
+        if revoked:
+            with self._lock:
+                for token in revoked:
+                    self._cache.pop(token, None)
+        return len(revoked)
+
+    def purge_expired(self):
+        """Удаляет все истёкшие сессии одним запросом"""
+        self._client.table('user_sessions') \
+            .delete() \
+            .lt('expires_at', datetime.utcnow().isoformat()) \
+            .execute()
+
+    def _run(self):
+        next_purge = time.monotonic() + self._purge_interval
+        while not self._stop.wait(self._poll_interval):
+            try:
+                self.revalidate_cached()
+                if time.monotonic() >= next_purge:
+                    self.purge_expired()
+                    next_purge = time.monotonic() + self._purge_interval
+            except Exception as e:
+                # Сеть могла пропасть: кэш остаётся, повтор на следующем цикле
+                self.last_error = str(e)
+
+    def close(self):
+        self._stop.set()
+
+    def stats(self) -> Dict:
+        return {'cached': len(self._cache), 'last_error': self.last_error}
+
+
+@st.cache_resource
+def get_session_store(_client) -> SessionStore:
+    """Одно хранилище сессий на процесс (клиент не участвует в ключе кэша)"""
+    return SessionStore(_client)
@@ -0,0 +1,31 @@
+-- sql/login_session.sql - Создание сессии при входе за один запрос
+--
+-- Вызывается из auth.authenticate_user после проверки пароля:
+-- вставка в user_sessions, обновление users.last_login и (если передан)
+-- перехешированного пароля выполняются в одной транзакции.
+-- Без этой функции приложение выполняет те же шаги отдельными запросами.
+-- Функция выполняется с правами вызывающего (security invoker), поэтому
+-- действуют те же политики RLS, что и для прямых запросов к таблицам.
+
+create or replace function create_login_session(
+    p_user_id users.user_id%type,
+    p_session_token text,
+    p_expires_at timestamptz,
+    p_password_hash text default null
+)
+returns void
+language plpgsql
+as $$
+begin
+    insert into user_sessions (user_id, session_token, expires_at, is_active)
+    values (p_user_id, p_session_token, p_expires_at, true);
+
+    update users
+       set last_login = now(),
+           password_hash = coalesce(p_password_hash, password_hash)
+     where user_id = p_user_id;
+end;
+$$;
+
+revoke all on function create_login_session(users.user_id%type, text, timestamptz, text) from public;
+grant execute on function create_login_session(users.user_id%type, text, timestamptz, text) to anon, authenticated, service_role;
@@ -0,0 +1,42 @@
+-- sql/roles.sql - Роли и права доступа в БД
+--
+-- Если таблица есть, auth берёт роли из неё вместо встроенного ROLES.
+-- Приложение раз в 30 секунд читает max(updated_at) и перекомпилирует
+-- матрицу прав только при изменении, поэтому правки ролей применяются
+-- без перезапуска. Триггер обновляет updated_at при любом изменении строки.
+
+create table if not exists roles (
+    role text primary key,
+    name_ru text,
+    name_en text,
+    name_kk text,
+    permissions text[] not null default '{}',
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists idx_roles_updated on roles (updated_at desc);
+
+create or replace function roles_touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists roles_touch_updated_at on roles;
+create trigger roles_touch_updated_at
+    before insert or update on roles
+    for each row execute function roles_touch_updated_at();
+
+-- Удаление роли не меняет max(updated_at) оставшихся строк: после удаления
+-- обновите любую строку (например, update roles set role = role where role = 'admin').
+
+insert into roles (role, name_ru, name_en, name_kk, permissions) values
+    ('admin',    'Администратор', 'Administrator', 'Әкімші',   '{all}'),
+    ('manager',  'Менеджер',      'Manager',       'Менеджер', '{view_dashboard,view_reports,view_history,edit_data}'),
+    ('operator', 'Оператор',      'Operator',      'Оператор', '{view_dashboard,edit_data}'),
+    ('analyst',  'Аналитик',      'Analyst',       'Аналитик', '{view_dashboard,view_reports,view_history}')
+on conflict (role) do nothing;
@@ -0,0 +1,252 @@
+# xlsx_cache.py - Параллельный разбор листов Excel и бинарные копии (Feather)
+import argparse
+import atexit
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Модуль не импортирует streamlit: его функции выполняются в дочерних процессах
+
+# =================================================================
+# === КОНФИГУРАЦИЯ ===
+# =================================================================
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Каталог бинарных копий листов
+SIDECAR_DIR = Path(os.getenv("ZHAYA_XLSX_CACHE_DIR", str(BASE_DIR / ".cache" / "xlsx")))
+
+# Сколько процессов разбирают листы одновременно
+PARSE_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# Книги меньше этого размера разбираются в текущем процессе:
+# передача задачи в пул дороже разбора нескольких небольших листов
+PARALLEL_MIN_BYTES = 512 * 1024
+
+_MANIFEST = "manifest.json"
+_HASH_CHUNK = 1 << 20
+
+
+# =================================================================
+# === БИНАРНЫЕ КОПИИ ===
+# =================================================================
+# Копия книги — каталог <stem>-<sha256[:16]>/ с файлом Feather на лист
+# и manifest.json (порядок листов), который пишется последним:
+# без манифеста копия считается незаконченной.
+
+def content_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def to_arrow(df: pd.DataFrame) -> pa.Table:
+    """Колонки со смешанными типами (число и текст в одной колонке Excel) хранятся текстом"""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = df.copy()
+        for column in df.columns[df.dtypes == object]:
+            df[column] = df[column].map(lambda v: None if pd.isna(v) else str(v))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _sheet_file(sidecar: Path, index: int) -> Path:
+    # Имя листа может содержать символы, недопустимые в имени файла
+    return sidecar / f"sheet-{index:03d}.feather"
+
+
+def _write_atomic(target: Path, write):
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".write-", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, target)
+    except Exception:
+        os.unlink(tmp)
+        raise
+
+
+def parse_sheet_to_sidecar(path: str, sheet: str, target: str) -> str:
+    """Разбирает один лист и пишет его в Feather (выполняется в дочернем процессе)"""
+    df = pd.read_excel(path, sheet_name=sheet, engine="openpyxl")
+    # Без сжатия: файл отображается в память без распаковки
+    _write_atomic(Path(target), lambda tmp: feather.write_feather(to_arrow(df), tmp, compression="uncompressed"))
+    return target
+
+
+def _read_sidecar(sidecar: Path) -> Optional[Dict[str, pd.DataFrame]]:
+    manifest = sidecar / _MANIFEST
+    if not manifest.exists():
+        return None
+    try:
+        sheets = json.loads(manifest.read_text(encoding="utf-8"))["sheets"]
+        return {sheet: feather.read_table(_sheet_file(sidecar, i), memory_map=True).to_pandas()
+                for i, sheet in enumerate(sheets)}
+    except (OSError, ValueError, KeyError, pa.ArrowInvalid):
+        # Повреждённая или неполная копия — книга разбирается заново
+        return None
+
+
+def _sheet_names(path: Path) -> List[str]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+# =================================================================
+# === ПУЛ ПРОЦЕССОВ ===
+# =================================================================
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Пул живёт всё время процесса. spawn, а не fork: родитель (Streamlit)
+    многопоточный, а fork копирует захваченные другими потоками блокировки.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+                atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool
+
+
+# =================================================================
+# === ЧТЕНИЕ КНИГИ ===
+# =================================================================
+
+def read_workbook(path: Path, parallel: Optional[bool] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Все листы книги {имя: DataFrame}. Повторное чтение той же книги
+    (по хешу содержимого) отображает в память готовые Feather-копии;
+    иначе листы разбираются — параллельно в пуле процессов, если книга
+    не меньше PARALLEL_MIN_BYTES (или parallel=True).
+    """
+    path = Path(path)
+    digest = content_hash(path)
+    sidecar = SIDECAR_DIR / f"{path.stem}-{digest[:16]}"
+
+    cached = _read_sidecar(sidecar)
+    if cached is not None:
+        return cached
+
+    try:
+        sidecar.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        # Каталог копий недоступен для записи — обычное чтение
+        with pd.ExcelFile(path, engine="openpyxl") as xls:
+            return {sheet: pd.read_excel(xls, sheet_name=sheet) for sheet in xls.sheet_names}
+
+    sheets = _sheet_names(path)
+    targets = [str(_sheet_file(sidecar, i)) for i in range(len(sheets))]
+    if parallel is None:
+        parallel = len(sheets) > 1 and PARSE_WORKERS > 1 and path.stat().st_size >= PARALLEL_MIN_BYTES
+
+    if parallel:
+        list(_get_pool().map(parse_sheet_to_sidecar, [str(path)] * len(sheets), sheets, targets))
+    else:
+        for sheet, target in zip(sheets, targets):
+            parse_sheet_to_sidecar(str(path), sheet, target)
+
+    _write_atomic(sidecar / _MANIFEST,
+                  lambda tmp: Path(tmp).write_text(json.dumps({"source": path.name, "sheets": sheets},
+                                                              ensure_ascii=False), encoding="utf-8"))
+    _remove_stale(path, keep=sidecar)
+    return _read_sidecar(sidecar)
+
+
+def _remove_stale(path: Path, keep: Path):
+    """Удаляет копии прежних версий той же книги"""
+    for old in SIDECAR_DIR.glob(f"{path.stem}-*"):
+        if old != keep and old.is_dir() and len(old.name) == len(keep.name):
+            shutil.rmtree(old, ignore_errors=True)
+
+
+# =================================================================
+# === БЕНЧМАРК ===
+# =================================================================
+
+def _synthetic_workbook(path: Path, sheets: int, rows: int):
+    import numpy as np
+
+    rng = np.random.default_rng(42)
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        for i in range(sheets):
+            pd.DataFrame({
+                "BatchID": [f"B{n:05d}" for n in range(rows)],
+                "mass_kg": rng.normal(10, 1.5, rows).round(2),
+                "T_initial_C": rng.integers(0, 6, rows),
+                "Salt_pct": rng.normal(3.2, 0.3, rows).round(2),
+                "Moisture_pct": rng.normal(71, 1.5, rows).round(1),
+                "StarterCFU": rng.integers(10 ** 5, 10 ** 7, rows),
+                "Extract_pct": rng.choice([0.0, 3.0, 5.0], rows),
+            }).to_excel(writer, sheet_name=f"T{i + 1}", index=False)
+
+
+def benchmark(sizes=(1_000, 5_000, 20_000), sheets: int = 6):
+    """Холодное чтение (последовательно и в пуле) и тёплое (отображение Feather)"""
+    global SIDECAR_DIR
+    original = SIDECAR_DIR
+    print(f"листов: {sheets}, процессов: {PARSE_WORKERS}")
+    with tempfile.TemporaryDirectory() as tmp:
+        SIDECAR_DIR = Path(tmp) / "sidecars"
+        try:
+            # Запуск процессов пула не входит в замеры
+            list(_get_pool().map(abs, range(PARSE_WORKERS)))
+            for rows in sizes:
+                workbook = Path(tmp) / f"synthetic_{rows}.xlsx"
+                _synthetic_workbook(workbook, sheets, rows)
+                size_mb = workbook.stat().st_size / 2 ** 20
+
+                started = time.perf_counter()
+                with pd.ExcelFile(workbook, engine="openpyxl") as xls:
+                    for sheet in xls.sheet_names:
+                        pd.read_excel(xls, sheet_name=sheet)
+                sequential = time.perf_counter() - started
+
+                shutil.rmtree(SIDECAR_DIR, ignore_errors=True)
+                started = time.perf_counter()
+                read_workbook(workbook, parallel=True)
+                cold = time.perf_counter() - started
+
+                started = time.perf_counter()
+                read_workbook(workbook)
+                warm = time.perf_counter() - started
+
+                print(f"{rows:>6} строк x {sheets} ({size_mb:.1f} МБ): последовательно {sequential:.2f} с, "
+                      f"пул + копии {cold:.2f} с ({sequential / cold:.1f}x), "
+                      f"тёплое {warm * 1000:.0f} мс ({sequential / warm:.0f}x)")
+        finally:
+            SIDECAR_DIR = original
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк чтения Excel: пул процессов и Feather-копии")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 5_000, 20_000])
+    parser.add_argument("--sheets", type=int, default=6)
+    args = parser.parse_args()
+    benchmark(tuple(args.sizes), args.sheets)